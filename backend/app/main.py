@@ -1,5 +1,7 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 from app.services.layer1_service import ScheduleOptimizer
 from app.services.data_generator import DataGenerator
 from app.schemas import OptimizationRequest, OptimizationResponse
@@ -8,27 +10,47 @@ import json
 import os
 import logging
 from typing import Dict, Any, List, Optional
-from app.models import ScheduleRequest, OptimizationParams, SwapAnalysisRequest
+from app.models import ScheduleRequest, OptimizationParams, SwapAnalysisRequest, DepotClosureRequest, WeightSweepRequest, BatchScheduleRequest
 from app.utils.layer2 import validate_input_data, validate_date_format
 from pathlib import Path
 import json
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from app.services.layer2_service import (
     run_layer2_service,
     get_timetable_config,
     generate_departure_slots,
-    convert_layer1_to_layer2_format,
-    load_layer1_output,
+    compute_departure_times,
+    explain_train,
+    run_layer2_weight_sweep,
+    save_layer2_output,
+    LAYER2_ENGINES,
 )
+from app.services.layer2_model import weights_from_params, sample_weightings
+from app.services.layer2_batch import run_layer2_batch
 from app.services.what_if_service import WhatIfAnalyzer, analyze_train_swap
 from app.utils.forecast import get_station_timings, get_weather_forecast, generate_rotation_schedule
 from app.utils.delay_predictor import DelayPredictor
+from app.utils.fleet_registry import FleetRegistry
+from app.services.depot_service import get_live_depot_graph, set_closure, replan_shunting
+from app.services.layer2_cache import layer2_cache
+from app.services.schedule_context import get_schedule_context, schedule_context_stats
+from app.services.rotation_store import get_rotation, rotation_store, MAX_QUERY_RESULTS
+from app.services.timetable_calendar import get_timetable_calendar, DEFAULT_LINE
+from app.services.anytime_service import start_run, stop_run, stream_events
+from app.utils.solver_profiles import get_solver_profile
+from app.utils.solver_telemetry import solver_telemetry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Metro-Mind API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile the timetable calendar up front so no request pays for holiday tables
+    get_timetable_calendar()
+    yield
+
+app = FastAPI(title="Metro-Mind API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -95,84 +117,170 @@ async def generate_data():
         logger.error(f"Error generating data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _check_solver_profile(solver_profile: Optional[str]) -> Optional[str]:
+    """Reject unknown solver profile names with a 400"""
+    try:
+        get_solver_profile(solver_profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return solver_profile
+
+def _check_layer2_engine(engine: str) -> str:
+    """Reject unknown Layer 2 engine names with a 400"""
+    if engine not in LAYER2_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown Layer 2 engine '{engine}'. Choose one of: {', '.join(LAYER2_ENGINES)}")
+    return engine
+
+def _load_layer1_inputs(warm_start: bool):
+    """Read input_data.json and, for warm starts, the previous output.json"""
+    input_path = os.path.join(DATA_DIR, "input_data.json")
+    if not os.path.exists(input_path):
+        raise HTTPException(status_code=404, detail="Input data not found. Generate data first.")
+
+    with open(input_path, "r") as f:
+        input_data = json.load(f)
+
+    output_path = os.path.join(DATA_DIR, "output.json")
+    previous_output = None
+    if warm_start and os.path.exists(output_path):
+        try:
+            with open(output_path, "r") as f:
+                previous_output = json.load(f)
+        except Exception as we:
+            logger.warning(f"Warm start unavailable, solving cold: {we}")
+    return input_data, previous_output
+
+def _save_layer1_result(result: Dict[str, Any]):
+    """Persist a Layer 1 result as output.json and seed parking.json for Layer 2"""
+    # Save output
+    output_path = os.path.join(DATA_DIR, "output.json")
+    with open(output_path, "w") as f:
+        json.dump(result, f, indent=2)
+
+    # Persist parking override for Layer 2: save all assignments EXCEPT TM024
+    try:
+        parking_path = os.path.join(DATA_DIR, "parking.json")
+        assignments = result.get("parking_assignments", []) or []
+
+        basic_assignments = []
+        for a in assignments:
+            bay = a.get("track_id") or a.get("bay")
+            position = a.get("position_in_track") or a.get("position") or 1
+            train_id = a.get("train_id")
+            if not (train_id and bay):
+                continue
+            if str(train_id).upper() == "TM024":
+                # Skip TM024 so user can add via Parking page
+                continue
+            status = "maintenance" if str(bay).startswith("IBL") else "parking"
+            basic_assignments.append({
+                "train_id": train_id,
+                "bay": bay,
+                "position": int(position),
+                "status": status,
+                "arrival_time": datetime.now().isoformat(),
+                "notes": "Pre-seeded from Layer 1"
+            })
+
+        # Merge with existing to preserve any user-entered TM024 (or other manual edits)
+        existing = []
+        if os.path.exists(parking_path):
+            try:
+                with open(parking_path, "r", encoding="utf-8") as rf:
+                    existing = json.load(rf)
+            except Exception:
+                existing = []
+
+        merged_by_id = {}
+        for e in existing:
+            tid = e.get("train_id")
+            if tid:
+                merged_by_id[tid] = e
+        for a in basic_assignments:
+            merged_by_id[a["train_id"]] = a
+
+        merged = list(merged_by_id.values())
+        merged.sort(key=lambda x: x.get("train_id", ""))
+        with open(parking_path, "w", encoding="utf-8") as pf:
+            json.dump(merged, pf, indent=2)
+    except Exception as pe:
+        logger.warning(f"Failed to persist parking.json: {pe}")
+
 @app.post("/optimize", response_model=OptimizationResponse)
-async def optimize_schedule():
-    """Optimize the train schedule based on all constraints"""
+async def optimize_schedule(
+    warm_start: bool = False,
+    relative_gap: Optional[float] = None,
+    solver_profile: Optional[str] = None
+):
+    """Optimize the train schedule based on all constraints.
+
+    warm_start seeds the solver with the last output.json; relative_gap stops
+    the search once the solution is provably within that fraction of optimal;
+    solver_profile is interactive, nightly (default) or exhaustive.
+    """
     try:
         logger.info("Starting optimization...")
-        
-        # Load input data
-        input_path = os.path.join(DATA_DIR, "input_data.json")
-        if not os.path.exists(input_path):
-            raise HTTPException(status_code=404, detail="Input data not found. Generate data first.")
-            
-        with open(input_path, "r") as f:
-            input_data = json.load(f)
-            
-        # Run optimization
-        optimizer = ScheduleOptimizer(input_data)
+        _check_solver_profile(solver_profile)
+        input_data, previous_output = _load_layer1_inputs(warm_start)
+
+        # Run optimization on the live depot graph so active closures are honoured
+        depot_graph = get_live_depot_graph(input_data["depot_layout"]["connections"])
+        optimizer = ScheduleOptimizer(
+            input_data,
+            depot_graph=depot_graph,
+            previous_output=previous_output,
+            relative_gap=relative_gap,
+            solver_profile=solver_profile
+        )
         result = optimizer.optimize()
-        
-        # Save output
-        output_path = os.path.join(DATA_DIR, "output.json")
-        with open(output_path, "w") as f:
-            json.dump(result, f, indent=2)
-
-        # Persist parking override for Layer 2: save all assignments EXCEPT TM024
-        try:
-            parking_path = os.path.join(DATA_DIR, "parking.json")
-            assignments = result.get("parking_assignments", []) or []
-
-            basic_assignments = []
-            for a in assignments:
-                bay = a.get("track_id") or a.get("bay")
-                position = a.get("position_in_track") or a.get("position") or 1
-                train_id = a.get("train_id")
-                if not (train_id and bay):
-                    continue
-                if str(train_id).upper() == "TM024":
-                    # Skip TM024 so user can add via Parking page
-                    continue
-                status = "maintenance" if str(bay).startswith("IBL") else "parking"
-                basic_assignments.append({
-                    "train_id": train_id,
-                    "bay": bay,
-                    "position": int(position),
-                    "status": status,
-                    "arrival_time": datetime.now().isoformat(),
-                    "notes": "Pre-seeded from Layer 1"
-                })
-
-            # Merge with existing to preserve any user-entered TM024 (or other manual edits)
-            existing = []
-            if os.path.exists(parking_path):
-                try:
-                    with open(parking_path, "r", encoding="utf-8") as rf:
-                        existing = json.load(rf)
-                except Exception:
-                    existing = []
-
-            merged_by_id = {}
-            for e in existing:
-                tid = e.get("train_id")
-                if tid:
-                    merged_by_id[tid] = e
-            for a in basic_assignments:
-                merged_by_id[a["train_id"]] = a
-
-            merged = list(merged_by_id.values())
-            merged.sort(key=lambda x: x.get("train_id", ""))
-            with open(parking_path, "w", encoding="utf-8") as pf:
-                json.dump(merged, pf, indent=2)
-        except Exception as pe:
-            logger.warning(f"Failed to persist parking.json: {pe}")
+        _save_layer1_result(result)
 
         logger.info("Optimization completed successfully")
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during optimization: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/optimize/stream")
+def optimize_stream(
+    warm_start: bool = False,
+    relative_gap: Optional[float] = None,
+    solver_profile: Optional[str] = None
+):
+    """Anytime Layer 1 optimization streamed as server-sent events.
+
+    Emits "started" (with the run id), a "solution" per improving plan and a
+    final "result". POST /solver/runs/{run_id}/stop accepts the best plan so far.
+    If the client disconnects first, the solve is stopped and its result is
+    not saved to output.json / parking.json.
+    """
+    _check_solver_profile(solver_profile)
+    input_data, previous_output = _load_layer1_inputs(warm_start)
+    depot_graph = get_live_depot_graph(input_data["depot_layout"]["connections"])
+
+    def solve(listener, stop_event):
+        optimizer = ScheduleOptimizer(
+            input_data,
+            depot_graph=depot_graph,
+            previous_output=previous_output,
+            relative_gap=relative_gap,
+            solver_profile=solver_profile
+        )
+        return optimizer.optimize(listener=listener, stop_event=stop_event)
+
+    # Saved only if the client is still listening when the solve ends
+    run = start_run("layer1", solve, persist=_save_layer1_result)
+    return StreamingResponse(stream_events(run), media_type="text/event-stream")
+
+@app.post("/solver/runs/{run_id}/stop")
+def stop_solver_run(run_id: str):
+    """Stop a streamed solve early; its final result carries the best plan found"""
+    if not stop_run(run_id):
+        raise HTTPException(status_code=404, detail=f"No running solve with id {run_id}")
+    return {"run_id": run_id, "stopping": True}
+
 @app.get("/results")
 async def get_results():
     """Get the latest optimization results"""
@@ -190,6 +298,55 @@ async def get_results():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _load_depot_state():
+    """Load input data and the live depot graph for closure endpoints"""
+    input_path = os.path.join(DATA_DIR, "input_data.json")
+    if not os.path.exists(input_path):
+        raise HTTPException(status_code=404, detail="Input data not found. Generate data first.")
+    with open(input_path, "r") as f:
+        input_data = json.load(f)
+    depot_graph = get_live_depot_graph(input_data["depot_layout"]["connections"])
+    return input_data, depot_graph
+
+def _current_shunting_plan(input_data: Dict[str, Any], depot_graph) -> Dict[str, Any]:
+    """Re-plan the last Layer 1 parking assignments on the live depot graph"""
+    output_path = os.path.join(DATA_DIR, "output.json")
+    if not os.path.exists(output_path):
+        return None
+    with open(output_path, "r") as f:
+        results = json.load(f)
+    current_positions = {t["id"]: t.get("current_position", "Unknown") for t in input_data.get("trains", [])}
+    return replan_shunting(depot_graph, results.get("parking_assignments", []), current_positions)
+
+@app.get("/depot/closures")
+def get_depot_closures():
+    """Active track closures and blocked bays with the current graph epoch"""
+    _, depot_graph = _load_depot_state()
+    return depot_graph.closures()
+
+@app.post("/depot/closures")
+def toggle_depot_closure(request: DepotClosureRequest):
+    """Close or restore a bay or track segment and re-plan shunting paths"""
+    try:
+        input_data, depot_graph = _load_depot_state()
+        closure = set_closure(depot_graph, request.bay, request.to_bay, request.closed)
+        return {
+            "closures": closure,
+            "shunting_plan": _current_shunting_plan(input_data, depot_graph)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/depot/shunting-plan")
+def get_shunting_plan():
+    """Shunting paths for the last Layer 1 parking assignments on the live depot graph"""
+    input_data, depot_graph = _load_depot_state()
+    plan = _current_shunting_plan(input_data, depot_graph)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="No results available. Run optimization first.")
+    return plan
+
+
 #layer2 : 
 
 # Main scheduling endpoint with enhanced validation
@@ -220,7 +377,8 @@ def schedule(payload: ScheduleRequest):
             readiness_json=payload.readiness,
             ads_json=payload.ads,  # Passed but ignored by service
             service_day=payload.service_day or "weekday",
-            service_date=target_date
+            service_date=target_date,
+            solver_profile=_check_solver_profile(payload.solver_profile)
         )
         
         # Add validation info to response
@@ -237,12 +395,24 @@ def schedule(payload: ScheduleRequest):
 
 # Enhanced test endpoint with validation
 @app.get("/schedule/test")
-def schedule_test(service_date: Optional[str] = None):
-    """Layer 2 scheduling using actual Layer 1 output (output.json)."""
+def schedule_test(
+    service_date: Optional[str] = None,
+    warm_start: bool = False,
+    relative_gap: Optional[float] = None,
+    solver_profile: Optional[str] = None,
+    include_rationale: bool = True,
+    engine: str = "auto"
+):
+    """Layer 2 scheduling using actual Layer 1 output (output.json).
+
+    warm_start, relative_gap and solver_profile only affect CP-SAT (engine=cp_sat,
+    or auto when a bay holds more than two trains); the exact engine lists
+    them under "ignored_options".
+    """
     try:
         # Load Layer 1 output and convert for validation context
-        layer1_output = load_layer1_output()
-        converted = convert_layer1_to_layer2_format(layer1_output)
+        schedule_context = get_schedule_context()
+        converted = schedule_context.converted
 
         # Validate converted Layer 1 data
         validation = validate_input_data(
@@ -260,6 +430,12 @@ def schedule_test(service_date: Optional[str] = None):
             service_day="weekday",
             service_date=target_date,
             use_layer1_output=True,
+            warm_start=warm_start,
+            relative_gap=relative_gap,
+            solver_profile=_check_solver_profile(solver_profile),
+            include_rationale=include_rationale,
+            engine=_check_layer2_engine(engine),
+            schedule_context=schedule_context,
         )
 
         # Add info
@@ -275,12 +451,82 @@ def schedule_test(service_date: Optional[str] = None):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Layer 2 scheduling failed: {str(e)}")
 
+@app.get("/schedule/stream")
+def schedule_stream(
+    service_date: Optional[str] = None,
+    warm_start: bool = False,
+    relative_gap: Optional[float] = None,
+    solver_profile: Optional[str] = None
+):
+    """Anytime Layer 2 scheduling on the Layer 1 output, streamed as server-sent events.
+
+    Each "solution" event carries the departure order of an improving plan;
+    POST /solver/runs/{run_id}/stop accepts the best plan so far. If the
+    client disconnects first, the solve is stopped and its plan is not saved
+    to layer2_output.json.
+    """
+    _check_solver_profile(solver_profile)
+    target_date = validate_date_format(service_date) if service_date else None
+
+    def solve(listener, stop_event):
+        result = run_layer2_service(
+            service_day="weekday",
+            service_date=target_date,
+            use_layer1_output=True,
+            warm_start=warm_start,
+            relative_gap=relative_gap,
+            solver_profile=solver_profile,
+            listener=listener,
+            stop_event=stop_event,
+            persist=False,
+        )
+        result["data_source"] = "Layer 1 Output"
+        result["processing_time"] = datetime.now().isoformat()
+        return result
+
+    def persist(result):
+        # Next night's warm start; skipped if the client disconnected
+        if result.get("solver_status") in ("OPTIMAL", "FEASIBLE"):
+            save_layer2_output(result)
+
+    run = start_run("layer2", solve, persist=persist)
+    return StreamingResponse(stream_events(run), media_type="text/event-stream")
+
+@app.get("/schedule/rationale/{train_id}")
+def schedule_rationale(train_id: str, service_date: Optional[str] = None):
+    """Why one train was scheduled (or left on standby) in the current Layer 2 plan"""
+    try:
+        target_date = validate_date_format(service_date) if service_date else None
+        result = run_layer2_service(
+            service_day="weekday",
+            service_date=target_date,
+            use_layer1_output=True,
+            include_rationale=False,
+        )
+        if "optimized_assignments" not in result:
+            raise HTTPException(status_code=500, detail=result.get("error", "Layer 2 scheduling failed"))
+
+        explanation = explain_train(result, train_id)
+        if explanation is None:
+            raise HTTPException(status_code=404, detail=f"Train {train_id} is not in the Layer 2 plan")
+        explanation["service_date"] = result.get("service_date")
+        return explanation
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Rationale lookup failed: {str(e)}")
+
 # Advanced scheduling with optimization parameters
 @app.post("/schedule/advanced")
 def schedule_advanced(payload: ScheduleRequest, params: OptimizationParams = None):
     """
     Advanced scheduling endpoint with configurable optimization parameters
     Note: Ad-related parameters are deprecated and ignored
+
+    The solver profile only affects CP-SAT, which runs when a bay holds more
+    than two trains; plans from the exact engine list it under
+    "ignored_options".
     """
     try:
         # Validate input data
@@ -296,21 +542,26 @@ def schedule_advanced(payload: ScheduleRequest, params: OptimizationParams = Non
         if payload.service_date:
             target_date = validate_date_format(payload.service_date)
         
-        # TODO: Implement custom optimization parameters in layer2_service
-        # Currently the weights are hardcoded in the service layer
+        try:
+            weights = weights_from_params(params.dict()) if params else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         result = run_layer2_service(
             parking_json=payload.parking,
             readiness_json=payload.readiness,
             ads_json=payload.ads,
             service_day=payload.service_day or "weekday",
-            service_date=target_date
+            service_date=target_date,
+            solver_profile=_check_solver_profile(payload.solver_profile),
+            weights=weights,
+            time_limit=params.max_solver_time if params else None
         )
         
         # Add optimization parameters to response
         result["optimization_params"] = params.dict() if params else "default"
         result["input_validation"] = validation
         result["processing_time"] = datetime.now().isoformat()
-        result["note"] = "Custom optimization weights not yet implemented in service layer. Ad-related parameters are deprecated."
+        result["note"] = "Objective weights come from optimization_params. Ad-related parameters are deprecated."
         result["optimization_focus"] = "Readiness scores and minimal shunting operations"
         
         return result
@@ -320,19 +571,91 @@ def schedule_advanced(payload: ScheduleRequest, params: OptimizationParams = Non
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Advanced optimization failed: {str(e)}")
 
+@app.post("/schedule/sweep")
+def schedule_weight_sweep(request: WeightSweepRequest):
+    """
+    Layer 2 sensitivity sweep: the current Layer 1 output solved under many
+    objective weightings, each plan compared with the default-weight plan
+    """
+    try:
+        target_date = validate_date_format(request.service_date) if request.service_date else None
+        _check_layer2_engine(request.engine)
+        _check_solver_profile(request.solver_profile)
+        if request.weightings:
+            weightings = [weights_from_params(params.dict()) for params in request.weightings]
+        else:
+            weightings = sample_weightings(request.samples, request.spread, request.seed)
+
+        result = run_layer2_weight_sweep(
+            weightings,
+            service_date=target_date,
+            engine=request.engine,
+            solver_profile=request.solver_profile,
+            time_limit=request.max_solver_time,
+        )
+        if "results" not in result:
+            raise HTTPException(status_code=500, detail=result.get("error", result.get("status", "Weight sweep failed")))
+        result["processing_time"] = datetime.now().isoformat()
+        return result
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Weight sweep failed: {str(e)}")
+
+@app.post("/schedule/batch")
+def schedule_batch(request: BatchScheduleRequest):
+    """
+    Layer 2 plans for a range of service dates from the current Layer 1 output.
+    Dates sharing a timetable are solved once; distinct problems run in parallel.
+    solver_profile and time_limit only affect CP-SAT; plans from the exact
+    engine list them under "ignored_options".
+    """
+    try:
+        start_date = validate_date_format(request.start_date)
+        if request.end_date:
+            end_date = validate_date_format(request.end_date)
+        else:
+            end_date = start_date + timedelta(days=request.days - 1)
+        _check_layer2_engine(request.engine)
+        _check_solver_profile(request.solver_profile)
+
+        result = run_layer2_batch(
+            start_date,
+            end_date,
+            engine=request.engine,
+            solver_profile=request.solver_profile,
+            time_limit=request.max_solver_time,
+            include_rationale=request.include_rationale,
+            max_workers=request.max_workers,
+        )
+        result["processing_time"] = datetime.now().isoformat()
+        return result
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch scheduling failed: {str(e)}")
+
 # NEW WHAT-IF ANALYSIS ENDPOINTS
 
 @app.get("/whatif/standby-trains")
 def get_standby_trains():
     """Get all standby trains using Layer 1 output and current Layer 2 schedule."""
     try:
-        layer1_output = load_layer1_output()
-        converted = convert_layer1_to_layer2_format(layer1_output)
+        schedule_context = get_schedule_context()
+        converted = schedule_context.converted
 
         # Run optimization to get current schedule
         optimization_result = run_layer2_service(
             service_day="weekday",
             use_layer1_output=True,
+            solver_profile="interactive",
+            schedule_context=schedule_context,
         )
 
         # Initialize analyzer and get standby trains
@@ -353,13 +676,15 @@ def get_standby_trains():
 def get_all_swap_scenarios():
     """Get all possible train swap scenarios for analysis using Layer 1 output."""
     try:
-        layer1_output = load_layer1_output()
-        converted = convert_layer1_to_layer2_format(layer1_output)
+        schedule_context = get_schedule_context()
+        converted = schedule_context.converted
 
         # Run optimization to get current schedule
         optimization_result = run_layer2_service(
             service_day="weekday",
             use_layer1_output=True,
+            solver_profile="interactive",
+            schedule_context=schedule_context,
         )
 
         # Initialize analyzer and get all scenarios
@@ -385,13 +710,15 @@ def get_all_swap_scenarios():
 def analyze_swap(request: SwapAnalysisRequest):
     """Analyze a specific train swap scenario using Layer 1 output."""
     try:
-        layer1_output = load_layer1_output()
-        converted = convert_layer1_to_layer2_format(layer1_output)
+        schedule_context = get_schedule_context()
+        converted = schedule_context.converted
 
         # Run optimization to get current schedule
         optimization_result = run_layer2_service(
             service_day="weekday",
             use_layer1_output=True,
+            solver_profile="interactive",
+            schedule_context=schedule_context,
         )
 
         # Validate that trains exist
@@ -458,7 +785,8 @@ def analyze_swap_with_custom_data(
             readiness_json=payload.readiness,
             ads_json=payload.ads,
             service_day=payload.service_day or "weekday",
-            service_date=target_date
+            service_date=target_date,
+            solver_profile="interactive"
         )
         
         # Validate that trains exist
@@ -521,23 +849,28 @@ def quick_swap_analysis(scheduled_train_id: str, standby_train_id: str):
 
 # Get timetable information with departure slots
 @app.get("/timetable/info")
-def get_timetable_info_endpoint(service_date: Optional[str] = None):
+def get_timetable_info_endpoint(service_date: Optional[str] = None, line: str = DEFAULT_LINE):
     """Get detailed timetable configuration and departure slots"""
     try:
         target_date = date.today()
         if service_date:
             target_date = validate_date_format(service_date)
         
-        timetable_config = get_timetable_config(target_date)
+        try:
+            timetable_config = get_timetable_config(target_date, line)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         departure_slots = generate_departure_slots(timetable_config)
         
         return {
             "service_date": target_date.isoformat(),
+            "line": line,
             "timetable_config": timetable_config,
             "departure_slots": {
                 "count": len(departure_slots),
-                "slot_numbers": departure_slots,  # [1,2,3,4,5,6,7,8]
-                "note": "Departure slots are now simple rankings (1-8) rather than specific times"
+                "slot_numbers": departure_slots,
+                "departure_times": compute_departure_times(timetable_config, departure_slots),
+                "note": "Full-day departure grid built from the peak and off-peak headways"
             },
             "generated_at": datetime.now().isoformat(),
             "holiday_check": {
@@ -551,6 +884,11 @@ def get_timetable_info_endpoint(service_date: Optional[str] = None):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Timetable generation failed: {str(e)}")
 
+@app.get("/timetable/calendar")
+def get_timetable_calendar_info():
+    """Lines, compiled years and grid counts of the precompiled timetable calendar"""
+    return get_timetable_calendar().stats()
+
 # Data validation endpoint
 @app.post("/validate")
 def validate_data(payload: ScheduleRequest):
@@ -590,25 +928,44 @@ def validate_data(payload: ScheduleRequest):
 
 # Automatic schedule generation (enhanced version of the old endpoint)
 @app.get("/schedule/auto")
-def schedule_auto(service_date: Optional[str] = None, include_debug: bool = False):
+def schedule_auto(
+    service_date: Optional[str] = None,
+    include_debug: bool = False,
+    warm_start: bool = False,
+    relative_gap: Optional[float] = None,
+    solver_profile: Optional[str] = None,
+    include_rationale: bool = True,
+    engine: str = "auto"
+):
     """
     Automatic schedule generation using Layer 1 output and optional debug information
+
+    warm_start, relative_gap and solver_profile only affect CP-SAT (engine=cp_sat,
+    or auto when a bay holds more than two trains); the exact engine lists
+    them under "ignored_options".
     """
     try:
         target_date = None
         if service_date:
             target_date = validate_date_format(service_date)
 
+        # One read of the Layer 1 output serves the solve and the debug block
+        schedule_context = get_schedule_context()
         result = run_layer2_service(
             service_day="weekday",
             service_date=target_date,
             use_layer1_output=True,
+            warm_start=warm_start,
+            relative_gap=relative_gap,
+            solver_profile=_check_solver_profile(solver_profile),
+            include_rationale=include_rationale,
+            engine=_check_layer2_engine(engine),
+            schedule_context=schedule_context,
         )
 
         if include_debug:
             # Add debug information
-            layer1_output = load_layer1_output()
-            converted = convert_layer1_to_layer2_format(layer1_output)
+            converted = schedule_context.converted
             result["debug_info"] = {
                 "input_data_stats": validate_input_data(
                     converted["parking"], 
@@ -682,12 +1039,47 @@ def health_check():
         }
 
 # Get optimization statistics
+@app.get("/stats/layer2-cache")
+def get_layer2_cache_stats():
+    """Hit/miss counters of the shared Layer 2 result cache"""
+    return layer2_cache.stats()
+
+@app.delete("/stats/layer2-cache")
+def clear_layer2_cache():
+    """Drop all cached Layer 2 results"""
+    layer2_cache.clear()
+    return layer2_cache.stats()
+
+@app.get("/stats/solver")
+def get_solver_stats(layer: Optional[str] = None, limit: int = 20):
+    """Telemetry of recent Layer 1 / Layer 2 solves: model size and build time,
+    presolve reductions, search counters and bound progression"""
+    if layer is not None and layer not in ("layer1", "layer2"):
+        raise HTTPException(status_code=400, detail="layer must be 'layer1' or 'layer2'")
+    return solver_telemetry.stats(layer=layer, limit=max(0, limit))
+
+@app.get("/stats/schedule-context")
+def get_schedule_context_stats():
+    """How often the Layer 1 output was re-read versus served from memory"""
+    return schedule_context_stats()
+
+@app.get("/stats/rotation-store")
+def get_rotation_store_stats():
+    """Indexed rotations held for /rotation endpoints and how often they were reused"""
+    return rotation_store.stats()
+
+@app.delete("/stats/rotation-store")
+def clear_rotation_store():
+    """Drop all stored rotations"""
+    rotation_store.clear()
+    return rotation_store.stats()
+
 @app.get("/stats/optimization")
 def get_optimization_stats():
     """Get statistics about optimization capabilities"""
     try:
-        layer1_output = load_layer1_output()
-        converted = convert_layer1_to_layer2_format(layer1_output)
+        schedule_context = get_schedule_context()
+        converted = schedule_context.converted
         validation = validate_input_data(
             converted["parking"], 
             converted["readiness"], 
@@ -787,11 +1179,12 @@ def get_override_suggestions():
     """Generate suggested overrides using Gemini by learning from historical override patterns"""
     try:
         # Load current schedule data
-        layer1_output = load_layer1_output()
-        converted = convert_layer1_to_layer2_format(layer1_output)
+        schedule_context = get_schedule_context()
+        converted = schedule_context.converted
         optimization_result = run_layer2_service(
             service_day="weekday",
             use_layer1_output=True,
+            schedule_context=schedule_context,
         )
         
         # Load past overrides - this is the key learning data
@@ -983,33 +1376,7 @@ def get_latest_override_suggestions():
 def get_rotation_schedule(service_date: str = None):
     """Get the complete rotation schedule with station arrival times and delay forecasts"""
     try:
-        if not service_date:
-            service_date = date.today().isoformat()
-        
-        # Load the current optimized schedule
-        optimization_result = run_layer2_service(service_day="weekday", use_layer1_output=True)
-        scheduled_trains = optimization_result.get("optimized_assignments", [])
-        
-        # Load train configuration data
-        with open(os.path.join(DATA_DIR, "input_data.json"), "r") as f:
-            train_configs = json.load(f)
-        
-        # Load station timing data
-        station_timings = get_station_timings()
-        
-        # Get weather forecast
-        weather_data = get_weather_forecast(service_date)
-        
-        # Generate rotation schedule
-        rotation_schedule = generate_rotation_schedule(
-            scheduled_trains, 
-            train_configs, 
-            station_timings, 
-            weather_data,
-            service_date
-        )
-        
-        return rotation_schedule
+        return get_rotation(service_date).rotation
         
     except Exception as e:
         logger.error(f"Error generating rotation schedule: {e}")
@@ -1019,30 +1386,78 @@ def get_rotation_schedule(service_date: str = None):
 def get_station_schedule(station_name: str, service_date: str = None):
     """Get schedule for a specific station"""
     try:
-        rotation_schedule = get_rotation_schedule(service_date)
-        station_schedule = []
-        
-        for train_schedule in rotation_schedule.get("train_schedules", []):
-            for station_event in train_schedule.get("station_events", []):
-                if station_event["station"].lower() == station_name.lower():
-                    station_schedule.append({
-                        "train_id": train_schedule["train_id"],
-                        "scheduled_arrival": station_event["scheduled_arrival"],
-                        "expected_arrival": station_event["expected_arrival"],
-                        "delay_minutes": station_event["delay_minutes"],
-                        "delay_reasons": station_event["delay_reasons"],
-                        "direction": station_event["direction"]
-                    })
-        
+        stored = get_rotation(service_date)
         return {
             "station": station_name,
             "date": service_date or date.today().isoformat(),
-            "schedule": sorted(station_schedule, key=lambda x: x["scheduled_arrival"])
+            "schedule": stored.station_board(station_name)
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/rotation/stations")
+def get_station_schedules(station: List[str] = Query(...), service_date: str = None):
+    """Schedules for several stations (?station=Aluva&station=Pettah) from one rotation"""
+    try:
+        stored = get_rotation(service_date)
+        return {
+            "date": service_date or date.today().isoformat(),
+            "stations": [
+                {"station": station_name, "schedule": stored.station_board(station_name)}
+                for station_name in station
+            ]
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/rotation/query")
+def query_rotation_events(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    station: Optional[str] = None,
+    direction: Optional[str] = None,
+    next_arrivals: Optional[int] = Query(None, alias="next"),
+    time_field: str = "scheduled_arrival",
+    service_date: str = None
+):
+    """Rotation events in a time window (start/end as HH:MM), or the next N
+    arrivals from start (default: now), optionally at one station and in one
+    direction. time_field is scheduled_arrival or expected_arrival."""
+    if start is None and next_arrivals is None:
+        raise HTTPException(status_code=400, detail="Give start (and optionally end) or next")
+    if next_arrivals is not None and next_arrivals < 1:
+        raise HTTPException(status_code=400, detail="next must be at least 1")
+    if start is None:
+        start = datetime.now().strftime("%H:%M")
+    limit = min(next_arrivals, MAX_QUERY_RESULTS) if next_arrivals is not None else MAX_QUERY_RESULTS
+
+    try:
+        stored = get_rotation(service_date)
+    except Exception as e:
+        logger.error(f"Error generating rotation schedule: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    try:
+        # One extra result tells whether the window was cut at the cap
+        events = stored.query(start, end, station=station, direction=direction, limit=limit + 1, time_field=time_field)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No rotation events at station '{station}'")
+
+    return {
+        "date": service_date or date.today().isoformat(),
+        "start": start,
+        "end": end,
+        "station": station,
+        "direction": direction,
+        "time_field": time_field,
+        "count": min(len(events), limit),
+        "truncated": next_arrivals is None and len(events) > limit,
+        "events": events[:limit]
+    }
+
 @app.get("/rotation/predictions")
 def get_rotation_predictions(service_date: str = None):
     """ML-based delay predictions per train and station using history-trained models"""
@@ -1051,12 +1466,13 @@ def get_rotation_predictions(service_date: str = None):
             service_date = date.today().isoformat()
 
         # Get optimized schedule from Layer 2
-        optimization_result = run_layer2_service(service_day="weekday", use_layer1_output=True)
+        optimization_result = run_layer2_service(service_day="weekday", use_layer1_output=True, include_rationale=False)
         scheduled_trains = optimization_result.get("optimized_assignments", [])
 
         # Load train configuration data
         with open(os.path.join(DATA_DIR, "input_data.json"), "r") as f:
             train_configs = json.load(f)
+        fleet = FleetRegistry.from_input_data(train_configs)
 
         # Station timings
         station_timings = get_station_timings()
@@ -1078,6 +1494,7 @@ def get_rotation_predictions(service_date: str = None):
             station_timings=station_timings,
             weather_data=weather_data,
             service_date=service_date,
+            fleet=fleet,
         )
 
         # Run predictor on the baseline to only adjust delays/expectations, preserving rotations
@@ -1087,6 +1504,7 @@ def get_rotation_predictions(service_date: str = None):
             baseline_rotation=baseline_rotation,
             train_configs=train_configs,
             weather_by_station=weather_by_station,
+            fleet=fleet,
         )
 
         # Wrap with metadata to match frontend expectations
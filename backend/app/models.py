@@ -96,6 +96,7 @@ class ScheduleRequest(BaseModel):
     ads: List[Dict[str, Any]] = Field([], description="Advertisement data (kept for compatibility but not used in optimization)")
     service_day: Optional[str] = Field("weekday", description="Service day type")
     service_date: Optional[str] = Field(None, description="Target service date (YYYY-MM-DD)")
+    solver_profile: Optional[str] = Field(None, description="CP-SAT profile: interactive, nightly (default) or exhaustive")
 
 class OptimizationParams(BaseModel):
     max_solver_time: Optional[int] = Field(60, description="Maximum solver time in seconds")
@@ -104,12 +105,39 @@ class OptimizationParams(BaseModel):
     readiness_weight: Optional[int] = Field(1000, description="Weight for readiness optimization")
     shunting_penalty_weight: Optional[int] = Field(5000, description="Weight for shunting penalty")
     position_bonus_weight: Optional[int] = Field(800, description="Weight for position bonus")
+    priority_slot_bonus: Optional[int] = Field(2000, description="Bonus for high-readiness trains in slots 1-3")
+    branding_urgency_weight: Optional[int] = Field(50, description="Weight for branding urgency in early slots")
     # Deprecated parameters (kept for compatibility)
     enable_ad_optimization: Optional[bool] = Field(False, description="DEPRECATED: Ad optimization removed")
     demographic_weighting: Optional[bool] = Field(False, description="DEPRECATED: Demographic weighting removed")
     ad_revenue_weight: Optional[int] = Field(0, description="DEPRECATED: Ad revenue weight (not used)")
     demographic_weight: Optional[int] = Field(0, description="DEPRECATED: Demographic weight (not used)")
 
+class WeightSweepRequest(BaseModel):
+    weightings: Optional[List[OptimizationParams]] = Field(None, description="Weightings to solve; omit to sample around the defaults")
+    samples: int = Field(50, ge=1, le=500, description="Number of sampled weightings when none are given")
+    spread: float = Field(0.5, ge=0, le=1, description="Sampled weights vary by up to this fraction of the default")
+    seed: Optional[int] = Field(None, description="Random seed for sampled weightings")
+    service_date: Optional[str] = Field(None, description="Target service date (YYYY-MM-DD)")
+    engine: str = Field("auto", description="Layer 2 engine: auto, fast, cp_sat or crosscheck")
+    solver_profile: Optional[str] = Field("interactive", description="CP-SAT profile when the exact engine does not apply")
+    max_solver_time: Optional[float] = Field(None, description="Per-weighting CP-SAT time cap in seconds")
+
+class BatchScheduleRequest(BaseModel):
+    start_date: str = Field(..., description="First service date (YYYY-MM-DD)")
+    end_date: Optional[str] = Field(None, description="Last service date (YYYY-MM-DD); defaults to start_date + days - 1")
+    days: int = Field(7, ge=1, le=31, description="Number of days when end_date is omitted")
+    engine: str = Field("auto", description="Layer 2 engine: auto, fast, cp_sat or crosscheck")
+    solver_profile: Optional[str] = Field(None, description="CP-SAT profile when the exact engine does not apply")
+    max_solver_time: Optional[float] = Field(None, description="Per-problem CP-SAT time cap in seconds")
+    include_rationale: bool = Field(False, description="Attach per-train scheduling rationales to every plan")
+    max_workers: Optional[int] = Field(None, ge=1, description="Worker processes; defaults to one per core")
+
+class DepotClosureRequest(BaseModel):
+    bay: str = Field(..., description="Bay to block, or one end of the track segment to close")
+    to_bay: Optional[str] = Field(None, description="Other end of the track segment; omit to block the whole bay")
+    closed: bool = Field(True, description="True to close, False to restore")
+
 class SwapAnalysisRequest(BaseModel):
     scheduled_train_id: str = Field(..., description="ID of currently scheduled train")
     standby_train_id: str = Field(..., description="ID of standby train to swap in")
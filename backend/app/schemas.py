@@ -15,6 +15,8 @@ class CleaningAssignment(BaseModel):
     crew_assigned: int
     priority: int
     reason: str
+    slot_id: Optional[str] = None
+    crew_id: Optional[str] = None
 
 class ParkingAssignment(BaseModel):
     train_id: str
@@ -32,6 +34,7 @@ class OptimizationRequest(BaseModel):
 class OptimizationResponse(BaseModel):
     readiness_scores: List[ReadinessScore]
     cleaning_assignments: List[CleaningAssignment]
+    cleaning_schedule: Dict[str, Any] = {}
     parking_assignments: List[ParkingAssignment]
     trains_to_ibl: List[str]
     trains_to_service: List[str]
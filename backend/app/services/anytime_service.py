@@ -0,0 +1,106 @@
+from typing import Dict, Any, Callable, Iterator, Optional
+import json
+import queue
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Solver runs that can still be streamed or stopped, keyed by run id
+_runs: Dict[str, "AnytimeRun"] = {}
+_runs_lock = threading.Lock()
+
+
+class AnytimeRun:
+    """A CP-SAT solve running in a background thread.
+
+    Improving solutions are queued as events for a streaming client; the
+    stop event lets the client accept the best plan found so far.
+    client_gone is set (together with the stop event) when the streaming
+    client disconnects before the final result.
+    """
+
+    def __init__(self, kind: str):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self.stop_event = threading.Event()
+        self.client_gone = threading.Event()
+        self.started_at = time.time()
+        self.solutions = 0
+        self.thread: Optional[threading.Thread] = None
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        self.events.put({"event": event, "data": data})
+
+    def on_solution(self, solution: Dict[str, Any]):
+        self.solutions += 1
+        self.emit("solution", {"run_id": self.run_id, **solution})
+
+
+def start_run(
+    kind: str,
+    solve: Callable[[Callable, threading.Event], Dict[str, Any]],
+    persist: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> AnytimeRun:
+    """Start solve(listener, stop_event) in the background and return its run.
+
+    persist(result) runs after the solve unless the streaming client has
+    disconnected, so an abandoned run never overwrites saved results.
+    """
+    run = AnytimeRun(kind)
+
+    def target():
+        try:
+            result = solve(run.on_solution, run.stop_event)
+            if persist is not None:
+                if run.client_gone.is_set():
+                    logger.info(f"Anytime {kind} run {run.run_id} abandoned by its client; result not persisted")
+                else:
+                    persist(result)
+            run.emit("result", {"run_id": run.run_id, "result": result})
+        except Exception as e:
+            logger.error(f"Anytime {kind} run {run.run_id} failed: {str(e)}")
+            run.emit("error", {"run_id": run.run_id, "error": str(e)})
+        finally:
+            run.events.put(None)
+            with _runs_lock:
+                _runs.pop(run.run_id, None)
+
+    with _runs_lock:
+        _runs[run.run_id] = run
+    run.emit("started", {"run_id": run.run_id, "kind": kind})
+    run.thread = threading.Thread(target=target, name=f"anytime-{kind}-{run.run_id}", daemon=True)
+    run.thread.start()
+    return run
+
+
+def stop_run(run_id: str) -> bool:
+    """Ask a running solve to stop; False if the run is unknown or finished"""
+    with _runs_lock:
+        run = _runs.get(run_id)
+    if run is None:
+        return False
+    run.stop_event.set()
+    return True
+
+
+def stream_events(run: AnytimeRun) -> Iterator[str]:
+    """Server-sent events for a run, ending after the final result (or error).
+
+    Closing the generator early (the client disconnected) stops the solve.
+    """
+    finished = False
+    try:
+        while True:
+            item = run.events.get()
+            if item is None:
+                finished = True
+                return
+            yield f"event: {item['event']}\ndata: {json.dumps(item['data'], default=str)}\n\n"
+    finally:
+        if not finished:
+            run.client_gone.set()
+        run.stop_event.set()
@@ -0,0 +1,102 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import time
+from app.utils.depot_graph import DepotGraph, layout_hash
+
+# The live depot graph carries supervisor closures between requests
+_live_graph: Optional[DepotGraph] = None
+
+# Shunting plans keyed by (layout hash, graph epoch, assignments hash)
+_plan_cache: "OrderedDict[Tuple[str, int, str], Dict[str, Any]]" = OrderedDict()
+_PLAN_CACHE_SIZE = 32
+
+
+def get_live_depot_graph(connections: Dict[str, List[str]]) -> DepotGraph:
+    """Return the live depot graph for this layout.
+
+    Closures survive across requests while the layout is unchanged; a new
+    layout starts from a clean graph.
+    """
+    global _live_graph
+    if _live_graph is None or _live_graph.layout_hash != layout_hash(connections):
+        _live_graph = DepotGraph(connections)
+    return _live_graph
+
+
+def set_closure(depot_graph: DepotGraph, bay: str, to_bay: Optional[str] = None, closed: bool = True) -> Dict[str, Any]:
+    """Close or restore a bay (to_bay is None) or the track segment bay <-> to_bay"""
+    if bay not in depot_graph.graph:
+        raise ValueError(f"Unknown bay: {bay}")
+    if to_bay is not None and to_bay not in depot_graph.graph.get(bay, []) and bay not in depot_graph.graph.get(to_bay, []):
+        raise ValueError(f"No track segment between {bay} and {to_bay}")
+
+    start = time.perf_counter()
+    if to_bay is None:
+        repaired = depot_graph.close_node(bay) if closed else depot_graph.restore_node(bay)
+    else:
+        repaired = depot_graph.close_edge(bay, to_bay) if closed else depot_graph.restore_edge(bay, to_bay)
+
+    return {
+        **depot_graph.closures(),
+        "repaired_sources": repaired,
+        "repair_time_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+
+def replan_shunting(
+    depot_graph: DepotGraph,
+    parking_assignments: List[Dict[str, Any]],
+    current_positions: Dict[str, str]
+) -> Dict[str, Any]:
+    """Re-plan shunting paths for existing parking assignments on the current graph.
+
+    Results are cached against the graph version, so repeated reads between
+    closure changes are free.
+    """
+    targets = [
+        (a["train_id"], a.get("track_id") or a.get("bay"), a.get("position_in_track") or a.get("position") or 1)
+        for a in parking_assignments
+        if a.get("train_id") and (a.get("track_id") or a.get("bay"))
+    ]
+    signature = hashlib.sha1(
+        json.dumps([targets, [current_positions.get(t[0]) for t in targets]]).encode("utf-8")
+    ).hexdigest()
+    key = depot_graph.version + (signature,)
+    cached = _plan_cache.get(key)
+    if cached is not None:
+        _plan_cache.move_to_end(key)
+        return {**cached, "cached": True}
+
+    assignments = []
+    total_moves = 0
+    unreachable = []
+    for train_id, track_id, position in targets:
+        current_bay = current_positions.get(train_id, "Unknown").split("-")[0]
+        moves, path = depot_graph.shortest_path(current_bay, track_id)
+        reachable = moves != float('inf')
+        if reachable:
+            total_moves += moves
+        else:
+            unreachable.append(train_id)
+        assignments.append({
+            "train_id": train_id,
+            "track_id": track_id,
+            "position_in_track": position,
+            "moves_required": moves if reachable else 0,
+            "shunting_path": path,
+            "reachable": reachable
+        })
+
+    plan = {
+        "parking_assignments": assignments,
+        "total_shunting_moves": total_moves,
+        "unreachable_trains": unreachable,
+        "graph_epoch": depot_graph.epoch,
+        "layout_hash": depot_graph.layout_hash
+    }
+    _plan_cache[key] = plan
+    if len(_plan_cache) > _PLAN_CACHE_SIZE:
+        _plan_cache.popitem(last=False)
+    return {**plan, "cached": False}
@@ -1,19 +1,39 @@
 from ortools.sat.python import cp_model
 from datetime import datetime, timedelta
 import json
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Callable
 import math
 import logging
+import threading
+import time
 from app.models import Train, Department, FitnessCertificateStatus, JobCardCriticality
 from app.schemas import ReadinessScore, CleaningAssignment, ParkingAssignment
 from app.utils.depot_graph import DepotGraph
+from app.utils.readiness_engine import ReadinessEngine
+from app.utils.fleet_registry import FleetRegistry
+from app.utils.parking_assignment import ParkingAssignmentEngine
+from app.utils.warm_start import apply_hints, layer1_roles_from_output, warm_start_report
+from app.utils.anytime import AnytimeCallback, solve_anytime
+from app.utils.solver_profiles import configure_solver, get_solver_profile
+from app.utils.solver_telemetry import attach_solve_log, cp_sat_telemetry, solver_telemetry
+from app.utils.cleaning_scheduler import CleaningScheduler, CLEANING_WINDOW_START, CLEANING_WINDOW_END
 
 logger = logging.getLogger(__name__)
 
 class ScheduleOptimizer:
-    def __init__(self, input_data: Dict[str, Any]):
+    def __init__(
+        self,
+        input_data: Dict[str, Any],
+        fleet: FleetRegistry = None,
+        depot_graph: DepotGraph = None,
+        previous_output: Dict[str, Any] = None,
+        relative_gap: float = None,
+        solver_profile: str = None
+    ):
         self.input_data = input_data
         self.trains = input_data["trains"]
+        # id -> train record, shared with the caller when provided
+        self.fleet = fleet or FleetRegistry(self.trains)
         self.cleaning_slots = input_data["cleaning_slots"]
         self.depot_layout = input_data["depot_layout"]
         self.date = input_data["date"]
@@ -27,199 +47,34 @@ class ScheduleOptimizer:
         self.standby_vars = {}  # train_id -> BoolVar (1 if on standby)
         self.ibl_vars = {}      # train_id -> BoolVar (1 if in IBL)
         
-        # Depot graph for pathfinding
-        self.depot_graph = DepotGraph(self.depot_layout["connections"])
+        # Depot graph for pathfinding (pass the live graph to honour track closures)
+        self.depot_graph = depot_graph or DepotGraph(self.depot_layout["connections"])
         
-        # Pre-calculate readiness scores for all trains
-        self.readiness_scores = {}
-        self.readiness_details = {}
-        for train in self.trains:
-            score, details = self.calculate_readiness_score(train)
-            self.readiness_scores[train["id"]] = score
-            self.readiness_details[train["id"]] = details
+        # Pre-calculate readiness scores for all trains in one batched pass;
+        # detail strings are built lazily per train by the engine
+        self.readiness_engine = ReadinessEngine(self.trains)
+        self.readiness_scores = self.readiness_engine.scores
+        # Per-train readiness records shared by constraints, fallback, explanations and breakdowns
+        self.readiness = self.readiness_engine.records
+
+        # Trains that did not fit any parking slot in the last optimize_parking call
+        self.unparked_trains: List[str] = []
+        # Crew timelines, slot usage and unfit trains from the last cleaning run
+        self.cleaning_schedule: Dict[str, Any] = {}
+
+        # Warm start: the last persisted output.json seeds the solver with hints
+        self.previous_output = previous_output
+        self.relative_gap = relative_gap
+        # Named CP-SAT profile (interactive / nightly / exhaustive), validated up front
+        self.solver_profile = get_solver_profile(solver_profile)["name"]
+        self.solver_settings: Dict[str, Any] = {}
+        # Telemetry of the last CP-SAT solve (see app.utils.solver_telemetry)
+        self.telemetry: Dict[str, Any] = {}
+        self.hints: List[Tuple[Any, int]] = []
     
     def calculate_readiness_score(self, train: Dict[str, Any]) -> Tuple[float, Dict[str, Any]]:
-        """Calculate readiness score for a train (0-100) with detailed breakdown"""
-        details = {}
-        score_components = {}
-        
-        # 1. Fitness certificates - if any expired, score is 0
-        fitness_score = 100
-        expired_certs = []
-        for dept, cert in train["fitness_certificates"].items():
-            if cert["status"] == FitnessCertificateStatus.EXPIRED.value:
-                expired_certs.append(dept)
-                fitness_score = 0
-        
-        if expired_certs:
-            details["fitness_certificates"] = f"❌ Expired certificates: {', '.join(expired_certs)}"
-        else:
-            details["fitness_certificates"] = "✅ All fitness certificates valid"
-        score_components["fitness_certificates"] = fitness_score
-        
-        # 2. Job card criticality
-        job_score = 100
-        critical_jobs = []
-        high_jobs = []
-        medium_jobs = []
-        low_jobs = []
-        
-        for job in train["job_cards"]:
-            if job["criticality"] == JobCardCriticality.CRITICAL.value:
-                critical_jobs.append(f"{job['description']} ({job['estimated_hours']}h)")
-                job_score = 0
-            elif job["criticality"] == JobCardCriticality.HIGH.value:
-                high_jobs.append(f"{job['description']} ({job['estimated_hours']}h)")
-                job_score *= 0.5
-            elif job["criticality"] == JobCardCriticality.MEDIUM.value:
-                medium_jobs.append(f"{job['description']} ({job['estimated_hours']}h)")
-                job_score *= 0.75
-            elif job["criticality"] == JobCardCriticality.LOW.value:
-                low_jobs.append(f"{job['description']} ({job['estimated_hours']}h)")
-                job_score *= 0.9
-        
-        job_details = []
-        if critical_jobs:
-            job_details.append(f"❌ Critical: {', '.join(critical_jobs)}")
-        if high_jobs:
-            job_details.append(f"⚠️ High: {', '.join(high_jobs)}")
-        if medium_jobs:
-            job_details.append(f"🔶 Medium: {', '.join(medium_jobs)}")
-        if low_jobs:
-            job_details.append(f"🔷 Low: {', '.join(low_jobs)}")
-        if not job_details:
-            job_details.append("✅ No open job cards")
-        
-        details["job_cards"] = " | ".join(job_details)
-        score_components["job_cards"] = job_score
-        
-        # 3. Branding priorities
-        branding_score = 100
-        branding_details = []
-        branding_urgency = 0
-        
-        for contract in train["branding_contracts"]:
-            total_hours = contract["total_exposure_hours"]
-            completed_hours = contract["completed_hours"]
-            remaining_hours = total_hours - completed_hours
-            
-            # Parse deadline
-            deadline = datetime.strptime(contract["deadline"], "%Y-%m-%d")
-            days_remaining = (deadline - datetime.now()).days
-            
-            if days_remaining > 0:
-                hours_per_day = remaining_hours / days_remaining
-                # If more than 4 hours per day needed, increase priority
-                if hours_per_day > 8:
-                    branding_score *= 1.5
-                    branding_urgency += 2
-                    branding_details.append(f"🚨 {contract['brand']}: {hours_per_day:.1f}h/day needed")
-                elif hours_per_day > 4:
-                    branding_score *= 1.2
-                    branding_urgency += 1
-                    branding_details.append(f"⚠️ {contract['brand']}: {hours_per_day:.1f}h/day needed")
-                else:
-                    branding_details.append(f"✅ {contract['brand']}: {hours_per_day:.1f}h/day needed")
-            else:
-                # Deadline passed
-                branding_score *= 0.5
-                branding_details.append(f"❌ {contract['brand']}: Deadline passed")
-        
-        if not branding_details:
-            branding_details.append("✅ No branding contracts")
-        
-        details["branding_contracts"] = " | ".join(branding_details)
-        score_components["branding_contracts"] = branding_score
-        
-        # 4. Mileage balancing
-        mileage_score = 100
-        mileage_details = []
-        mileage = train["current_mileage"]
-        thresholds = train["maintenance_thresholds"]
-        
-        for component in ["bogie", "brake_pad", "hvac"]:
-            remaining = thresholds[component] - mileage[component]
-            percentage = (remaining / thresholds[component]) * 100
-            
-            if remaining <= 0:
-                mileage_score = 0
-                mileage_details.append(f"❌ {component}: Overdue ({mileage[component]}/{thresholds[component]} km)")
-            elif remaining < 1000:
-                mileage_score *= 0.5
-                mileage_details.append(f"🚨 {component}: Critical ({mileage[component]}/{thresholds[component]} km)")
-            elif remaining < 2000:
-                mileage_score *= 0.7
-                mileage_details.append(f"⚠️ {component}: Warning ({mileage[component]}/{thresholds[component]} km)")
-            elif remaining < 3000:
-                mileage_score *= 0.9
-                mileage_details.append(f"🔶 {component}: Notice ({mileage[component]}/{thresholds[component]} km)")
-            else:
-                mileage_details.append(f"✅ {component}: Good ({mileage[component]}/{thresholds[component]} km)")
-        
-        details["mileage_balancing"] = " | ".join(mileage_details)
-        score_components["mileage_balancing"] = mileage_score
-        
-        # 5. Cleaning status
-        cleaning_score = 100
-        last_cleaning = datetime.strptime(train["last_deep_cleaning"], "%Y-%m-%d")
-        days_since_cleaning = (datetime.now() - last_cleaning).days
-        
-        if days_since_cleaning > 7:
-            cleaning_score = 50
-            details["cleaning_status"] = f"🚨 Cleaning overdue ({days_since_cleaning} days since last cleaning)"
-        elif days_since_cleaning > 5:
-            cleaning_score = 75
-            details["cleaning_status"] = f"⚠️ Cleaning due soon ({days_since_cleaning} days since last cleaning)"
-        else:
-            details["cleaning_status"] = f"✅ Cleaning not needed yet ({days_since_cleaning} days since last cleaning)"
-        
-        score_components["cleaning_status"] = cleaning_score
-        
-        # Calculate final score (weighted average)
-        weights = {
-            "fitness_certificates": 0.3,
-            "job_cards": 0.3,
-            "branding_contracts": 0.1,
-            "mileage_balancing": 0.2,
-            "cleaning_status": 0.1
-        }
-        
-        final_score = 0
-        for component, weight in weights.items():
-            final_score += score_components[component] * weight
-        
-        # Apply branding urgency boost
-        final_score = min(100, final_score * (1 + branding_urgency * 0.1))
-        
-        # Ensure score is between 0 and 100
-        final_score = max(0, min(100, final_score))
-        
-        # Create summary with all details
-        summary_parts = []
-        if fitness_score == 0:
-            summary_parts.append("❌ Expired certificates")
-        if job_score == 0:
-            summary_parts.append("❌ Critical job cards")
-        if mileage_score == 0:
-            summary_parts.append("❌ Overdue maintenance")
-        if branding_urgency > 0:
-            summary_parts.append(f"🚀 Branding urgency: {branding_urgency}")
-        if final_score > 80:
-            summary_parts.append("✅ Excellent condition")
-        elif final_score > 60:
-            summary_parts.append("🟡 Good condition")
-        else:
-            summary_parts.append("🔶 Needs attention")
-        
-        # Combine all details into a single string for display
-        all_details = []
-        for key, value in details.items():
-            all_details.append(value)
-        
-        details["combined"] = " | ".join(all_details)
-        details["summary"] = " | ".join(summary_parts)
-        
-        return final_score, details
+        """Readiness score for a train (0-100) with detailed breakdown, from the fleet-wide engine"""
+        return self.readiness_engine.score(train["id"]), self.readiness_engine.details(train["id"])
     
     def setup_constraints(self):
         """Set up constraints for the CP-SAT model"""
@@ -237,49 +92,14 @@ class ScheduleOptimizer:
                 self.service_vars[train_id] + self.standby_vars[train_id] + self.ibl_vars[train_id] == 1
             )
         
-        # Constraint: Trains with expired fitness certificates must go to IBL
+        # Constraint: Trains with expired fitness certificates, critical job cards
+        # or overdue maintenance must go to IBL
+        forced_to_ibl = 0
         for train in self.trains:
             train_id = train["id"]
-            has_expired_cert = any(
-                cert["status"] == FitnessCertificateStatus.EXPIRED.value 
-                for cert in train["fitness_certificates"].values()
-            )
-            
-            if has_expired_cert:
+            if self.readiness[train_id].must_go_to_ibl:
                 self.model.Add(self.ibl_vars[train_id] == 1)
-        
-        # Constraint: Trains with critical job cards must go to IBL
-        for train in self.trains:
-            train_id = train["id"]
-            has_critical_job = any(
-                job["criticality"] == JobCardCriticality.CRITICAL.value 
-                for job in train["job_cards"]
-            )
-            
-            if has_critical_job:
-                self.model.Add(self.ibl_vars[train_id] == 1)
-        
-        # Constraint: Trains overdue for maintenance must go to IBL
-        for train in self.trains:
-            train_id = train["id"]
-            mileage = train["current_mileage"]
-            thresholds = train["maintenance_thresholds"]
-            
-            overdue = any(
-                mileage[component] >= thresholds[component]
-                for component in ["bogie", "brake_pad", "hvac"]
-            )
-            
-            if overdue:
-                self.model.Add(self.ibl_vars[train_id] == 1)
-        
-        # Count how many trains are forced to IBL
-        forced_to_ibl = sum(1 for train in self.trains if 
-            any(cert["status"] == FitnessCertificateStatus.EXPIRED.value for cert in train["fitness_certificates"].values()) or
-            any(job["criticality"] == JobCardCriticality.CRITICAL.value for job in train["job_cards"]) or
-            any(train["current_mileage"][component] >= train["maintenance_thresholds"][component] 
-                for component in ["bogie", "brake_pad", "hvac"])
-        )
+                forced_to_ibl += 1
         
         # Calculate available trains for service and standby
         available_trains = len(self.trains) - forced_to_ibl
@@ -312,157 +132,124 @@ class ScheduleOptimizer:
             readiness_scores.append(self.standby_vars[train_id] * int(score * 50))  # Lower weight for standby
         
         self.model.Maximize(sum(readiness_scores))
+
+        if self.previous_output:
+            self.add_warm_start_hints()
+
+    def add_warm_start_hints(self):
+        """Hint last night's service / standby / IBL split for trains still in the fleet"""
+        previous_roles = layer1_roles_from_output(self.previous_output)
+        role_vars = {"service": self.service_vars, "standby": self.standby_vars, "ibl": self.ibl_vars}
+        for train_id, role in previous_roles.items():
+            if train_id not in self.service_vars:
+                continue
+            for name, variables in role_vars.items():
+                self.hints.append((variables[train_id], int(name == role)))
+        apply_hints(self.model, self.hints)
     
     def optimize_cleaning_schedule(self, trains_to_clean: List[str]) -> List[CleaningAssignment]:
         """Optimize the cleaning schedule for trains that need cleaning"""
-        cleaning_assignments = []
-        
         # Sort trains by priority (readiness score descending)
-        trains_with_scores = []
-        for train_id in trains_to_clean:
-            score = self.readiness_scores[train_id]
-            trains_with_scores.append((train_id, score))
-        
-        trains_with_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        # Assign to available cleaning slots
-        available_slots = [slot for slot in self.cleaning_slots if slot["available"]]
-        current_time = datetime.strptime("20:00:00", "%H:%M:%S")  # Start at 8 PM
-        
-        for i, (train_id, score) in enumerate(trains_with_scores):
-            if i < len(available_slots) * self.cleaning_crew_available:
-                slot_idx = i % len(available_slots)
-                slot = available_slots[slot_idx]
-                train = next(t for t in self.trains if t["id"] == train_id)
-                duration = train["cleaning_duration"]
-                
-                end_time = current_time + timedelta(hours=duration)
-                
-                # Determine reason for cleaning
-                last_cleaning = datetime.strptime(train["last_deep_cleaning"], "%Y-%m-%d")
-                days_since_cleaning = (datetime.now() - last_cleaning).days
-                
-                if days_since_cleaning >= 7:
-                    reason = "Overdue for cleaning"
-                else:
-                    reason = "Scheduled maintenance cleaning"
-                
-                cleaning_assignments.append({
-                    "train_id": train_id,
-                    "start_time": current_time.strftime("%H:%M:%S"),
-                    "end_time": end_time.strftime("%H:%M:%S"),
-                    "crew_assigned": 1,
-                    "priority": int(score),
-                    "reason": reason
-                })
-                
-                # Update time for next cleaning (staggered based on crew availability)
-                if (i + 1) % self.cleaning_crew_available == 0:
-                    current_time = end_time
-        
-        return cleaning_assignments
+        trains_sorted = sorted(trains_to_clean, key=lambda train_id: self.readiness_scores[train_id], reverse=True)
+
+        jobs = []
+        for train_id in trains_sorted:
+            # Determine reason for cleaning
+            if self.readiness[train_id].needs_cleaning:
+                reason = "Overdue for cleaning"
+            else:
+                reason = "Scheduled maintenance cleaning"
+
+            jobs.append({
+                "train_id": train_id,
+                "duration_hours": self.fleet[train_id]["cleaning_duration"],
+                "priority": int(self.readiness_scores[train_id]),
+                "reason": reason
+            })
+
+        # Pack jobs onto slots and crews inside the night window
+        window = self.input_data.get("cleaning_window", {})
+        scheduler = CleaningScheduler(
+            self.cleaning_slots,
+            self.cleaning_crew_available,
+            self.date,
+            window.get("start", CLEANING_WINDOW_START),
+            window.get("end", CLEANING_WINDOW_END)
+        )
+        schedule = scheduler.schedule(jobs)
+
+        if schedule["unscheduled"]:
+            logger.warning(f"Cleaning window full, could not fit: {', '.join(schedule['unscheduled'])}")
+
+        self.cleaning_schedule = {
+            "crews": schedule["crews"],
+            "slots": schedule["slots"],
+            "window": schedule["window"],
+            "unscheduled_trains": schedule["unscheduled"]
+        }
+        return schedule["assignments"]
     
     def optimize_parking(self, service_trains: List[str], standby_trains: List[str], ibl_trains: List[str]) -> Tuple[List[ParkingAssignment], int]:
-        """Optimize parking assignments to minimize shunting"""
-        assignments = []
-        total_moves = 0
-        
-        # Get current positions of all trains
-        current_positions = {}
-        for train in self.trains:
-            current_positions[train["id"]] = train["current_position"]
-        
-        # Assign IBL trains to IBL bays
-        ibl_bays = self.depot_layout["ibl_bays"]
-        for i, train_id in enumerate(ibl_trains):
-            if i < len(ibl_bays):
-                target_bay = ibl_bays[i]
-                current_position = current_positions.get(train_id, "Unknown")
-                
-                # Calculate moves required
-                moves, path = self.depot_graph.shortest_path(current_position.split("-")[0], target_bay)
-                moves_required = moves if moves != float('inf') else 0
-                total_moves += moves_required
-                
-                assignments.append({
-                    "train_id": train_id,
-                    "track_id": target_bay,
-                    "position_in_track": 1,  # IBL bays have single position
-                    "moves_required": moves_required,
-                    "shunting_path": path
-                })
-        
-        # Assign service and standby trains to parking tracks
-        non_ibl_trains = service_trains + standby_trains
-        
-        # Sort trains by readiness score (service trains first, then standby)
-        trains_with_scores = []
-        for train_id in non_ibl_trains:
-            score = self.readiness_scores[train_id]
-            trains_with_scores.append((train_id, score))
-        
-        trains_with_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        # Assign to parking tracks, prioritizing tracks near exit points
-        parking_tracks = self.depot_layout["parking_tracks"]
-        exit_points = self.depot_layout["exit_points"]
-        
-        # Sort tracks by proximity to exit points
-        track_distances = []
-        for track in parking_tracks:
-            min_distance = float('inf')
-            for exit_point in exit_points:
-                distance, _ = self.depot_graph.shortest_path(track["id"], exit_point)
-                min_distance = min(min_distance, distance)
-            track_distances.append((track["id"], min_distance))
-        
-        track_distances.sort(key=lambda x: x[1])
-        sorted_tracks = [track[0] for track in track_distances]
-        
-        # Assign trains to tracks
-        track_assignments = {track_id: [] for track_id in sorted_tracks}
-        
-        for i, (train_id, score) in enumerate(trains_with_scores):
-            track_idx = i % len(sorted_tracks)
-            track_id = sorted_tracks[track_idx]
-            
-            if len(track_assignments[track_id]) < 2:  # Track capacity is 2
-                track_assignments[track_id].append(train_id)
-        
-        # Create parking assignments
-        for track_id, train_ids in track_assignments.items():
-            for position, train_id in enumerate(train_ids, 1):
-                if train_id:  # Skip empty slots
-                    current_position = current_positions.get(train_id, "Unknown")
-                    
-                    # Calculate moves required
-                    moves, path = self.depot_graph.shortest_path(current_position.split("-")[0], track_id)
-                    moves_required = moves if moves != float('inf') else 0
-                    total_moves += moves_required
-                    
-                    assignments.append({
-                        "train_id": train_id,
-                        "track_id": track_id,
-                        "position_in_track": position,
-                        "moves_required": moves_required,
-                        "shunting_path": path
-                    })
-        
-        return assignments, total_moves
+        """Optimize parking assignments to minimize shunting (min-cost slot assignment)"""
+        engine = ParkingAssignmentEngine(self.depot_graph, self.depot_layout["exit_points"])
+
+        def parking_request(train_ids: List[str], role: str) -> List[Dict[str, Any]]:
+            return [{
+                "train_id": train_id,
+                "current_bay": self.fleet[train_id].get("current_position", "Unknown").split("-")[0],
+                "role": role,
+                "readiness": self.readiness_scores[train_id]
+            } for train_id in train_ids]
+
+        # IBL trains go to IBL bays (single position each)
+        ibl_tracks = [{"id": bay, "capacity": 1} for bay in self.depot_layout["ibl_bays"]]
+        ibl_assignments, ibl_moves, ibl_unparked = engine.assign(parking_request(ibl_trains, "ibl"), ibl_tracks)
+
+        # Service and standby trains share the parking tracks, each with its own capacity
+        parking_assignments, parking_moves, parking_unparked = engine.assign(
+            parking_request(service_trains, "service") + parking_request(standby_trains, "standby"),
+            self.depot_layout["parking_tracks"]
+        )
+
+        self.unparked_trains = ibl_unparked + parking_unparked
+        if self.unparked_trains:
+            logger.warning(f"Not enough parking slots for: {', '.join(self.unparked_trains)}")
+
+        return ibl_assignments + parking_assignments, ibl_moves + parking_moves
     
-    def optimize(self) -> Dict[str, Any]:
-        """Run the complete optimization"""
+    def solution_snapshot(self, callback: AnytimeCallback) -> Dict[str, List[str]]:
+        """Service / standby / IBL split of an intermediate CP-SAT solution"""
+        return {
+            "trains_to_service": [t for t, var in self.service_vars.items() if callback.Value(var)],
+            "trains_to_standby": [t for t, var in self.standby_vars.items() if callback.Value(var)],
+            "trains_to_ibl": [t for t, var in self.ibl_vars.items() if callback.Value(var)]
+        }
+
+    def optimize(self, listener: Callable[[Dict[str, Any]], None] = None, stop_event: threading.Event = None) -> Dict[str, Any]:
+        """Run the complete optimization.
+
+        listener receives every improving solution as it is found; setting
+        stop_event ends the search early with the best plan so far.
+        """
         try:
             logger.info("Setting up constraints...")
             # Set up and solve the CP-SAT model
+            build_started = time.perf_counter()
             self.setup_constraints()
+            model_build_time = time.perf_counter() - build_started
             solver = cp_model.CpSolver()
             
-            # Set a time limit for the solver (5 minutes)
-            solver.parameters.max_time_in_seconds = 300.0
+            # Workers, time budget, gap and presolve come from the solver profile
+            self.solver_settings = configure_solver(solver, self.model, self.solver_profile, relative_gap=self.relative_gap)
+            solve_log = attach_solve_log(solver, self.model)
             
             logger.info("Solving optimization problem...")
-            status = solver.Solve(self.model)
+            callback = AnytimeCallback(self.hints, self.solution_snapshot, listener, stop_event)
+            status = solve_anytime(solver, self.model, callback)
+            recorder = callback if self.previous_output else None
+            self.telemetry = solver_telemetry.record(cp_sat_telemetry(
+                "layer1", solver, status, self.solver_settings, model_build_time, solve_log, callback.history
+            ))
             
             if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
                 logger.warning("No optimal solution found, using fallback heuristic...")
@@ -488,20 +275,11 @@ class ScheduleOptimizer:
                     trains_to_ibl.append(train_id)
                 
                 # Check if train needs cleaning
-                last_cleaning = datetime.strptime(train["last_deep_cleaning"], "%Y-%m-%d")
-                days_since_cleaning = (datetime.now() - last_cleaning).days
-                
-                if days_since_cleaning >= 7 and train_id not in trains_to_ibl:
+                if self.readiness[train_id].needs_cleaning and train_id not in trains_to_ibl:
                     trains_to_clean.append(train_id)
                 
                 # Use pre-calculated readiness score
-                readiness_scores.append({
-                    "train_id": train_id,
-                    "score": self.readiness_scores[train_id],
-                    "breakdown": self.get_score_breakdown(train),
-                    # Return the details as a dict (component -> text) so Pydantic schema validation passes
-                    "details": self.readiness_details[train_id]
-                })
+                readiness_scores.append(self.readiness_entry(train_id))
             
             logger.info("Optimizing cleaning schedule...")
             # Optimize cleaning schedule
@@ -511,6 +289,14 @@ class ScheduleOptimizer:
             # Optimize parking assignments
             parking_assignments, total_moves = self.optimize_parking(trains_to_service, trains_to_standby, trains_to_ibl)
             
+            # Warm-start report; cold_wall_time carries the last cold solve forward
+            previous_meta = (self.previous_output or {}).get("metadata", {})
+            previous_cold = previous_meta.get("cold_wall_time")
+            if previous_cold is None and not (previous_meta.get("warm_start") or {}).get("enabled"):
+                previous_cold = previous_meta.get("wall_time")
+            cold_wall_time = previous_cold if recorder is not None else solver.WallTime()
+            warm_start = warm_start_report(recorder, len(self.hints), solver.WallTime(), previous_cold, self.relative_gap)
+
             logger.info("Generating explanation...")
             # Generate explanation
             explanation = self.generate_explanation(
@@ -520,6 +306,7 @@ class ScheduleOptimizer:
             result = {
                 "readiness_scores": readiness_scores,
                 "cleaning_assignments": cleaning_assignments,
+                "cleaning_schedule": self.cleaning_schedule,
                 "parking_assignments": parking_assignments,
                 "trains_to_ibl": trains_to_ibl,
                 "trains_to_service": trains_to_service,
@@ -531,7 +318,15 @@ class ScheduleOptimizer:
                     "objective_value": solver.ObjectiveValue(),
                     "wall_time": solver.WallTime(),
                     "required_trains": self.required_trains,
-                    "standby_trains": self.standby_trains
+                    "standby_trains": self.standby_trains,
+                    "depot_graph_epoch": self.depot_graph.epoch,
+                    "warm_start": warm_start,
+                    "cold_wall_time": cold_wall_time,
+                    "unparked_trains": self.unparked_trains,
+                    "solver_profile": self.solver_settings,
+                    "solution_history": callback.history,
+                    "stopped_early": callback.stopped_early,
+                    "solver_telemetry": self.telemetry
                 }
             }
             
@@ -550,32 +345,7 @@ class ScheduleOptimizer:
         trains_sorted = sorted(self.trains, key=lambda x: self.readiness_scores[x["id"]], reverse=True)
         
         # Identify trains that must go to IBL
-        must_go_to_ibl = []
-        for train in trains_sorted:
-            train_id = train["id"]
-            
-            # Check fitness certificates
-            has_expired_cert = any(
-                cert["status"] == FitnessCertificateStatus.EXPIRED.value 
-                for cert in train["fitness_certificates"].values()
-            )
-            
-            # Check job cards
-            has_critical_job = any(
-                job["criticality"] == JobCardCriticality.CRITICAL.value 
-                for job in train["job_cards"]
-            )
-            
-            # Check mileage
-            mileage = train["current_mileage"]
-            thresholds = train["maintenance_thresholds"]
-            overdue = any(
-                mileage[component] >= thresholds[component]
-                for component in ["bogie", "brake_pad", "hvac"]
-            )
-            
-            if has_expired_cert or has_critical_job or overdue:
-                must_go_to_ibl.append(train_id)
+        must_go_to_ibl = [t["id"] for t in trains_sorted if self.readiness[t["id"]].must_go_to_ibl]
         
         # Assign trains to service, standby, and IBL
         trains_to_service = []
@@ -608,20 +378,11 @@ class ScheduleOptimizer:
             train_id = train["id"]
             
             # Check if train needs cleaning
-            last_cleaning = datetime.strptime(train["last_deep_cleaning"], "%Y-%m-%d")
-            days_since_cleaning = (datetime.now() - last_cleaning).days
-            
-            if days_since_cleaning >= 7 and train_id not in trains_to_ibl:
+            if self.readiness[train_id].needs_cleaning and train_id not in trains_to_ibl:
                 trains_to_clean.append(train_id)
             
             # Use pre-calculated readiness score
-            readiness_scores.append({
-                "train_id": train_id,
-                "score": self.readiness_scores[train_id],
-                "breakdown": self.get_score_breakdown(train),
-                # Return details dict rather than the combined string
-                "details": self.readiness_details[train_id]
-            })
+            readiness_scores.append(self.readiness_entry(train_id))
         
         # Optimize cleaning schedule
         cleaning_assignments = self.optimize_cleaning_schedule(trains_to_clean)
@@ -637,6 +398,7 @@ class ScheduleOptimizer:
         return {
             "readiness_scores": readiness_scores,
             "cleaning_assignments": cleaning_assignments,
+            "cleaning_schedule": self.cleaning_schedule,
             "parking_assignments": parking_assignments,
             "trains_to_ibl": trains_to_ibl,
             "trains_to_service": trains_to_service,
@@ -648,84 +410,27 @@ class ScheduleOptimizer:
                 "objective_value": 0,
                 "wall_time": 0,
                 "required_trains": self.required_trains,
-                "standby_trains": self.standby_trains
+                "standby_trains": self.standby_trains,
+                "depot_graph_epoch": self.depot_graph.epoch,
+                "unparked_trains": self.unparked_trains,
+                "solver_profile": self.solver_settings,
+                "solver_telemetry": self.telemetry
             }
         }
     
     def get_score_breakdown(self, train: Dict[str, Any]) -> Dict[str, float]:
         """Get breakdown of readiness score by factor"""
-        breakdown = {}
-        
-        # 1. Fitness certificates
-        fitness_score = 100
-        for cert in train["fitness_certificates"].values():
-            if cert["status"] == FitnessCertificateStatus.EXPIRED.value:
-                fitness_score = 0
-                break
-        breakdown["fitness_certificates"] = fitness_score
-        
-        # 2. Job cards
-        job_score = 100
-        for job in train["job_cards"]:
-            if job["criticality"] == JobCardCriticality.CRITICAL.value:
-                job_score = 0
-                break
-            elif job["criticality"] == JobCardCriticality.HIGH.value:
-                job_score *= 0.5
-            elif job["criticality"] == JobCardCriticality.MEDIUM.value:
-                job_score *= 0.75
-            elif job["criticality"] == JobCardCriticality.LOW.value:
-                job_score *= 0.9
-        breakdown["job_cards"] = job_score
-        
-        # 3. Branding contracts
-        branding_score = 100
-        for contract in train["branding_contracts"]:
-            total_hours = contract["total_exposure_hours"]
-            completed_hours = contract["completed_hours"]
-            remaining_hours = total_hours - completed_hours
-            
-            deadline = datetime.strptime(contract["deadline"], "%Y-%m-%d")
-            days_remaining = (deadline - datetime.now()).days
-            
-            if days_remaining > 0:
-                hours_per_day = remaining_hours / days_remaining
-                if hours_per_day > 8:
-                    branding_score *= 1.5
-                elif hours_per_day > 4:
-                    branding_score *= 1.2
-        breakdown["branding_contracts"] = branding_score
-        
-        # 4. Mileage balancing
-        mileage_score = 100
-        mileage = train["current_mileage"]
-        thresholds = train["maintenance_thresholds"]
-        
-        for component in ["bogie", "brake_pad", "hvac"]:
-            remaining = thresholds[component] - mileage[component]
-            if remaining <= 0:
-                mileage_score = 0
-                break
-            elif remaining < 1000:
-                mileage_score *= 0.5
-            elif remaining < 2000:
-                mileage_score *= 0.7
-            elif remaining < 3000:
-                mileage_score *= 0.9
-        breakdown["mileage_balancing"] = mileage_score
-        
-        # 5. Cleaning status
-        cleaning_score = 100
-        last_cleaning = datetime.strptime(train["last_deep_cleaning"], "%Y-%m-%d")
-        days_since_cleaning = (datetime.now() - last_cleaning).days
-        
-        if days_since_cleaning > 7:
-            cleaning_score = 50
-        elif days_since_cleaning > 5:
-            cleaning_score = 75
-        breakdown["cleaning_status"] = cleaning_score
-        
-        return breakdown
+        return self.readiness[train["id"]].breakdown
+    
+    def readiness_entry(self, train_id: str) -> Dict[str, Any]:
+        """Readiness score entry for the optimization result"""
+        return {
+            "train_id": train_id,
+            "score": self.readiness_scores[train_id],
+            "breakdown": self.readiness[train_id].breakdown,
+            # Return the details as a dict (component -> text) so Pydantic schema validation passes
+            "details": self.readiness_engine.details(train_id)
+        }
     
     def generate_explanation(self, service_trains: List[str], standby_trains: List[str], 
                             ibl_trains: List[str], readiness_scores: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -739,34 +444,21 @@ class ScheduleOptimizer:
             "parking_optimization": f"Total shunting moves required: {self.calculate_total_moves(service_trains + standby_trains + ibl_trains)}"
         }
         
+        readiness_by_id = FleetRegistry(readiness_scores, id_key="train_id")
+        
         # Explain why trains are going to IBL
         for train_id in ibl_trains:
-            train = next(t for t in self.trains if t["id"] == train_id)
+            readiness = self.readiness[train_id]
             reasons = []
-            
-            # Check fitness certificates
-            for dept, cert in train["fitness_certificates"].items():
-                if cert["status"] == FitnessCertificateStatus.EXPIRED.value:
-                    reasons.append(f"❌ Expired {dept} fitness certificate")
-            
-            # Check job cards
-            for job in train["job_cards"]:
-                if job["criticality"] == JobCardCriticality.CRITICAL.value:
-                    reasons.append(f"❌ Critical job card: {job['description']}")
-            
-            # Check mileage
-            mileage = train["current_mileage"]
-            thresholds = train["maintenance_thresholds"]
-            for component in ["bogie", "brake_pad", "hvac"]:
-                if mileage[component] >= thresholds[component]:
-                    reasons.append(f"❌ Overdue for {component} maintenance")
+            reasons.extend(f"❌ Expired {dept} fitness certificate" for dept in readiness.expired_certificates)
+            reasons.extend(f"❌ Critical job card: {description}" for description in readiness.critical_jobs)
+            reasons.extend(f"❌ Overdue for {component} maintenance" for component in readiness.overdue_components)
             
             explanation["trains_to_ibl_reasons"][train_id] = reasons
         
         # Explain why trains were selected for service
         for train_id in service_trains:
-            train = next(t for t in self.trains if t["id"] == train_id)
-            score_data = next(rs for rs in readiness_scores if rs["train_id"] == train_id)
+            score_data = readiness_by_id[train_id]
             
             reasons = []
             
@@ -775,16 +467,8 @@ class ScheduleOptimizer:
                 reasons.append("✅ High overall readiness score")
             
             # Branding urgency
-            for contract in train["branding_contracts"]:
-                total_hours = contract["total_exposure_hours"]
-                completed_hours = contract["completed_hours"]
-                remaining_hours = total_hours - completed_hours
-                
-                deadline = datetime.strptime(contract["deadline"], "%Y-%m-%d")
-                days_remaining = (deadline - datetime.now()).days
-                
-                if days_remaining > 0 and remaining_hours / days_remaining > 4:
-                    reasons.append(f"⚠️ Urgent branding commitment for {contract['brand']}")
+            for brand in self.readiness[train_id].urgent_brands:
+                reasons.append(f"⚠️ Urgent branding commitment for {brand}")
             
             explanation["service_train_reasons"][train_id] = reasons
         
@@ -794,8 +478,7 @@ class ScheduleOptimizer:
             if train_id in ibl_trains:
                 continue
                 
-            last_cleaning = datetime.strptime(train["last_deep_cleaning"], "%Y-%m-%d")
-            days_since_cleaning = (datetime.now() - last_cleaning).days
+            days_since_cleaning = self.readiness[train_id].days_since_cleaning
             
             if days_since_cleaning >= 7:
                 explanation["cleaning_priorities"][train_id] = {
@@ -813,19 +496,16 @@ class ScheduleOptimizer:
     def calculate_total_moves(self, train_ids: List[str]) -> int:
         """Calculate total shunting moves required"""
         total_moves = 0
-        current_positions = {}
-        
-        for train in self.trains:
-            current_positions[train["id"]] = train["current_position"]
+        trains_to_ibl = set(self.input_data.get("trains_to_ibl", []))
         
         for train_id in train_ids:
-            train = next(t for t in self.trains if t["id"] == train_id)
-            current_position = current_positions.get(train_id, "Unknown")
+            train = self.fleet.get(train_id, {})
+            current_position = train.get("current_position", "Unknown")
             
             # Simplified move calculation - in real implementation, use depot graph
-            if "IBL" in current_position and train_id not in self.input_data.get("trains_to_ibl", []):
+            if "IBL" in current_position and train_id not in trains_to_ibl:
                 total_moves += 2  # Move out of IBL and to parking
-            elif "IBL" not in current_position and train_id in self.input_data.get("trains_to_ibl", []):
+            elif "IBL" not in current_position and train_id in trains_to_ibl:
                 total_moves += 2  # Move to IBL
             else:
                 total_moves += 1  # Regular repositioning
@@ -0,0 +1,194 @@
+from typing import Dict, Any, List
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import time
+from app.services.layer2_cache import content_key
+from app.services.layer2_service import (
+    run_layer2_service,
+    attach_rationales,
+    get_timetable_config,
+    LAYER2_ENGINES,
+    MAX_TRAINS_TO_SCHEDULE,
+)
+from app.services.schedule_context import get_schedule_context
+
+MAX_BATCH_DAYS = 31
+
+
+def date_range(start_date: date, end_date: date) -> List[date]:
+    """Every date from start_date to end_date inclusive; raises ValueError on
+    a reversed or over-long range"""
+    if end_date < start_date:
+        raise ValueError("end_date must not be before start_date")
+    days = (end_date - start_date).days + 1
+    if days > MAX_BATCH_DAYS:
+        raise ValueError(f"Batch covers {days} days; at most {MAX_BATCH_DAYS} are allowed")
+    return [start_date + timedelta(days=offset) for offset in range(days)]
+
+
+def _solve_problem(service_date: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Pool worker: one Layer 2 solve on the current Layer 1 output"""
+    return run_layer2_service(
+        service_date=date.fromisoformat(service_date),
+        use_layer1_output=True,
+        include_rationale=False,
+        persist=False,
+        **settings
+    )
+
+
+def run_layer2_batch(
+    start_date: date,
+    end_date: date,
+    engine: str = "auto",
+    solver_profile: str = None,
+    time_limit: float = None,
+    max_trains_to_schedule: int = MAX_TRAINS_TO_SCHEDULE,
+    include_rationale: bool = False,
+    max_workers: int = None
+) -> Dict[str, Any]:
+    """
+    Layer 2 plans for every service date in a range, from the current Layer 1 output.
+
+    A plan depends on its date only through the day's timetable, so dates are
+    grouped by timetable and input state (output.json, parking.json) and each
+    distinct problem is solved once, the first date of the group standing in
+    for the rest. Distinct problems are solved in parallel worker processes
+    (inline when there is only one, or max_workers is 1). Batch plans never
+    overwrite data/layer2_output.json.
+    """
+    if engine not in LAYER2_ENGINES:
+        raise ValueError(f"Unknown Layer 2 engine '{engine}'. Choose one of: {', '.join(LAYER2_ENGINES)}")
+    started = time.perf_counter()
+    dates = date_range(start_date, end_date)
+    schedule_context = get_schedule_context()
+
+    # --- GROUP DATES INTO DISTINCT PROBLEMS ---
+    problems: Dict[str, Dict[str, Any]] = {}
+    problem_of: Dict[date, str] = {}
+    for service_date in dates:
+        timetable_config = get_timetable_config(service_date)
+        key = content_key(
+            layer1_output=schedule_context.layer1_digest,
+            parking=schedule_context.parking_digest,
+            timetable=timetable_config
+        )
+        if key not in problems:
+            problems[key] = {
+                "problem_id": len(problems) + 1,
+                "service_type": timetable_config["service_type"],
+                "dates": []
+            }
+        problems[key]["dates"].append(service_date)
+        problem_of[service_date] = key
+
+    settings = {
+        "engine": engine,
+        "solver_profile": solver_profile,
+        "time_limit": time_limit,
+        "max_trains_to_schedule": max_trains_to_schedule
+    }
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(problems)))
+
+    # --- SOLVE EACH DISTINCT PROBLEM ONCE ---
+    if workers == 1:
+        executor = "inline"
+        solved = {
+            key: run_layer2_service(
+                service_date=problem["dates"][0], use_layer1_output=True, include_rationale=False,
+                persist=False, schedule_context=schedule_context, **settings
+            )
+            for key, problem in problems.items()
+        }
+    else:
+        executor = "process"
+        # spawn: workers must not inherit the server's threads and locks
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {
+                key: pool.submit(_solve_problem, problem["dates"][0].isoformat(), settings)
+                for key, problem in problems.items()
+            }
+            solved = {key: future.result() for key, future in futures.items()}
+
+    if include_rationale:
+        solved = {key: attach_rationales(result) for key, result in solved.items()}
+
+    # --- EXPAND BACK TO ONE PLAN PER DATE ---
+    plans = []
+    for service_date in dates:
+        key = problem_of[service_date]
+        problem = problems[key]
+        plan = copy.deepcopy(solved[key])
+        plan["service_date"] = service_date.isoformat()
+        plan["batch"] = {
+            "problem_id": problem["problem_id"],
+            "solved_for": problem["dates"][0].isoformat(),
+            "shared_solve": service_date != problem["dates"][0]
+        }
+        plans.append(plan)
+
+    problem_stats = []
+    for key, problem in problems.items():
+        result = solved[key]
+        problem_stats.append({
+            "problem_id": problem["problem_id"],
+            "service_type": problem["service_type"],
+            "dates": [d.isoformat() for d in problem["dates"]],
+            "solver_status": result.get("solver_status"),
+            "objective_value": result.get("objective_value"),
+            "engine": (result.get("engine") or {}).get("used"),
+            "wall_time": result.get("wall_time"),
+            "error": result.get("error")
+        })
+
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "days": len(dates),
+        "distinct_problems": len(problems),
+        "executor": executor,
+        "workers": workers,
+        "all_solved": all(s["solver_status"] in ("OPTIMAL", "FEASIBLE") for s in problem_stats),
+        "problems": problem_stats,
+        "plans": plans,
+        "wall_time": round(time.perf_counter() - started, 4)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Layer 2 plans for a range of service dates")
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today(), help="First service date (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last service date (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=7, help="Number of days when --end is omitted")
+    parser.add_argument("--engine", default="auto", choices=LAYER2_ENGINES)
+    parser.add_argument("--solver-profile", default=None)
+    parser.add_argument("--time-limit", type=float, default=None, help="CP-SAT time cap per problem in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--rationale", action="store_true", help="Attach per-train rationales")
+    parser.add_argument("--output", help="Write the consolidated plan to this JSON file")
+    args = parser.parse_args()
+
+    end = args.end or args.start + timedelta(days=args.days - 1)
+    batch = run_layer2_batch(
+        args.start, end,
+        engine=args.engine,
+        solver_profile=args.solver_profile,
+        time_limit=args.time_limit,
+        include_rationale=args.rationale,
+        max_workers=args.workers
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(batch, f, indent=2)
+
+    print(f"{batch['days']} days, {batch['distinct_problems']} distinct problems, "
+          f"{batch['executor']} x{batch['workers']}, {batch['wall_time']}s")
+    for problem in batch["problems"]:
+        print(f"  #{problem['problem_id']} {problem['service_type']}: {problem['solver_status']} "
+              f"objective={problem['objective_value']} engine={problem['engine']} "
+              f"wall_time={problem['wall_time']} dates={', '.join(problem['dates'])}")
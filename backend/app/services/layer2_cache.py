@@ -0,0 +1,109 @@
+from typing import Dict, Any, Callable, Optional, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import copy
+import hashlib
+import json
+import os
+import threading
+
+# File digests keyed by path, reused while (mtime, size) are unchanged
+_digests: Dict[str, Tuple[int, int, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: Path) -> Optional[str]:
+    """sha1 of a file's content, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = str(path)
+    with _digests_lock:
+        cached = _digests.get(key)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    with _digests_lock:
+        _digests[key] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def content_key(**parts: Any) -> str:
+    """Stable hash of the inputs that determine a result"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Layer2ResultCache:
+    """LRU cache of Layer 2 results keyed by a content hash of their inputs.
+
+    Concurrent requests for the same key share one solve: the first caller
+    computes, the others wait for its result. Callers get deep copies, so
+    endpoints can annotate results freely.
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Dict[str, Any]],
+        cacheable: Callable[[Dict[str, Any]], bool] = lambda result: True
+    ) -> Dict[str, Any]:
+        while True:
+            with self._lock:
+                if key in self._results:
+                    self._results.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(self._results[key])
+                pending = self._inflight.get(key)
+                if pending is None:
+                    pending = self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    break
+                self.shared += 1
+            # Another request is solving the same inputs; wait and re-check
+            pending.wait()
+
+        try:
+            result = compute()
+            if cacheable(result):
+                with self._lock:
+                    self._results[key] = copy.deepcopy(result)
+                    if len(self._results) > self.max_size:
+                        self._results.popitem(last=False)
+                        self.evictions += 1
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set()
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._results),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_inflight": self.shared,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+layer2_cache = Layer2ResultCache()
@@ -0,0 +1,265 @@
+from typing import Dict, Any, List, Optional
+import copy
+import threading
+import time
+import numpy as np
+from ortools.sat.python import cp_model
+from app.utils.slot_assignment import BaySlotAssignmentEngine
+
+# Objective weights; any of them can be overridden per solve
+DEFAULT_WEIGHTS: Dict[str, int] = {
+    "readiness_weight": 1000,          # High weight for train readiness
+    "shunting_penalty": 5000,          # VERY HIGH penalty for shunting operations
+    "priority_slot_bonus": 2000,       # Bonus for high-readiness trains in priority slots (1-3)
+    "position_bonus_weight": 800,      # Bonus for trains in better positions (front of bay)
+    "branding_urgency_weight": 50      # Low weight; readiness + shunting dominate
+}
+SLOT_PREFERENCE_WEIGHT = 10  # Per readiness point, per slot earlier
+PRIORITY_SLOTS = [1, 2, 3]   # Top 3 slots are priority
+
+
+def resolve_weights(weights: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """DEFAULT_WEIGHTS with the given overrides; raises ValueError on unknown keys"""
+    weights = weights or {}
+    unknown = set(weights) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown Layer 2 weights: {', '.join(sorted(unknown))}. Known: {', '.join(DEFAULT_WEIGHTS)}")
+    resolved = dict(DEFAULT_WEIGHTS)
+    resolved.update({name: int(value) for name, value in weights.items() if value is not None})
+    return resolved
+
+
+def weights_from_params(params: Dict[str, Any]) -> Dict[str, int]:
+    """Layer 2 weights from an OptimizationParams dict.
+
+    prioritize_readiness=False drops the readiness selection bonus and
+    minimize_shunting=False drops the shunting penalty.
+    """
+    weights = {
+        "readiness_weight": params.get("readiness_weight"),
+        "shunting_penalty": params.get("shunting_penalty_weight"),
+        "priority_slot_bonus": params.get("priority_slot_bonus"),
+        "position_bonus_weight": params.get("position_bonus_weight"),
+        "branding_urgency_weight": params.get("branding_urgency_weight")
+    }
+    if params.get("prioritize_readiness") is False:
+        weights["readiness_weight"] = 0
+    if params.get("minimize_shunting") is False:
+        weights["shunting_penalty"] = 0
+    return resolve_weights(weights)
+
+
+def sample_weightings(samples: int, spread: float = 0.5, seed: Optional[int] = None) -> List[Dict[str, int]]:
+    """Weight vectors scattered around DEFAULT_WEIGHTS, each weight scaled by a
+    uniform factor in [1 - spread, 1 + spread]; the first one is the default"""
+    rng = np.random.default_rng(seed)
+    names = list(DEFAULT_WEIGHTS)
+    base = np.array([DEFAULT_WEIGHTS[name] for name in names], dtype=float)
+    factors = rng.uniform(max(0.0, 1 - spread), 1 + spread, size=(max(samples - 1, 0), len(names)))
+    weightings = [dict(DEFAULT_WEIGHTS)]
+    for row in np.rint(base * factors).astype(int):
+        weightings.append(dict(zip(names, row.tolist())))
+    return weightings[:samples]
+
+
+class Layer2ModelTemplate:
+    """Layer 2 slot model for one input set, built once and re-weighted per solve.
+
+    The constraints (slot filling, selection count, bay precedence and
+    shunting) do not depend on the objective weights, so the CP-SAT model is
+    built once and each solve gets a copy with its own objective. The exact
+    engine only needs the value matrix, recomputed from cached per-train
+    arrays.
+    """
+
+    def __init__(
+        self,
+        valid_trains: List[str],
+        bay_groups: Dict[str, List[str]],
+        train_positions: Dict[str, int],
+        readiness_lookup: Dict[str, float],
+        branding_urgency_lookup: Dict[str, float],
+        departure_slots: List[int],
+        max_trains_to_schedule: int
+    ):
+        self.valid_trains = valid_trains
+        self.bay_groups = bay_groups
+        self.train_positions = train_positions
+        self.departure_slots = departure_slots
+        self.max_trains_to_schedule = max_trains_to_schedule
+
+        self.readiness = np.array([int(readiness_lookup[t]) for t in valid_trains], dtype=np.int64)
+        self.branding = np.array([int(branding_urgency_lookup.get(t, 0)) for t in valid_trains], dtype=np.int64)
+        self.position = np.array([train_positions[t] for t in valid_trains], dtype=np.int64)
+        slots = np.asarray(departure_slots, dtype=np.int64)
+        self.early_factor = len(departure_slots) + 1 - slots
+        self.priority_cells = (self.readiness >= 90)[:, None] & np.isin(slots, PRIORITY_SLOTS)[None, :]
+
+        # Shunting only couples trains in the same bay
+        self.fits_fast_path = all(len(trains_in_bay) <= 2 for trains_in_bay in bay_groups.values())
+        index = {train: i for i, train in enumerate(valid_trains)}
+        self.pairs = [
+            (index[trains_in_bay[0]], index[trains_in_bay[1]])
+            for trains_in_bay in bay_groups.values()
+            if len(trains_in_bay) == 2
+            and train_positions[trains_in_bay[0]] < train_positions[trains_in_bay[1]]
+        ]
+
+        self._model: Optional[cp_model.CpModel] = None
+        self._lock = threading.Lock()
+        self.departure_vars: Dict[Any, Any] = {}
+        self.train_selected_vars: Dict[str, Any] = {}
+        self.shunting_vars: Dict[str, Any] = {}
+        self.priority_slot_vars: Dict[str, Any] = {}
+
+    def slot_values(self, weights: Dict[str, int]) -> np.ndarray:
+        """Objective gain of each train (rows) departing in each slot (columns),
+        shunting aside"""
+        selected = (
+            self.readiness * weights["readiness_weight"] // 100
+            + weights["position_bonus_weight"] // self.position
+        )
+        per_slot = self.early_factor[None, :] * (
+            self.readiness * SLOT_PREFERENCE_WEIGHT + self.branding * weights["branding_urgency_weight"]
+        )[:, None]
+        return selected[:, None] + per_slot + weights["priority_slot_bonus"] * self.priority_cells
+
+    def solve_fast(self, weights: Dict[str, int]) -> Dict[str, Any]:
+        """Exact plan for bays of at most two trains (see BaySlotAssignmentEngine)"""
+        started = time.perf_counter()
+        engine = BaySlotAssignmentEngine(weights["shunting_penalty"])
+        slot_of, shunted, objective = engine.solve(self.slot_values(weights), self.pairs)
+        return {
+            "slots": {
+                self.valid_trains[i]: self.departure_slots[s]
+                for i, s in enumerate(slot_of.tolist()) if s >= 0
+            },
+            "shunted": {self.valid_trains[i] for i in shunted},
+            "objective_value": objective,
+            "nodes_explored": engine.nodes_explored,
+            "wall_time": round(time.perf_counter() - started, 6)
+        }
+
+    def _build_model(self) -> cp_model.CpModel:
+        model = cp_model.CpModel()
+        valid_trains, departure_slots = self.valid_trains, self.departure_slots
+        train_positions = self.train_positions
+
+        # --- CP-SAT DECISION VARIABLES ---
+
+        # 1. Primary variable: train to departure slot assignment
+        departure_vars = {}
+        for train in valid_trains:
+            for slot_num in departure_slots:
+                departure_vars[train, slot_num] = model.NewBoolVar(f"dep_{train}_slot_{slot_num}")
+
+        # 2. Train selection variable
+        train_selected_vars = {}
+        for train in valid_trains:
+            train_selected_vars[train] = model.NewBoolVar(f"selected_{train}")
+
+        # 3. Shunting variables: whether a train requires shunting to depart
+        shunting_vars = {}
+        for train in valid_trains:
+            shunting_vars[train] = model.NewBoolVar(f"shunt_{train}")
+
+        # 4. Priority slot preference variables (for slots 1-3)
+        priority_slot_vars = {}
+        for train in valid_trains:
+            priority_slot_vars[train] = model.NewBoolVar(f"priority_{train}")
+
+        # --- CP-SAT CONSTRAINTS ---
+
+        # Each selected train gets exactly one departure slot
+        for train in valid_trains:
+            model.Add(sum(departure_vars[train, slot_num]
+                         for slot_num in departure_slots) == train_selected_vars[train])
+
+        # Each slot gets exactly one train
+        for slot_num in departure_slots:
+            model.Add(sum(departure_vars[train, slot_num] for train in valid_trains) == 1)
+
+        # Exactly max_trains_to_schedule trains must be selected
+        model.Add(sum(train_selected_vars[train] for train in valid_trains) == self.max_trains_to_schedule)
+
+        # Priority slot constraint - only for selected trains
+        for train in valid_trains:
+            # Create helper variable for priority slot assignment
+            priority_slot_assigned = model.NewBoolVar(f"priority_assigned_{train}")
+
+            # priority_slot_assigned is 1 if train gets any priority slot (1, 2, or 3)
+            model.Add(priority_slot_assigned == sum(departure_vars[train, slot_num]
+                                                   for slot_num in PRIORITY_SLOTS
+                                                   if slot_num in departure_slots))
+
+            # priority_slot_vars[train] is 1 if train is selected AND gets priority slot
+            model.AddBoolAnd([train_selected_vars[train], priority_slot_assigned]).OnlyEnforceIf(priority_slot_vars[train])
+            model.AddBoolOr([train_selected_vars[train].Not(), priority_slot_assigned.Not()]).OnlyEnforceIf(priority_slot_vars[train].Not())
+
+        # Departure rank per train: its slot number, 0 when not selected
+        max_slot = max(departure_slots)
+        rank_vars = {}
+        for train in valid_trains:
+            rank_vars[train] = model.NewIntVar(0, max_slot, f"rank_{train}")
+            model.Add(rank_vars[train] == sum(slot_num * departure_vars[train, slot_num]
+                                              for slot_num in departure_slots))
+
+        # Parking position and shunting constraints - KEY LOGIC FOR MINIMAL SHUNTING
+        for bay, trains_in_bay in self.bay_groups.items():
+            for train in trains_in_bay:
+                # If train is not selected, no shunting
+                model.AddImplication(train_selected_vars[train].Not(), shunting_vars[train].Not())
+            if len(trains_in_bay) <= 1:
+                # Single train bays - no shunting needed if selected
+                for train in trains_in_bay:
+                    model.Add(shunting_vars[train] == 0)
+                continue
+
+            # Multi-train bay constraints - CRITICAL SHUNTING LOGIC
+            # If train_a is behind train_b (higher position number) and both are
+            # selected, train_b needs shunting exactly when train_a leaves first.
+            # One precedence literal per pair replaces a literal per slot pair.
+            for train_a in trains_in_bay:
+                for train_b in trains_in_bay:
+                    if train_positions[train_a] <= train_positions[train_b]:
+                        continue
+
+                    leaves_first = model.NewBoolVar(f"leaves_first_{train_a}_{train_b}")
+                    both_selected = [train_selected_vars[train_a], train_selected_vars[train_b]]
+                    model.Add(rank_vars[train_a] < rank_vars[train_b]).OnlyEnforceIf(leaves_first)
+                    model.AddBoolAnd(both_selected).OnlyEnforceIf(leaves_first)
+                    # Both selected and not leaving first: train_a departs after train_b
+                    model.Add(rank_vars[train_a] > rank_vars[train_b]).OnlyEnforceIf(
+                        both_selected + [leaves_first.Not()]
+                    )
+                    model.AddImplication(leaves_first, shunting_vars[train_b])
+
+        self.departure_vars = departure_vars
+        self.train_selected_vars = train_selected_vars
+        self.shunting_vars = shunting_vars
+        self.priority_slot_vars = priority_slot_vars
+        return model
+
+    def build_cp_model(self, weights: Dict[str, int]) -> cp_model.CpModel:
+        """A copy of the constraint model with the objective for these weights.
+
+        The template's variables (departure_vars, shunting_vars, ...) index
+        into every copy.
+        """
+        with self._lock:
+            if self._model is None:
+                self._model = self._build_model()
+        model = copy.deepcopy(self._model)
+
+        # Selection terms fold into the slot terms: each selected train sits in
+        # exactly one slot. Shunting is penalised once per blocked train.
+        values = self.slot_values(weights)
+        variables, coefficients = [], []
+        for i, train in enumerate(self.valid_trains):
+            for j, slot_num in enumerate(self.departure_slots):
+                variables.append(self.departure_vars[train, slot_num])
+                coefficients.append(int(values[i, j]))
+            variables.append(self.shunting_vars[train])
+            coefficients.append(-weights["shunting_penalty"])
+        model.Maximize(cp_model.LinearExpr.WeightedSum(variables, coefficients))
+        return model
@@ -1,116 +1,68 @@
 from ortools.sat.python import cp_model
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional, Tuple
 from datetime import datetime, date, timedelta
 import json
+import logging
 from pathlib import Path
-import holidays
 import os
-
-def load_layer1_output() -> Dict[str, Any]:
-    """Load the actual output from Layer 1 optimization"""
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
+import numpy as np
+from app.utils.warm_start import apply_hints, layer2_slots_from_output, warm_start_report
+from app.utils.anytime import AnytimeCallback, solve_anytime
+from app.utils.solver_profiles import configure_solver
+from app.utils.solver_telemetry import attach_solve_log, cp_sat_telemetry, exact_engine_telemetry, solver_telemetry
+from app.services.timetable_calendar import get_timetable_calendar, build_slot_grid, DEFAULT_LINE
+from app.services.layer2_cache import layer2_cache, content_key
+from app.services.layer2_model import Layer2ModelTemplate, resolve_weights, PRIORITY_SLOTS
+from app.services.schedule_context import ScheduleContext, get_schedule_context
+
+logger = logging.getLogger(__name__)
+
+def _layer2_output_path() -> Path:
+    return Path(__file__).parent.parent.parent / "data" / "layer2_output.json"
+
+def load_layer2_output() -> Dict[str, Any]:
+    """Load the last persisted Layer 2 result (used to warm-start the next solve)"""
     try:
-        output_path = Path(__file__).parent.parent.parent / "data" / "output.json"
-        with open(output_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Fallback to test data if output.json doesn't exist
-        test_path = Path(__file__).parent.parent / "test_data.json"
-        with test_path.open() as f:
+        with _layer2_output_path().open("r", encoding="utf-8") as f:
             return json.load(f)
-
-def load_parking_override() -> List[Dict[str, Any]]:
-    """Optionally load parking.json (synthetic for now) to override parking assignments.
-    Expected format: [{"train_id": "TM001", "bay": "PT01", "position": 1}, ...]
-    """
-    try:
-        path = Path(__file__).parent.parent.parent / "data" / "parking.json"
-        if path.exists():
-            with path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    return data
     except Exception:
-        pass
-    return []
+        return {}
 
-def convert_layer1_to_layer2_format(layer1_output: Dict[str, Any]) -> Dict[str, Any]:
-    """Convert Layer 1 output format to Layer 2 input format"""
-    
-    # Extract parking assignments from optional parking.json override, else Layer 1
-    override = load_parking_override()
-    if override:
-        parking_assignments = override
-    else:
-        parking_assignments = []
-        for assignment in layer1_output.get("parking_assignments", []):
-            parking_assignments.append({
-                "train_id": assignment["train_id"],
-                "bay": assignment["track_id"],
-                "position": assignment["position_in_track"]
-            })
-    
-    # Extract readiness data
-    readiness_data = []
-    for item in layer1_output.get("readiness_scores", []):
-        # Add a top-level summary for validation/UI convenience
-        details_dict = item.get("details", {}) or {}
-        summary_text = details_dict.get("summary") or details_dict.get("combined") or item.get("summary") or ""
-        new_item = dict(item)
-        new_item["summary"] = summary_text
-        readiness_data.append(new_item)
-    
-    return {
-        "parking": {
-            "assignments": parking_assignments,
-            "total_shunting_moves": layer1_output.get("total_shunting_moves", 0),
-            "optimization_date": layer1_output.get("metadata", {}).get("processing_time", datetime.now().isoformat())
-        },
-        "readiness": readiness_data,
-        "trains_to_service": layer1_output.get("trains_to_service", []),
-        "trains_to_standby": layer1_output.get("trains_to_standby", []),
-        "trains_to_ibl": layer1_output.get("trains_to_ibl", [])
-    }
+def save_layer2_output(result: Dict[str, Any]):
+    """Persist a Layer 2 result so the next solve can warm-start from it.
 
-def get_timetable_config(service_date=None):
-    """Get the appropriate timetable configuration based on date"""
-    if service_date is None:
-        service_date = date.today()
-    
-    # Check if it's a public holiday in Kerala, India
+    Written to a temp file beside layer2_output.json and swapped in with
+    os.replace, so a concurrent warm start reads the old or the new result,
+    never half a file.
+    """
+    path = _layer2_output_path()
+    tmp_path = None
     try:
-        in_holidays = holidays.India(subdiv='KL', years=service_date.year)
-        is_public_holiday = service_date in in_holidays
-    except:
-        # Fallback if holidays package is not available
-        is_public_holiday = False
-    
-    if is_public_holiday:
-        # Public holiday timetable
-        return {
-            "first_service": "06:00",
-            "last_service": "22:30",
-            "peak_hours": [(8, 20)],  # 08:00-20:00
-            "peak_headway": 9.75,     # 9 minutes 45 seconds
-            "off_peak_headway": 11,   # 11 minutes
-            "service_type": "public_holiday"
-        }
-    else:
-        # Regular day timetable
-        return {
-            "first_service": "07:30",
-            "last_service": "22:30",
-            "peak_hours": [(8, 20)],  # 08:00-20:00
-            "peak_headway": 9.083,    # 9 minutes 5 seconds
-            "off_peak_headway": 9.083, # Same as peak for regular days
-            "service_type": "regular"
-        }
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        # mkstemp files are owner-only; keep the permissions of the file being replaced
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if path.exists() else 0o644)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Could not persist Layer 2 output: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def get_timetable_config(service_date=None, line: str = DEFAULT_LINE):
+    """Get the appropriate timetable configuration based on date (precompiled calendar lookup)"""
+    return get_timetable_calendar().config(service_date, line)
 
 def _generate_scheduling_rationale(
     train_id: str, 
     train_positions: Dict, 
     bay_assignments: Dict, 
     readiness_lookup: Dict,
-    all_valid_trains: List[str],
+    same_bay_trains: List[str],
     chosen_slot: int,
     needs_shunting: bool,
     got_priority_slot: bool,
@@ -140,10 +92,6 @@ def _generate_scheduling_rationale(
             elif "⚠️" in combined:
                 layer1_info = "Had warnings in Layer 1"
     
-    # Find other trains in same bay for comparison
-    same_bay_trains = [t for t in all_valid_trains 
-                      if bay_assignments[t] == train_bay and t != train_id]
-    
     rationale = {
         "primary_reason": "",
         "secondary_factors": [],
@@ -194,7 +142,7 @@ def _generate_not_selected_rationale(
     train_positions: Dict,
     bay_assignments: Dict,
     readiness_lookup: Dict,
-    all_valid_trains: List[str],
+    same_bay_trains: List[str],
     layer1_details: Dict[str, Any] = None
 ) -> Dict[str, Any]:
     """Generate rationale for why this train was NOT selected"""
@@ -220,10 +168,6 @@ def _generate_not_selected_rationale(
         "layer1_considerations": layer1_info
     }
     
-    # Find other trains in same bay
-    same_bay_trains = [t for t in all_valid_trains 
-                      if bay_assignments[t] == train_bay and t != train_id]
-    
     if train_readiness < 70:  # Lower threshold for rejection
         rationale["primary_reason"] = "low_readiness_score"
         rationale["readiness_factor"] = f"Readiness score ({train_readiness}%) below competitive threshold"
@@ -244,23 +188,115 @@ def _generate_not_selected_rationale(
     
     return rationale
 
-def generate_departure_slots(timetable_config, max_slots=10):
-    """Generate slot numbers 1..max_slots (default 10)."""
-    return list(range(1, max_slots + 1))
+def _bay_index(result: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Bay -> trains parked there (front to back), built once per plan"""
+    bays: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in result.get("optimized_assignments", []) + result.get("standby_trains", []):
+        bays.setdefault(entry.get("bay", "Unknown"), []).append(entry)
+    return {
+        bay: [e["train_id"] for e in sorted(entries, key=lambda e: e.get("bay_position", 1))]
+        for bay, entries in bays.items()
+    }
+
+def attach_rationales(result: Dict[str, Any], train_ids: List[str] = None) -> Dict[str, Any]:
+    """Add scheduling_rationale to the plan's assignments and standby trains.
+
+    All lookups come from the plan itself, with same-bay comparisons read
+    from one bay index instead of scanning every train. train_ids limits the
+    work to those trains. Returns the (annotated) result.
+    """
+    assignments = result.get("optimized_assignments", [])
+    standby = result.get("standby_trains", [])
+    entries = assignments + standby
+    if not entries:
+        return result
+
+    bay_index = _bay_index(result)
+    train_positions = {e["train_id"]: e.get("bay_position", 1) for e in entries}
+    bay_assignments = {e["train_id"]: e.get("bay", "Unknown") for e in entries}
+    readiness_lookup = {e["train_id"]: e.get("readiness", 0) for e in entries}
+    layer1_details = {e["train_id"]: {"details": e.get("readiness_details", {}) or {}} for e in entries}
+    wanted = set(train_ids) if train_ids is not None else None
+
+    def others_in_bay(train: str) -> List[str]:
+        return [t for t in bay_index.get(bay_assignments[train], []) if t != train]
+
+    for assignment in assignments:
+        train = assignment["train_id"]
+        if wanted is not None and train not in wanted:
+            continue
+        chosen_slot = assignment["departure_slot"]
+        rationale = _generate_scheduling_rationale(
+            train, train_positions, bay_assignments, readiness_lookup,
+            others_in_bay(train), chosen_slot, assignment.get("needs_shunting", False),
+            assignment.get("is_priority_slot", False), layer1_details
+        )
+        # Add branding rationale when applicable
+        if assignment.get("branding_urgency", 0) > 0 and chosen_slot <= 3:
+            rationale["secondary_factors"].append("Branding urgency prioritized for peak exposure")
+        assignment["scheduling_rationale"] = rationale
+
+    for train_data in standby:
+        train = train_data["train_id"]
+        if wanted is not None and train not in wanted:
+            continue
+        train_data["scheduling_rationale"] = _generate_not_selected_rationale(
+            train, train_positions, bay_assignments, readiness_lookup,
+            others_in_bay(train), layer1_details
+        )
+    return result
+
+def explain_train(result: Dict[str, Any], train_id: str) -> Optional[Dict[str, Any]]:
+    """Rationale for one train in a plan, or None if the train is not in it"""
+    attach_rationales(result, [train_id])
+    for status, entries in (("scheduled", result.get("optimized_assignments", [])),
+                            ("standby", result.get("standby_trains", []))):
+        for entry in entries:
+            if entry["train_id"] == train_id:
+                return {
+                    "train_id": train_id,
+                    "status": status,
+                    "bay": entry.get("bay"),
+                    "bay_position": entry.get("bay_position"),
+                    "readiness": entry.get("readiness"),
+                    "departure_slot": entry.get("departure_slot"),
+                    "departure_time": entry.get("departure_time"),
+                    "scheduling_rationale": entry["scheduling_rationale"]
+                }
+    return None
+
+# Trains inducted per service day unless the caller asks for more
+MAX_TRAINS_TO_SCHEDULE = 10
+
+# "auto" uses the exact engine when every bay holds at most two trains
+LAYER2_ENGINES = ("auto", "fast", "cp_sat", "crosscheck")
+ENGINE_LABELS = {"fast": "Exact Assignment", "cp_sat": "CP-SAT Optimized", "crosscheck": "CP-SAT Optimized"}
+# optimization_summary["constraint_programming"] per engine actually used
+ENGINE_METHODS = {
+    "fast": "Exact assignment (min-cost flow with best-first shunting branches); no CP-SAT",
+    "cp_sat": "Full CP-SAT with logical constraints",
+    "crosscheck": "Full CP-SAT with logical constraints, checked against the exact assignment engine"
+}
+
+def generate_departure_slots(timetable_config, max_slots=None):
+    """Slot numbers 1..N for the day's departure grid, truncated to max_slots if given."""
+    total = len(get_timetable_calendar().slot_grid(timetable_config))
+    if max_slots is not None:
+        total = min(total, max_slots)
+    return list(range(1, total + 1))
 
 def compute_departure_times(timetable_config: Dict[str, Any], departure_slots: List[int]) -> Dict[int, str]:
-    """Compute HH:MM departure time for each slot at fixed 10-minute gaps from first_service."""
-    try:
-        first = timetable_config.get("first_service", "07:30")
-        hours, minutes = map(int, first.split(":"))
-    except Exception:
-        hours, minutes = 7, 30
-    start = datetime(2000, 1, 1, hours, minutes)
-    slot_to_time = {}
-    for slot in sorted(departure_slots):
-        dt = start + timedelta(minutes=(slot - 1) * 10)
-        slot_to_time[slot] = dt.strftime("%H:%M")
-    return slot_to_time
+    """HH:MM departure time of each slot, read from the headway grid in one vectorized pass."""
+    grid = get_timetable_calendar().slot_grid(timetable_config)
+    slots = np.asarray(sorted(departure_slots), dtype=int)
+    if not len(slots):
+        return {}
+    seconds = np.round(grid[np.clip(slots - 1, 0, len(grid) - 1)] * 60).astype(int)
+    hours, minutes = (seconds // 3600) % 24, (seconds % 3600) // 60
+    return {
+        int(slot): f"{h:02d}:{m:02d}"
+        for slot, h, m in zip(slots.tolist(), hours.tolist(), minutes.tolist())
+    }
 
 def run_layer2_service(
     parking_json: Dict[str, Any] = None,
@@ -268,282 +304,428 @@ def run_layer2_service(
     ads_json: List[Dict[str, Any]] = None,  # Keep parameter for compatibility but ignore
     service_day: str = "weekday",
     service_date: date = None,
-    use_layer1_output: bool = True  # New parameter to use actual Layer 1 output
+    use_layer1_output: bool = True,  # New parameter to use actual Layer 1 output
+    warm_start: bool = False,
+    relative_gap: float = None,
+    listener: Callable[[Dict[str, Any]], None] = None,
+    stop_event: threading.Event = None,
+    solver_profile: str = None,
+    max_trains_to_schedule: int = MAX_TRAINS_TO_SCHEDULE,
+    include_rationale: bool = True,
+    engine: str = "auto",
+    weights: Dict[str, Any] = None,
+    time_limit: float = None,
+    schedule_context: ScheduleContext = None,
+    persist: bool = True
 ) -> Dict[str, Any]:
     """
     Layer 2 optimization: Slot-based train scheduling (1-8 slots)
     Focus on readiness score and minimizing shunting operations
-    """
-    try:
-        # Use Layer 1 output if requested and available
-        if use_layer1_output:
-            try:
-                layer1_output = load_layer1_output()
-                if layer1_output and "readiness_scores" in layer1_output:
-                    converted_data = convert_layer1_to_layer2_format(layer1_output)
-                    parking_json = converted_data["parking"]
-                    readiness_json = converted_data["readiness"]
-                    print("✅ Using actual Layer 1 output data")
-            except Exception as e:
-                print(f"⚠️ Could not load Layer 1 output, using provided data: {e}")
-                use_layer1_output = False
-        
-        # If no data provided, use Layer 1 output
-        if parking_json is None or readiness_json is None:
-            layer1_output = load_layer1_output()
-            converted_data = convert_layer1_to_layer2_format(layer1_output)
-            parking_json = converted_data["parking"]
-            readiness_json = converted_data["readiness"]
-            use_layer1_output = True
-        
-        model = cp_model.CpModel()
 
-        # Extract trains and bay information with positions
-        assigned_trains = []
-        bay_assignments = {}
-        train_positions = {}
-        
-        if "assignments" in parking_json:
-            for assignment in parking_json["assignments"]:
-                train_id = assignment["train_id"]
-                bay_id = assignment["bay"]
-                position = assignment.get("position", 1)  # Default to position 1 (front)
-                
-                assigned_trains.append(train_id)
-                bay_assignments[train_id] = bay_id
-                train_positions[train_id] = position
+    Runs on the persisted Layer 1 output are served from a content-addressed
+    cache keyed by output.json, parking.json, the service date, timetable
+    type and solver settings; streamed runs always solve live.
+    Per-train scheduling rationales are attached after the solve (and after
+    the cache) only when include_rationale is set.
+    engine picks the solver: "auto" (exact assignment engine when every bay
+    holds at most two trains, else CP-SAT), "fast", "cp_sat", or
+    "crosscheck" (CP-SAT plan, compared against the exact engine).
+    warm_start, relative_gap, solver_profile and time_limit only steer
+    CP-SAT; when the exact engine runs they are listed in the result's
+    "ignored_options" (pass engine="cp_sat" to use them).
+    weights overrides objective weights (see layer2_model.DEFAULT_WEIGHTS);
+    time_limit caps the CP-SAT time budget in seconds.
+    schedule_context is the request's already-loaded Layer 1 output; it is
+    fetched (see schedule_context.get_schedule_context) when omitted.
+    persist=False keeps the plan out of data/layer2_output.json (the next
+    night's warm start), e.g. for plans of other dates.
+    """
+    weights = resolve_weights(weights)
+    if use_layer1_output and schedule_context is None:
+        schedule_context = get_schedule_context()
+
+    def solve() -> Dict[str, Any]:
+        return _solve_layer2(
+            parking_json, readiness_json, ads_json, service_day, service_date,
+            use_layer1_output, warm_start, relative_gap, listener, stop_event,
+            solver_profile, max_trains_to_schedule, engine, weights, time_limit,
+            schedule_context, persist
+        )
+
+    def finish(result: Dict[str, Any]) -> Dict[str, Any]:
+        return attach_rationales(result) if include_rationale else result
+
+    layer1_digest = schedule_context.layer1_digest if use_layer1_output else None
+    if layer1_digest is None or listener is not None or stop_event is not None:
+        return finish(solve())
+
+    target_date = service_date or date.today()
+    key = content_key(
+        layer1_output=layer1_digest,
+        parking=schedule_context.parking_digest,
+        service_date=target_date.isoformat(),
+        timetable=get_timetable_config(target_date)["service_type"],
+        warm_start=warm_start,
+        relative_gap=relative_gap,
+        solver_profile=solver_profile,
+        max_trains_to_schedule=max_trains_to_schedule,
+        engine=engine,
+        weights=weights,
+        time_limit=time_limit
+    )
+    return finish(layer2_cache.get_or_compute(
+        key, solve, cacheable=lambda result: result.get("solver_status") in ("OPTIMAL", "FEASIBLE")
+    ))
+
+def _prepare_layer2_context(
+    parking_json: Dict[str, Any] = None,
+    readiness_json: List[Dict[str, Any]] = None,
+    service_date: date = None,
+    use_layer1_output: bool = True,
+    max_trains_to_schedule: int = MAX_TRAINS_TO_SCHEDULE,
+    schedule_context: ScheduleContext = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Lookups, slot grid, bay groups and model template a Layer 2 solve works from.
+
+    Returns (context, None), or (None, error_result) when the inputs hold
+    no schedulable trains. Inputs taken from the schedule context are
+    memoized on it and must be treated as read-only.
+    """
+    # Use Layer 1 output if requested and available
+    if use_layer1_output:
+        try:
+            schedule_context = schedule_context or get_schedule_context()
+        except Exception as e:
+            logger.warning(f"Could not load Layer 1 output, using provided data: {e}")
+            use_layer1_output = False
         else:
-            # Legacy format handling
-            assigned_trains = list(parking_json.keys()) if isinstance(parking_json, dict) else []
-            bay_assignments = parking_json if isinstance(parking_json, dict) else {}
-            # Assign default positions
-            for train in assigned_trains:
-                train_positions[train] = 1
-        
-        if not assigned_trains:
-            return {"status": "No trains assigned from Layer 1", "error": "Invalid input format"}
-
-        # Create readiness lookup and Layer 1 details lookup
-        readiness_lookup = {}
-        readiness_summaries = {}
-        layer1_details_lookup = {}
-        branding_urgency_lookup = {}
-        
-        for train_data in readiness_json:
-            train_id = train_data["train_id"]
-            readiness_lookup[train_id] = train_data.get("score", 0)
-            details_dict = train_data.get("details", {}) or {}
-            summary_text = details_dict.get("summary") or train_data.get("summary") or details_dict.get("combined") or "No summary available"
-            readiness_summaries[train_id] = {
-                "summary": summary_text,
-                "details": details_dict
-            }
-            layer1_details_lookup[train_id] = train_data
-            # Branding urgency derived from breakdown (values >100 indicate urgency)
-            breakdown = train_data.get("breakdown", {}) or {}
-            branding_score = breakdown.get("branding_contracts", 100)
-            branding_urgency_lookup[train_id] = max(0.0, float(branding_score) - 100.0)
-        
-        valid_trains = [t for t in assigned_trains if t in readiness_lookup]
-        
-        if not valid_trains:
-            return {"status": "No valid trains with both parking and readiness data"}
-
-        # Get timetable configuration and generate 8 slots
-        timetable_config = get_timetable_config(service_date)
-        # Schedule exactly 10 trains as per requirements
-        departure_slots = generate_departure_slots(timetable_config, max_slots=10)
-        max_trains_to_schedule = 10
-        slot_to_time = compute_departure_times(timetable_config, departure_slots)
-        
-        print(f"Debug: Valid trains: {len(valid_trains)}, Available slots: {len(departure_slots)}")
-        print(f"Debug: Will schedule exactly {max_trains_to_schedule} trains")
-
-        # Group trains by bay for constraint creation
-        bay_groups = {}
-        for train in valid_trains:
-            bay = bay_assignments[train]
-            if bay not in bay_groups:
-                bay_groups[bay] = []
-            bay_groups[bay].append(train)
-
-        # Sort trains within each bay by position for debugging
-        for bay in bay_groups:
-            bay_groups[bay].sort(key=lambda t: train_positions[t])
-            print(f"Debug: Bay {bay} - Trains by position: {[(t, train_positions[t], readiness_lookup[t]) for t in bay_groups[bay]]}")
-
-        # --- CP-SAT DECISION VARIABLES ---
-        
-        # 1. Primary variable: train to departure slot assignment
-        departure_vars = {}
-        for train in valid_trains:
-            for slot_num in departure_slots:
-                departure_vars[train, slot_num] = model.NewBoolVar(f"dep_{train}_slot_{slot_num}")
-
-        # 2. Train selection variable
-        train_selected_vars = {}
-        for train in valid_trains:
-            train_selected_vars[train] = model.NewBoolVar(f"selected_{train}")
-
-        # 3. Shunting variables: whether a train requires shunting to depart
-        shunting_vars = {}
-        for train in valid_trains:
-            shunting_vars[train] = model.NewBoolVar(f"shunt_{train}")
-
-        # 4. Priority slot preference variables (for slots 1-3)
-        priority_slot_vars = {}
-        priority_slots = [1, 2, 3]  # Top 3 slots are priority
-        
-        for train in valid_trains:
-            priority_slot_vars[train] = model.NewBoolVar(f"priority_{train}")
-
-        # --- CP-SAT CONSTRAINTS ---
-        
-        # Each selected train gets exactly one departure slot
-        for train in valid_trains:
-            model.Add(sum(departure_vars[train, slot_num] 
-                         for slot_num in departure_slots) == train_selected_vars[train])
-        
-        # Each slot gets exactly one train
-        for slot_num in departure_slots:
-            model.Add(sum(departure_vars[train, slot_num] for train in valid_trains) == 1)
-
-        # Exactly 8 trains must be selected
-        model.Add(sum(train_selected_vars[train] for train in valid_trains) == max_trains_to_schedule)
-
-        # Priority slot constraint - only for selected trains
-        for train in valid_trains:
-            # Create helper variable for priority slot assignment
-            priority_slot_assigned = model.NewBoolVar(f"priority_assigned_{train}")
-            
-            # priority_slot_assigned is 1 if train gets any priority slot (1, 2, or 3)
-            model.Add(priority_slot_assigned == sum(departure_vars[train, slot_num] 
-                                                   for slot_num in priority_slots))
-            
-            # priority_slot_vars[train] is 1 if train is selected AND gets priority slot
-            model.AddBoolAnd([train_selected_vars[train], priority_slot_assigned]).OnlyEnforceIf(priority_slot_vars[train])
-            model.AddBoolOr([train_selected_vars[train].Not(), priority_slot_assigned.Not()]).OnlyEnforceIf(priority_slot_vars[train].Not())
-
-        # Parking position and shunting constraints - KEY LOGIC FOR MINIMAL SHUNTING
-        for bay, trains_in_bay in bay_groups.items():
-            if len(trains_in_bay) <= 1:
-                # Single train bays - no shunting needed if selected
-                for train in trains_in_bay:
-                    # If train is not selected, shunting should be 0
-                    model.AddImplication(train_selected_vars[train].Not(), shunting_vars[train].Not())
-                    # If train is selected, no shunting needed (single train bay)
-                    model.AddImplication(train_selected_vars[train], shunting_vars[train].Not())
-                continue
-            
-            # Multi-train bay constraints - CRITICAL SHUNTING LOGIC
-            for train_a in trains_in_bay:
-                # If train is not selected, no shunting
-                model.AddImplication(train_selected_vars[train_a].Not(), shunting_vars[train_a].Not())
-                
-                for train_b in trains_in_bay:
-                    if train_a == train_b:
-                        continue
-                    
-                    pos_a = train_positions[train_a]
-                    pos_b = train_positions[train_b]
-                    
-                    # If train_a is behind train_b (higher position number)
-                    # AND train_a needs to leave before train_b, then train_b needs shunting
-                    if pos_a > pos_b:
-                        for slot_a in departure_slots:
-                            for slot_b in departure_slots:
-                                if slot_a < slot_b:  # train_a gets earlier slot (leaves before train_b)
-                                    # Create a constraint variable for this specific condition
-                                    constraint_var = model.NewBoolVar(f"shunt_constraint_{train_a}_slot_{slot_a}_{train_b}_slot_{slot_b}")
-                                    
-                                    # constraint_var is true when all conditions are met:
-                                    model.Add(constraint_var <= departure_vars[train_a, slot_a])
-                                    model.Add(constraint_var <= departure_vars[train_b, slot_b])
-                                    model.Add(constraint_var <= train_selected_vars[train_a])
-                                    model.Add(constraint_var <= train_selected_vars[train_b])
-                                    model.Add(constraint_var >= (departure_vars[train_a, slot_a] + 
-                                                               departure_vars[train_b, slot_b] + 
-                                                               train_selected_vars[train_a] + 
-                                                               train_selected_vars[train_b] - 3))
-                                    
-                                    # When constraint is active, train_b needs shunting
-                                    model.AddImplication(constraint_var, shunting_vars[train_b])
-
-        # --- OBJECTIVE FUNCTION: Focus on readiness and minimize shunting ---
-        objective_terms = []
-        
-        # Optimization weights
-        READINESS_WEIGHT = 1000          # High weight for train readiness
-        SHUNTING_PENALTY = 5000          # VERY HIGH penalty for shunting operations
-        PRIORITY_SLOT_BONUS = 2000       # Bonus for high-readiness trains in priority slots (1-3)
-        POSITION_BONUS_WEIGHT = 800      # Bonus for trains in better positions (front of bay)
-        BRANDING_URGENCY_WEIGHT = 50     # Low weight; readiness + shunting dominate
-        
-        # 1. Readiness score optimization
-        for train in valid_trains:
-            readiness_score = int(readiness_lookup[train])
-            
-            # Base readiness bonus for being selected
-            objective_terms.append((readiness_score * READINESS_WEIGHT // 100) * train_selected_vars[train])
+            if schedule_context.has_readiness:
+                logger.debug("Using actual Layer 1 output data")
+                # Built once per version of the Layer 1 output, date and train count
+                key = ("layer2_inputs", (service_date or date.today()).isoformat(), max_trains_to_schedule)
+                return schedule_context.derived(key, lambda: _build_layer2_inputs(
+                    schedule_context.parking, schedule_context.readiness, service_date, True, max_trains_to_schedule
+                ))
+    
+    # If no data provided, use Layer 1 output
+    if parking_json is None or readiness_json is None:
+        schedule_context = schedule_context or get_schedule_context()
+        parking_json = schedule_context.parking
+        readiness_json = schedule_context.readiness
+        use_layer1_output = True
+
+    return _build_layer2_inputs(parking_json, readiness_json, service_date, use_layer1_output, max_trains_to_schedule)
+
+def _build_layer2_inputs(
+    parking_json: Dict[str, Any],
+    readiness_json: List[Dict[str, Any]],
+    service_date: date,
+    use_layer1_output: bool,
+    max_trains_to_schedule: int
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    # Extract trains and bay information with positions
+    assigned_trains = []
+    bay_assignments = {}
+    train_positions = {}
+    
+    if "assignments" in parking_json:
+        for assignment in parking_json["assignments"]:
+            train_id = assignment["train_id"]
+            bay_id = assignment["bay"]
+            position = assignment.get("position", 1)  # Default to position 1 (front)
             
-            for slot_num in departure_slots:
-                # Higher bonus for earlier slots (slot 1 gets highest bonus), scaled by readiness
-                early_factor = (len(departure_slots) + 1 - slot_num)
-                slot_preference = early_factor * readiness_score * 10
-                objective_terms.append(slot_preference * departure_vars[train, slot_num])
-                # Branding urgency prefers earlier slots
-                branding_urgency = int(branding_urgency_lookup.get(train, 0))
-                if branding_urgency > 0:
-                    branding_bonus = early_factor * branding_urgency * BRANDING_URGENCY_WEIGHT
-                    objective_terms.append(branding_bonus * departure_vars[train, slot_num])
-                
-                # Extra bonus for high-readiness trains getting priority slots (1-3)
-                if readiness_score >= 90 and slot_num in priority_slots:
-                    objective_terms.append(PRIORITY_SLOT_BONUS * departure_vars[train, slot_num])
-
-        # 2. Position-based bonus (trains in front positions get slight preference)
-        for train in valid_trains:
-            position = train_positions[train]
-            # Front position (1) gets highest bonus, decreasing for higher positions
-            position_bonus = POSITION_BONUS_WEIGHT // position
-            objective_terms.append(position_bonus * train_selected_vars[train])
-
-        # 3. HEAVY shunting penalty - this is the key to minimize shunting
-        for train in valid_trains:
-            objective_terms.append(-SHUNTING_PENALTY * shunting_vars[train])
+            assigned_trains.append(train_id)
+            bay_assignments[train_id] = bay_id
+            train_positions[train_id] = position
+    else:
+        # Legacy format handling
+        assigned_trains = list(parking_json.keys()) if isinstance(parking_json, dict) else []
+        bay_assignments = parking_json if isinstance(parking_json, dict) else {}
+        # Assign default positions
+        for train in assigned_trains:
+            train_positions[train] = 1
+    
+    if not assigned_trains:
+        return None, {"status": "No trains assigned from Layer 1", "error": "Invalid input format"}
 
-        # Set the objective
-        model.Maximize(sum(objective_terms))
+    # Create readiness lookup
+    readiness_lookup = {}
+    readiness_summaries = {}
+    branding_urgency_lookup = {}
+    
+    for train_data in readiness_json:
+        train_id = train_data["train_id"]
+        readiness_lookup[train_id] = train_data.get("score", 0)
+        details_dict = train_data.get("details", {}) or {}
+        summary_text = details_dict.get("summary") or train_data.get("summary") or details_dict.get("combined") or "No summary available"
+        readiness_summaries[train_id] = {
+            "summary": summary_text,
+            "details": details_dict
+        }
+        # Branding urgency derived from breakdown (values >100 indicate urgency)
+        breakdown = train_data.get("breakdown", {}) or {}
+        branding_score = breakdown.get("branding_contracts", 100)
+        branding_urgency_lookup[train_id] = max(0.0, float(branding_score) - 100.0)
+    
+    valid_trains = [t for t in assigned_trains if t in readiness_lookup]
+    
+    if not valid_trains:
+        return None, {"status": "No valid trains with both parking and readiness data"}
+
+    # Get timetable configuration and the day's headway slot grid
+    timetable_config = get_timetable_config(service_date)
+    day_slot_count = len(generate_departure_slots(timetable_config))
+    # Schedule exactly 10 trains as per requirements (or as many as are available)
+    max_trains_to_schedule = min(max_trains_to_schedule, len(valid_trains), day_slot_count)
+    # Every slot term in the objective is non-increasing in slot number, so an
+    # optimal plan always fills the earliest slots: the model only needs the
+    # first max_trains_to_schedule slots of the grid, however long the day is
+    departure_slots = generate_departure_slots(timetable_config, max_slots=max_trains_to_schedule)
+    slot_to_time = compute_departure_times(timetable_config, departure_slots)
+    
+    logger.debug(f"Valid trains: {len(valid_trains)}, Available slots: {len(departure_slots)}")
+    logger.debug(f"Will schedule exactly {max_trains_to_schedule} trains")
+
+    # Group trains by bay for constraint creation
+    bay_groups = {}
+    for train in valid_trains:
+        bay = bay_assignments[train]
+        if bay not in bay_groups:
+            bay_groups[bay] = []
+        bay_groups[bay].append(train)
+
+    # Sort trains within each bay by position for debugging
+    for bay in bay_groups:
+        bay_groups[bay].sort(key=lambda t: train_positions[t])
+        logger.debug(f"Bay {bay} - Trains by position: {[(t, train_positions[t], readiness_lookup[t]) for t in bay_groups[bay]]}")
 
-        # --- SOLVE THE MODEL ---
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = 120
-        solver.parameters.log_search_progress = False
+    return {
+        "use_layer1_output": use_layer1_output,
+        "bay_assignments": bay_assignments,
+        "train_positions": train_positions,
+        "readiness_lookup": readiness_lookup,
+        "readiness_summaries": readiness_summaries,
+        "branding_urgency_lookup": branding_urgency_lookup,
+        "valid_trains": valid_trains,
+        "timetable_config": timetable_config,
+        "day_slot_count": day_slot_count,
+        "max_trains_to_schedule": max_trains_to_schedule,
+        "departure_slots": departure_slots,
+        "slot_to_time": slot_to_time,
+        "bay_groups": bay_groups,
+        # --- MODEL TEMPLATE: constraints are independent of the weights ---
+        "template": Layer2ModelTemplate(
+            valid_trains, bay_groups, train_positions, readiness_lookup,
+            branding_urgency_lookup, departure_slots, max_trains_to_schedule
+        )
+    }, None
+
+def _solve_layer2(
+    parking_json: Dict[str, Any] = None,
+    readiness_json: List[Dict[str, Any]] = None,
+    ads_json: List[Dict[str, Any]] = None,  # Keep parameter for compatibility but ignore
+    service_day: str = "weekday",
+    service_date: date = None,
+    use_layer1_output: bool = True,  # New parameter to use actual Layer 1 output
+    warm_start: bool = False,
+    relative_gap: float = None,
+    listener: Callable[[Dict[str, Any]], None] = None,
+    stop_event: threading.Event = None,
+    solver_profile: str = None,
+    max_trains_to_schedule: int = MAX_TRAINS_TO_SCHEDULE,
+    engine: str = "auto",
+    weights: Dict[str, Any] = None,
+    time_limit: float = None,
+    schedule_context: ScheduleContext = None,
+    persist: bool = True
+) -> Dict[str, Any]:
+    """
+    Solve the Layer 2 model (uncached)
+
+    warm_start hints the last persisted slot assignment (data/layer2_output.json);
+    relative_gap stops the search once within that fraction of optimal.
+    listener receives every improving solution; stop_event ends the search
+    early with the best slot plan so far. solver_profile picks workers, time
+    budget, gap and presolve (see app.utils.solver_profiles).
+    max_trains_to_schedule trains are inducted into the first slots of the
+    day's headway grid. engine is one of LAYER2_ENGINES. weights override
+    the objective weights; time_limit caps the CP-SAT budget.
+    """
+    try:
+        context, error_result = _prepare_layer2_context(
+            parking_json, readiness_json, service_date, use_layer1_output, max_trains_to_schedule,
+            schedule_context
+        )
+        if error_result is not None:
+            return error_result
+        use_layer1_output = context["use_layer1_output"]
+        bay_assignments = context["bay_assignments"]
+        train_positions = context["train_positions"]
+        readiness_lookup = context["readiness_lookup"]
+        readiness_summaries = context["readiness_summaries"]
+        branding_urgency_lookup = context["branding_urgency_lookup"]
+        valid_trains = context["valid_trains"]
+        timetable_config = context["timetable_config"]
+        day_slot_count = context["day_slot_count"]
+        max_trains_to_schedule = context["max_trains_to_schedule"]
+        departure_slots = context["departure_slots"]
+        slot_to_time = context["slot_to_time"]
+        bay_groups = context["bay_groups"]
+        # Constraints are independent of the weights (see Layer2ModelTemplate)
+        template = context["template"]
+        weights = resolve_weights(weights)
+
+        # --- ENGINE SELECTION ---
+        # Shunting only couples the front and back train of a bay, so with at
+        # most two trains per bay the exact assignment engine solves the model
+        # directly; anything else (or a streamed run) goes to CP-SAT
+        if engine not in LAYER2_ENGINES:
+            raise ValueError(f"Unknown Layer 2 engine '{engine}'. Choose one of: {', '.join(LAYER2_ENGINES)}")
+        fits_fast_path = template.fits_fast_path
+        requested_engine = engine
+        if engine == "auto":
+            engine = "fast" if listener is None and stop_event is None else "cp_sat"
+        if engine in ("fast", "crosscheck") and not fits_fast_path:
+            logger.debug("Bay with more than two trains - falling back to CP-SAT")
+            engine = "cp_sat"
+
+        fast_plan = None
+        engine_crosscheck = None
+        if engine in ("fast", "crosscheck"):
+            fast_plan = template.solve_fast(weights)
+            fast_telemetry = solver_telemetry.record(exact_engine_telemetry(
+                "layer2", fast_plan, len(valid_trains) * len(departure_slots)
+            ))
+
+        if engine == "fast":
+            chosen_slots = fast_plan["slots"]
+            shunted_trains = fast_plan["shunted"]
+            # Search options only steer CP-SAT; say which ones the exact engine did not use
+            ignored_options = [
+                name for name, requested in (
+                    ("warm_start", warm_start),
+                    ("relative_gap", relative_gap is not None),
+                    ("solver_profile", solver_profile is not None),
+                    ("time_limit", time_limit is not None)
+                ) if requested
+            ]
+            if ignored_options:
+                logger.info(f"Exact assignment engine ignores CP-SAT options: {', '.join(ignored_options)}")
+            solve_info = {
+                "solver_status": "OPTIMAL",
+                "objective_value": float(fast_plan["objective_value"]),
+                "warm_start": warm_start_report(None, 0, fast_plan["wall_time"], None, None),
+                "wall_time": fast_plan["wall_time"],
+                "solver_profile": None,
+                "nodes_explored": fast_plan["nodes_explored"],
+                "ignored_options": ignored_options,
+                "solution_history": [],
+                "stopped_early": False,
+                "cold_wall_time": None,
+                "telemetry": fast_telemetry
+            }
+        else:
+            # Objective: readiness, earlier slots, priority slots and front
+            # positions rewarded, shunting heavily penalised (see Layer2ModelTemplate)
+            build_started = time.perf_counter()
+            model = template.build_cp_model(weights)
+            model_build_time = time.perf_counter() - build_started
+            departure_vars = template.departure_vars
+            train_selected_vars = template.train_selected_vars
+            shunting_vars = template.shunting_vars
+
+            # --- WARM START FROM THE LAST PERSISTED SOLUTION ---
+            hints = []
+            previous_output = load_layer2_output() if warm_start else {}
+            if previous_output:
+                previous_slots = layer2_slots_from_output(previous_output)
+                previous_standby = {t.get("train_id") for t in previous_output.get("standby_trains", []) or []}
+                for train in valid_trains:
+                    if train not in previous_slots and train not in previous_standby:
+                        continue
+                    previous_slot = previous_slots.get(train)
+                    hints.append((train_selected_vars[train], int(previous_slot is not None)))
+                    for slot_num in departure_slots:
+                        hints.append((departure_vars[train, slot_num], int(slot_num == previous_slot)))
+                apply_hints(model, hints)
+
+            # --- SOLVE THE MODEL ---
+            solver = cp_model.CpSolver()
+            solver_settings = configure_solver(solver, model, solver_profile, time_limit=time_limit, relative_gap=relative_gap)
+            solve_log = attach_solve_log(solver, model)
         
-        status = solver.Solve(model)
+            def slot_snapshot(cb: AnytimeCallback) -> Dict[str, Any]:
+                order = sorted(
+                    (slot_num, train)
+                    for (train, slot_num), var in departure_vars.items()
+                    if cb.Value(var)
+                )
+                return {"departure_order": [
+                    {"departure_slot": slot_num, "train_id": train, "departure_time": slot_to_time.get(slot_num)}
+                    for slot_num, train in order
+                ]}
+
+            callback = AnytimeCallback(hints, slot_snapshot, listener, stop_event)
+            status = solve_anytime(solver, model, callback)
+            recorder = callback if previous_output else None
+            telemetry = solver_telemetry.record(cp_sat_telemetry(
+                "layer2", solver, status, solver_settings, model_build_time, solve_log, callback.history
+            ))
+
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                return {
+                    "status": "No feasible solution",
+                    "solver_status": "INFEASIBLE",
+                    "error": "Could not find optimal departure schedule",
+                    "solver_telemetry": telemetry
+                }
 
-        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-            return {
-                "status": "No feasible solution",
-                "solver_status": "INFEASIBLE",
-                "error": "Could not find optimal departure schedule"
+            chosen_slots = {
+                train: slot_num for (train, slot_num), var in departure_vars.items() if solver.Value(var)
+            }
+            shunted_trains = {train for train in valid_trains if solver.Value(shunting_vars[train])}
+            solve_info = {
+                "solver_status": "OPTIMAL" if status == cp_model.OPTIMAL else "FEASIBLE",
+                "objective_value": solver.ObjectiveValue(),
+                "warm_start": warm_start_report(recorder, len(hints), solver.WallTime(), previous_output.get("cold_wall_time"), relative_gap),
+                "wall_time": solver.WallTime(),
+                "solver_profile": solver_settings,
+                "nodes_explored": None,
+                "ignored_options": [],
+                "solution_history": callback.history,
+                "stopped_early": callback.stopped_early,
+                # Reference time for warm-start savings: carried forward from the last cold solve
+                "cold_wall_time": previous_output.get("cold_wall_time") if recorder is not None else solver.WallTime(),
+                "telemetry": telemetry
             }
 
+            if fast_plan is not None:
+                objectives_match = round(solve_info["objective_value"]) == fast_plan["objective_value"]
+                if not objectives_match:
+                    logger.warning(f"Layer 2 cross-check mismatch: CP-SAT {solve_info['objective_value']} vs exact {fast_plan['objective_value']}")
+                engine_crosscheck = {
+                    "cp_sat_objective": solve_info["objective_value"],
+                    "cp_sat_status": solve_info["solver_status"],
+                    "cp_sat_wall_time": solve_info["wall_time"],
+                    "exact_objective": fast_plan["objective_value"],
+                    "exact_wall_time": fast_plan["wall_time"],
+                    "objectives_match": objectives_match
+                }
+
         # --- BUILD RESULTS - Only include selected trains ---
         optimized_assignments = []
         standby_trains = []
         shunting_operations = []
         
         for train in valid_trains:
-            is_selected = solver.Value(train_selected_vars[train]) == 1
+            is_selected = train in chosen_slots
             
             if is_selected:
-                # Find chosen departure slot
-                chosen_slot = next(slot_num for slot_num in departure_slots
-                                  if solver.Value(departure_vars[train, slot_num]) == 1)
+                # Chosen departure slot
+                chosen_slot = chosen_slots[train]
                 
                 # Check shunting requirement
-                needs_shunting = solver.Value(shunting_vars[train]) == 1
+                needs_shunting = train in shunted_trains
                 if needs_shunting:
                     shunting_operations.append({
                         "train_id": train,
@@ -553,15 +735,7 @@ def run_layer2_service(
                     })
                 
                 # Get priority slot status
-                got_priority_slot = solver.Value(priority_slot_vars[train]) == 1
-                scheduling_rationale = _generate_scheduling_rationale(
-                    train, train_positions, bay_assignments, readiness_lookup, 
-                    valid_trains, chosen_slot, needs_shunting, got_priority_slot,
-                    layer1_details_lookup
-                )
-                # Add branding rationale when applicable
-                if branding_urgency_lookup.get(train, 0) > 0 and chosen_slot <= 3:
-                    scheduling_rationale["secondary_factors"].append("Branding urgency prioritized for peak exposure")
+                got_priority_slot = chosen_slot in PRIORITY_SLOTS
                 
                 assignment = {
                     "train_id": train,
@@ -570,44 +744,40 @@ def run_layer2_service(
                     "readiness": readiness_lookup[train],
                     "readiness_summary": readiness_summaries[train]["summary"],
                     "readiness_details": readiness_summaries[train]["details"],
+                    "branding_urgency": branding_urgency_lookup.get(train, 0),
                     "departure_slot": chosen_slot,
                     "departure_order": chosen_slot,
                     "departure_time": slot_to_time.get(chosen_slot, None),
                     "needs_shunting": needs_shunting,
                     "is_priority_slot": got_priority_slot,
-                    "optimization_score": "CP-SAT Optimized",
-                    "scheduling_rationale": scheduling_rationale
+                    "optimization_score": ENGINE_LABELS[engine]
                 }
                 
                 optimized_assignments.append(assignment)
             else:
-                not_selected_rationale = _generate_not_selected_rationale(
-                    train, train_positions, bay_assignments, readiness_lookup, 
-                    valid_trains, layer1_details_lookup
-                )
-                
                 # Track standby trains
                 standby_trains.append({
                     "train_id": train,
                     "readiness": readiness_lookup[train],
                     "readiness_summary": readiness_summaries[train]["summary"],
+                    "readiness_details": readiness_summaries[train]["details"],
                     "bay": bay_assignments.get(train, "Unknown"),
                     "bay_position": train_positions.get(train, 1),
                     "status": "standby",
-                    "reason": "Not selected - on standby for the day",
-                    "scheduling_rationale": not_selected_rationale
+                    "reason": "Not selected - on standby for the day"
                 })
 
         # Sort by departure slot (1..slot_count)
         optimized_assignments.sort(key=lambda x: x["departure_slot"])
 
         result = {
-            "solver_status": "OPTIMAL" if status == cp_model.OPTIMAL else "FEASIBLE",
-            "objective_value": solver.ObjectiveValue(),
+            "solver_status": solve_info["solver_status"],
+            "objective_value": solve_info["objective_value"],
             "optimized_assignments": optimized_assignments,
             "standby_trains": standby_trains,
             "timetable_info": timetable_config,
             "departure_slots": departure_slots,
+            "day_slot_count": day_slot_count,
             "total_trains_available": len(valid_trains),
             "total_trains_scheduled": len(optimized_assignments),
             "total_standby_trains": len(standby_trains),
@@ -615,6 +785,22 @@ def run_layer2_service(
             "trains_requiring_shunting": shunting_operations,
             "service_date": service_date.isoformat() if service_date else date.today().isoformat(),
             "data_source": "Layer 1 Output" if use_layer1_output else "Provided Data",
+            "engine": {
+                "requested": requested_engine,
+                "used": engine,
+                "fits_fast_path": fits_fast_path,
+                "nodes_explored": solve_info["nodes_explored"]
+            },
+            "ignored_options": solve_info["ignored_options"],
+            "engine_crosscheck": engine_crosscheck,
+            "objective_weights": weights,
+            "warm_start": solve_info["warm_start"],
+            "wall_time": solve_info["wall_time"],
+            "solver_profile": solve_info["solver_profile"],
+            "solution_history": solve_info["solution_history"],
+            "stopped_early": solve_info["stopped_early"],
+            "cold_wall_time": solve_info["cold_wall_time"],
+            "solver_telemetry": solve_info["telemetry"],
             "optimization_summary": {
                 "readiness_weighted": True,
                 "ad_revenue_optimized": False,
@@ -622,19 +808,23 @@ def run_layer2_service(
                 "parking_position_optimized": True,
                 "shunting_constraints": True,
                 "shunting_minimization": "Heavy penalty applied",
-                "constraint_programming": "Full CP-SAT with logical constraints",
+                "constraint_programming": ENGINE_METHODS[engine],
                 "slot_count": len(departure_slots),
-                "scheduling_method": "Slot-based ranking (1-8)",
+                "scheduling_method": f"Slot-based ranking (1-{len(departure_slots)})",
                 "optimization_method": "Multi-objective: readiness + minimal shunting",
                 "selection_summary": {
                     "requested_trains": len(valid_trains),
                     "available_slots": len(departure_slots),
                     "scheduled_trains": len(optimized_assignments),
                     "standby_trains": len(standby_trains),
-                    "selection_method": "CP-SAT optimized slot assignment based on readiness and minimal shunting"
+                    "selection_method": f"{ENGINE_LABELS[engine]} slot assignment based on readiness and minimal shunting"
                 }
             }
         }
+
+        # Only plans built from the persisted Layer 1 output seed the next night
+        if use_layer1_output and persist:
+            save_layer2_output(result)
         
         return result
 
@@ -645,14 +835,106 @@ def run_layer2_service(
             "solver_status": "ERROR"
         }
            
+def run_layer2_weight_sweep(
+    weightings: List[Dict[str, Any]],
+    service_date: date = None,
+    parking_json: Dict[str, Any] = None,
+    readiness_json: List[Dict[str, Any]] = None,
+    use_layer1_output: bool = True,
+    engine: str = "auto",
+    solver_profile: str = "interactive",
+    time_limit: float = None,
+    max_trains_to_schedule: int = MAX_TRAINS_TO_SCHEDULE,
+    max_workers: int = None,
+    schedule_context: ScheduleContext = None
+) -> Dict[str, Any]:
+    """
+    Solve the same Layer 2 inputs under many objective weightings.
+
+    The inputs are read and the model template built once; each weighting
+    only swaps the objective. Weightings are solved in parallel threads
+    (CP-SAT and the min-cost flow run outside the GIL) and every plan is
+    compared with the plan under the default weights.
+    """
+    if engine not in LAYER2_ENGINES:
+        raise ValueError(f"Unknown Layer 2 engine '{engine}'. Choose one of: {', '.join(LAYER2_ENGINES)}")
+    started = time.perf_counter()
+    weightings = [resolve_weights(weights) for weights in weightings]
+
+    context, error_result = _prepare_layer2_context(
+        parking_json, readiness_json, service_date, use_layer1_output, max_trains_to_schedule,
+        schedule_context
+    )
+    if error_result is not None:
+        return error_result
+    template = context["template"]
+    use_fast = engine in ("auto", "fast") and template.fits_fast_path
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(weightings) or 1))
+
+    def solve_one(weights: Dict[str, int]) -> Dict[str, Any]:
+        if use_fast:
+            plan = template.solve_fast(weights)
+            slots, shunted = plan["slots"], plan["shunted"]
+            status, objective, wall_time = "OPTIMAL", float(plan["objective_value"]), plan["wall_time"]
+        else:
+            model = template.build_cp_model(weights)
+            solver = cp_model.CpSolver()
+            configure_solver(solver, model, solver_profile, time_limit=time_limit)
+            # The sweep itself is parallel; share the cores between its solves
+            solver.parameters.num_workers = max(1, solver.parameters.num_workers // workers)
+            status_code = solver.Solve(model)
+            if status_code not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                return {"weights": weights, "solver_status": "INFEASIBLE"}
+            slots = {
+                train: slot_num
+                for (train, slot_num), var in template.departure_vars.items() if solver.Value(var)
+            }
+            shunted = {train for train, var in template.shunting_vars.items() if solver.Value(var)}
+            status = "OPTIMAL" if status_code == cp_model.OPTIMAL else "FEASIBLE"
+            objective, wall_time = solver.ObjectiveValue(), solver.WallTime()
+        return {
+            "weights": weights,
+            "solver_status": status,
+            "objective_value": objective,
+            "departure_order": [train for train, _ in sorted(slots.items(), key=lambda item: item[1])],
+            "trains_requiring_shunting": sorted(shunted),
+            "wall_time": wall_time
+        }
+
+    baseline = solve_one(resolve_weights())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(solve_one, weightings))
+
+    baseline_order = baseline.get("departure_order", [])
+    for result in results:
+        order = result.get("departure_order")
+        if order is None:
+            continue
+        result["changes_from_default"] = {
+            "entered": [t for t in order if t not in baseline_order],
+            "left": [t for t in baseline_order if t not in order],
+            "slot_changes": sum(1 for slot, train in enumerate(order) if slot >= len(baseline_order) or baseline_order[slot] != train),
+            "same_plan": order == baseline_order
+        }
+
+    return {
+        "service_date": (service_date or date.today()).isoformat(),
+        "engine": "fast" if use_fast else "cp_sat",
+        "weightings": len(results),
+        "distinct_plans": len({tuple(r["departure_order"]) for r in results if "departure_order" in r}),
+        "workers": workers,
+        "default_plan": baseline,
+        "results": results,
+        "wall_time": round(time.perf_counter() - started, 4)
+    }
+
 # Backward compatibility function
 def run_layer2_service_old(parking_json=None, readiness_json=None,
                           ads_json=None, service_day="weekday"):
     """Legacy function for backward compatibility"""
     if parking_json is None:
         # Use Layer 1 output instead of test data
-        layer1_output = load_layer1_output()
-        converted_data = convert_layer1_to_layer2_format(layer1_output)
+        converted_data = get_schedule_context().converted
         parking_json = converted_data["parking"]
         readiness_json = converted_data["readiness"]
         ads_json = []  # Ads not used
@@ -0,0 +1,251 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+import bisect
+import json
+import logging
+import threading
+from app.services.layer2_cache import file_digest, content_key
+from app.services.layer2_service import run_layer2_service
+from app.services.schedule_context import get_schedule_context
+from app.utils.fleet_registry import FleetRegistry
+from app.utils.forecast import get_station_timings, get_weather_forecast, generate_rotation_schedule
+
+logger = logging.getLogger(__name__)
+
+TIME_FIELDS = ("scheduled_arrival", "expected_arrival")
+DIRECTIONS = ("forward", "return")
+# HH:MM times before this belong to the tail of the previous service day
+SERVICE_DAY_START = 4 * 60
+MAX_QUERY_RESULTS = 500
+
+
+def service_minute(hhmm: str) -> int:
+    """Minutes into the service day of an 'HH:MM' time; times after midnight
+    sort after 23:59. Raises ValueError on a malformed time."""
+    try:
+        hours, minutes = map(int, hhmm.split(":"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid time '{hhmm}'. Use HH:MM")
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time '{hhmm}'. Use HH:MM")
+    minute = hours * 60 + minutes
+    return minute + 24 * 60 if minute < SERVICE_DAY_START else minute
+
+
+def _input_data_path() -> Path:
+    return Path(__file__).parent.parent.parent / "data" / "input_data.json"
+
+
+class StoredRotation:
+    """A generated rotation schedule with its secondary indexes.
+
+    Stations map (case-insensitively) to the offsets (train position, event
+    position) of their events sorted by scheduled arrival, and train ids to
+    their train schedule, so a station board touches only that station's
+    events. For time queries, every (station or all stations, direction or
+    both) pair also has its events sorted by service-day minute of the
+    scheduled and of the expected arrival, searched with bisect. The
+    rotation is shared by every request for its version; treat it as
+    read-only.
+    """
+
+    def __init__(self, rotation: Dict[str, Any]):
+        self.rotation = rotation
+        self.train_schedules: List[Dict[str, Any]] = rotation.get("train_schedules", [])
+        self.train_index: Dict[str, int] = {
+            schedule["train_id"]: position for position, schedule in enumerate(self.train_schedules)
+        }
+
+        offsets: Dict[str, List[Tuple[str, int, int]]] = {}
+        for train_position, schedule in enumerate(self.train_schedules):
+            for event_position, event in enumerate(schedule.get("station_events", [])):
+                offsets.setdefault(event["station"].lower(), []).append(
+                    (event["scheduled_arrival"], train_position, event_position)
+                )
+        # Stable sort: ties keep train, then event, order
+        self.station_index: Dict[str, List[Tuple[int, int]]] = {
+            station: [(t, e) for _, t, e in sorted(entries, key=lambda entry: entry[0])]
+            for station, entries in offsets.items()
+        }
+
+        # (time field, station or None, direction or None) -> (sorted minutes, offsets)
+        timed: Dict[Tuple[str, Optional[str], Optional[str]], List[Tuple[int, int, int]]] = {}
+        for train_position, schedule in enumerate(self.train_schedules):
+            for event_position, event in enumerate(schedule.get("station_events", [])):
+                station = event["station"].lower()
+                for field in TIME_FIELDS:
+                    entry = (service_minute(event[field]), train_position, event_position)
+                    for scope in ((None, None), (station, None), (None, event["direction"]), (station, event["direction"])):
+                        timed.setdefault((field,) + scope, []).append(entry)
+        self.time_index: Dict[Tuple[str, Optional[str], Optional[str]], Tuple[List[int], List[Tuple[int, int]]]] = {}
+        for key, entries in timed.items():
+            entries.sort(key=lambda entry: entry[0])
+            self.time_index[key] = ([m for m, _, _ in entries], [(t, e) for _, t, e in entries])
+
+    def station_events(self, station_name: str) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """(train schedule, event) pairs at a station in scheduled-arrival order"""
+        return [
+            (self.train_schedules[t], self.train_schedules[t]["station_events"][e])
+            for t, e in self.station_index.get(station_name.lower(), [])
+        ]
+
+    def station_board(self, station_name: str) -> List[Dict[str, Any]]:
+        """Arrivals at a station as /rotation/station lists them"""
+        return [
+            {
+                "train_id": schedule["train_id"],
+                "scheduled_arrival": event["scheduled_arrival"],
+                "expected_arrival": event["expected_arrival"],
+                "delay_minutes": event["delay_minutes"],
+                "delay_reasons": event["delay_reasons"],
+                "direction": event["direction"]
+            }
+            for schedule, event in self.station_events(station_name)
+        ]
+
+    def query(
+        self,
+        start: str,
+        end: Optional[str] = None,
+        station: Optional[str] = None,
+        direction: Optional[str] = None,
+        limit: Optional[int] = None,
+        time_field: str = "scheduled_arrival"
+    ) -> List[Dict[str, Any]]:
+        """Events arriving from start to end (inclusive, HH:MM), earliest
+        first, at most limit of them. Raises ValueError on bad arguments and
+        KeyError for a station with no events."""
+        if time_field not in TIME_FIELDS:
+            raise ValueError(f"time_field must be one of: {', '.join(TIME_FIELDS)}")
+        if direction is not None and direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of: {', '.join(DIRECTIONS)}")
+        if station is not None and station.lower() not in self.station_index:
+            raise KeyError(station)
+        low = service_minute(start)
+        high = service_minute(end) if end is not None else None
+        if high is not None and high < low:
+            raise ValueError("end must not be before start")
+
+        minutes, offsets = self.time_index.get(
+            (time_field, station.lower() if station is not None else None, direction), ([], [])
+        )
+        first = bisect.bisect_left(minutes, low)
+        last = bisect.bisect_right(minutes, high) if high is not None else len(minutes)
+        if limit is not None:
+            last = min(last, first + limit)
+
+        results = []
+        for t, e in offsets[first:last]:
+            schedule = self.train_schedules[t]
+            event = schedule["station_events"][e]
+            results.append({
+                "train_id": schedule["train_id"],
+                "station": event["station"],
+                "scheduled_arrival": event["scheduled_arrival"],
+                "expected_arrival": event["expected_arrival"],
+                "delay_minutes": event["delay_minutes"],
+                "delay_reasons": event["delay_reasons"],
+                "direction": event["direction"],
+                "rotation": event["rotation"]
+            })
+        return results
+
+    def train_events(self, train_id: str) -> Optional[List[Dict[str, Any]]]:
+        position = self.train_index.get(train_id)
+        return None if position is None else self.train_schedules[position]["station_events"]
+
+
+class RotationStore:
+    """LRU of indexed rotations keyed by service date and schedule version"""
+
+    def __init__(self, max_size: int = 8):
+        self.max_size = max_size
+        self._rotations: "OrderedDict[str, StoredRotation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[StoredRotation]:
+        with self._lock:
+            stored = self._rotations.get(key)
+            if stored is not None:
+                self._rotations.move_to_end(key)
+                self.hits += 1
+            return stored
+
+    def put(self, key: str, stored: StoredRotation):
+        with self._lock:
+            self.builds += 1
+            self._rotations[key] = stored
+            if len(self._rotations) > self.max_size:
+                self._rotations.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._rotations.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._rotations),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "builds": self.builds,
+                "evictions": self.evictions
+            }
+
+
+rotation_store = RotationStore()
+
+
+def get_rotation(service_date: str = None) -> StoredRotation:
+    """The indexed rotation schedule for a service date.
+
+    The Layer 2 plan behind it is today's plan on the current Layer 1
+    output, so a stored rotation is reused until the service date, the day,
+    output.json, parking.json or input_data.json changes.
+    """
+    if not service_date:
+        service_date = date.today().isoformat()
+    schedule_context = get_schedule_context()
+    input_path = _input_data_path()
+    key = content_key(
+        service_date=service_date,
+        plan_date=date.today().isoformat(),
+        layer1_output=schedule_context.layer1_digest,
+        parking=schedule_context.parking_digest,
+        train_configs=file_digest(input_path)
+    )
+    stored = rotation_store.get(key)
+    if stored is not None:
+        return stored
+
+    # Load the current optimized schedule
+    optimization_result = run_layer2_service(
+        service_day="weekday", use_layer1_output=True, include_rationale=False, schedule_context=schedule_context
+    )
+    scheduled_trains = optimization_result.get("optimized_assignments", [])
+
+    # Load train configuration data
+    with open(input_path, "r") as f:
+        train_configs = json.load(f)
+    fleet = FleetRegistry.from_input_data(train_configs)
+
+    rotation = generate_rotation_schedule(
+        scheduled_trains,
+        train_configs,
+        get_station_timings(),
+        get_weather_forecast(service_date),
+        service_date,
+        fleet
+    )
+    stored = StoredRotation(rotation)
+    if optimization_result.get("solver_status") in ("OPTIMAL", "FEASIBLE"):
+        rotation_store.put(key, stored)
+    else:
+        logger.warning("Layer 2 returned %s; rotation for %s not stored", optimization_result.get("solver_status"), service_date)
+    return stored
@@ -0,0 +1,197 @@
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+
+
+def _layer1_output_path() -> Path:
+    return Path(__file__).parent.parent.parent / "data" / "output.json"
+
+def _parking_override_path() -> Path:
+    return Path(__file__).parent.parent.parent / "data" / "parking.json"
+
+def _test_data_path() -> Path:
+    return Path(__file__).parent.parent / "test_data.json"
+
+def load_layer1_output() -> Dict[str, Any]:
+    """Load the actual output from Layer 1 optimization"""
+    try:
+        output_path = _layer1_output_path()
+        with open(output_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        # Fallback to test data if output.json doesn't exist
+        with _test_data_path().open() as f:
+            return json.load(f)
+
+def load_parking_override() -> List[Dict[str, Any]]:
+    """Optionally load parking.json (synthetic for now) to override parking assignments.
+    Expected format: [{"train_id": "TM001", "bay": "PT01", "position": 1}, ...]
+    """
+    try:
+        path = _parking_override_path()
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+                if isinstance(data, list):
+                    return data
+    except Exception:
+        pass
+    return []
+
+def convert_layer1_to_layer2_format(
+    layer1_output: Dict[str, Any],
+    parking_override: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Convert Layer 1 output format to Layer 2 input format
+
+    parking_override is the parsed parking.json; when omitted it is read from disk.
+    """
+
+    # Extract parking assignments from optional parking.json override, else Layer 1
+    override = load_parking_override() if parking_override is None else parking_override
+    if override:
+        parking_assignments = override
+    else:
+        parking_assignments = []
+        for assignment in layer1_output.get("parking_assignments", []):
+            parking_assignments.append({
+                "train_id": assignment["train_id"],
+                "bay": assignment["track_id"],
+                "position": assignment["position_in_track"]
+            })
+
+    # Extract readiness data
+    readiness_data = []
+    for item in layer1_output.get("readiness_scores", []):
+        # Add a top-level summary for validation/UI convenience
+        details_dict = item.get("details", {}) or {}
+        summary_text = details_dict.get("summary") or details_dict.get("combined") or item.get("summary") or ""
+        new_item = dict(item)
+        new_item["summary"] = summary_text
+        readiness_data.append(new_item)
+
+    return {
+        "parking": {
+            "assignments": parking_assignments,
+            "total_shunting_moves": layer1_output.get("total_shunting_moves", 0),
+            "optimization_date": layer1_output.get("metadata", {}).get("processing_time", datetime.now().isoformat())
+        },
+        "readiness": readiness_data,
+        "trains_to_service": layer1_output.get("trains_to_service", []),
+        "trains_to_standby": layer1_output.get("trains_to_standby", []),
+        "trains_to_ibl": layer1_output.get("trains_to_ibl", [])
+    }
+
+
+def _stat_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _read(path: Path) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+class ScheduleContext:
+    """Layer 1 output, parking.json and their Layer 2 conversion, read once.
+
+    One context is shared by every request until output.json or parking.json
+    changes (by mtime and size), so treat its contents as read-only. Derived
+    Layer 2 inputs (lookups, slot grid, model template) are memoized on the
+    context per service date and train count.
+    """
+
+    MAX_DERIVED = 8
+
+    def __init__(self, signature: Tuple, layer1_bytes: Optional[bytes], parking_bytes: Optional[bytes]):
+        self.signature = signature
+        self.loaded_at = datetime.now().isoformat()
+        self.from_test_data = layer1_bytes is None
+        if layer1_bytes is None:
+            # Fallback to test data if output.json doesn't exist
+            with _test_data_path().open() as f:
+                self.layer1_output = json.load(f)
+            self.layer1_digest = None
+        else:
+            self.layer1_output = json.loads(layer1_bytes)
+            self.layer1_digest = hashlib.sha1(layer1_bytes).hexdigest()
+
+        self.parking_digest = hashlib.sha1(parking_bytes).hexdigest() if parking_bytes is not None else None
+        parking_override = []
+        if parking_bytes is not None:
+            try:
+                data = json.loads(parking_bytes)
+                parking_override = data if isinstance(data, list) else []
+            except ValueError:
+                parking_override = []
+        self.converted = convert_layer1_to_layer2_format(self.layer1_output, parking_override)
+        self._derived: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def parking(self) -> Dict[str, Any]:
+        return self.converted["parking"]
+
+    @property
+    def readiness(self) -> List[Dict[str, Any]]:
+        return self.converted["readiness"]
+
+    @property
+    def has_readiness(self) -> bool:
+        return "readiness_scores" in self.layer1_output
+
+    def derived(self, key: Tuple, build: Callable[[], Any]) -> Any:
+        """Value built once per key for this version of the inputs"""
+        with self._lock:
+            if key in self._derived:
+                self._derived.move_to_end(key)
+                return self._derived[key]
+        value = build()
+        with self._lock:
+            self._derived[key] = value
+            if len(self._derived) > self.MAX_DERIVED:
+                self._derived.popitem(last=False)
+        return value
+
+
+_context: Optional[ScheduleContext] = None
+_context_lock = threading.Lock()
+_context_stats = {"loads": 0, "hits": 0}
+
+
+def get_schedule_context() -> ScheduleContext:
+    """The schedule context for the current output.json and parking.json,
+    reloaded only when either file's mtime or size changes"""
+    global _context
+    layer1_path, parking_path = _layer1_output_path(), _parking_override_path()
+    signature = (_stat_signature(layer1_path), _stat_signature(parking_path))
+    with _context_lock:
+        if _context is not None and _context.signature == signature:
+            _context_stats["hits"] += 1
+            return _context
+
+    context = ScheduleContext(signature, _read(layer1_path), _read(parking_path))
+    with _context_lock:
+        _context = context
+        _context_stats["loads"] += 1
+    return context
+
+
+def schedule_context_stats() -> Dict[str, Any]:
+    with _context_lock:
+        return {
+            **_context_stats,
+            "loaded_at": _context.loaded_at if _context else None,
+            "from_test_data": _context.from_test_data if _context else None
+        }
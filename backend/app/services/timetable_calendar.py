@@ -0,0 +1,179 @@
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import date, timedelta
+import threading
+import numpy as np
+
+try:
+    import holidays
+except ImportError:  # Calendar still works, every day is a regular day
+    holidays = None
+
+# Timetables per line: public-holiday rules come from the line's holiday region
+LINE_RULES: Dict[str, Dict[str, Any]] = {
+    "kochi_metro_line1": {
+        "country": "IN",
+        "subdiv": "KL",
+        "timetables": {
+            "public_holiday": {
+                "first_service": "06:00",
+                "last_service": "22:30",
+                "peak_hours": [(8, 20)],  # 08:00-20:00
+                "peak_headway": 9.75,     # 9 minutes 45 seconds
+                "off_peak_headway": 11,   # 11 minutes
+                "service_type": "public_holiday"
+            },
+            "regular": {
+                "first_service": "07:30",
+                "last_service": "22:30",
+                "peak_hours": [(8, 20)],  # 08:00-20:00
+                "peak_headway": 9.083,    # 9 minutes 5 seconds
+                "off_peak_headway": 9.083, # Same as peak for regular days
+                "service_type": "regular"
+            }
+        }
+    }
+}
+
+DEFAULT_LINE = "kochi_metro_line1"
+
+
+def _clock_minutes(value: str) -> float:
+    hours, minutes = map(int, value.split(":"))
+    return hours * 60 + minutes
+
+
+def build_slot_grid(timetable_config: Dict[str, Any]) -> np.ndarray:
+    """Minutes after midnight of every departure between first_service and last_service.
+
+    Peak hours use peak_headway and the rest of the day off_peak_headway; each
+    headway segment is laid out with one np.arange.
+    """
+    try:
+        first = _clock_minutes(timetable_config.get("first_service", "07:30"))
+        last = _clock_minutes(timetable_config.get("last_service", "22:30"))
+    except Exception:
+        first, last = 7 * 60 + 30, 22 * 60 + 30
+    peak_headway = float(timetable_config.get("peak_headway", 10))
+    off_peak_headway = float(timetable_config.get("off_peak_headway", peak_headway))
+    peak_windows = [(start * 60, end * 60) for start, end in timetable_config.get("peak_hours", [])]
+
+    # Segment boundaries: service start/end plus every peak start/end in between
+    bounds = sorted({first, last} | {b for window in peak_windows for b in window if first < b < last})
+    segments = []
+    next_departure = first
+    for seg_start, seg_end in zip(bounds[:-1], bounds[1:]):
+        in_peak = any(start <= seg_start < end for start, end in peak_windows)
+        headway = peak_headway if in_peak else off_peak_headway
+        # The final segment includes last_service itself
+        stop = seg_end + 1e-9 if seg_end == last else seg_end
+        times = np.arange(next_departure, stop, headway)
+        segments.append(times)
+        if len(times):
+            next_departure = times[-1] + headway
+    return np.concatenate(segments) if segments else np.array([first], dtype=float)
+
+
+def _grid_key(timetable_config: Dict[str, Any]) -> Tuple:
+    return (
+        timetable_config.get("first_service"),
+        timetable_config.get("last_service"),
+        tuple(tuple(window) for window in timetable_config.get("peak_hours", [])),
+        timetable_config.get("peak_headway"),
+        timetable_config.get("off_peak_headway")
+    )
+
+
+class TimetableCalendar:
+    """Precompiled per-date timetables for one or more lines.
+
+    For every line, each date in the window maps straight to its timetable
+    (service type, first/last service, headways), and each distinct timetable
+    has its slot grid built once. Lookups are dict reads; dates outside the
+    window compile their whole year on first use.
+    """
+
+    def __init__(self, line_rules: Dict[str, Dict[str, Any]] = None, years: List[int] = None):
+        self.line_rules = line_rules or LINE_RULES
+        if years is None:
+            this_year = date.today().year
+            years = [this_year, this_year + 1]
+        self._lock = threading.Lock()
+        self._days: Dict[str, Dict[date, Dict[str, Any]]] = {line: {} for line in self.line_rules}
+        self._years: Dict[str, set] = {line: set() for line in self.line_rules}
+        self._grids: Dict[Tuple, np.ndarray] = {}
+        for line in self.line_rules:
+            self._compile(line, years)
+
+    def _holiday_dates(self, rules: Dict[str, Any], years: List[int]) -> set:
+        if holidays is None:
+            return set()
+        try:
+            return set(holidays.country_holidays(rules["country"], subdiv=rules.get("subdiv"), years=years))
+        except Exception:
+            return set()
+
+    def _compile(self, line: str, years: List[int]):
+        rules = self.line_rules[line]
+        years = [y for y in years if y not in self._years[line]]
+        if not years:
+            return
+        holiday_dates = self._holiday_dates(rules, years)
+        timetables = rules["timetables"]
+        for timetable in timetables.values():
+            self._grids.setdefault(_grid_key(timetable), build_slot_grid(timetable))
+
+        days = {}
+        for year in years:
+            day = date(year, 1, 1)
+            while day.year == year:
+                days[day] = timetables["public_holiday" if day in holiday_dates else "regular"]
+                day += timedelta(days=1)
+        with self._lock:
+            self._days[line].update(days)
+            self._years[line].update(years)
+
+    def lines(self) -> List[str]:
+        return list(self.line_rules)
+
+    def config(self, service_date: Optional[date] = None, line: str = DEFAULT_LINE) -> Dict[str, Any]:
+        """Timetable for a date on a line (a copy, safe to annotate)"""
+        if line not in self.line_rules:
+            raise ValueError(f"Unknown line '{line}'. Known lines: {', '.join(self.line_rules)}")
+        service_date = service_date or date.today()
+        entry = self._days[line].get(service_date)
+        if entry is None:
+            self._compile(line, [service_date.year])
+            entry = self._days[line][service_date]
+        return dict(entry)
+
+    def slot_grid(self, timetable_config: Dict[str, Any]) -> np.ndarray:
+        """Departure grid (minutes after midnight) for a timetable, built once per timetable"""
+        key = _grid_key(timetable_config)
+        grid = self._grids.get(key)
+        if grid is None:
+            grid = build_slot_grid(timetable_config)
+            with self._lock:
+                self._grids[key] = grid
+        return grid
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lines": self.lines(),
+            "years": {line: sorted(years) for line, years in self._years.items()},
+            "compiled_days": {line: len(days) for line, days in self._days.items()},
+            "distinct_grids": len(self._grids)
+        }
+
+
+_calendar: Optional[TimetableCalendar] = None
+_calendar_lock = threading.Lock()
+
+
+def get_timetable_calendar() -> TimetableCalendar:
+    """Process-wide calendar, compiled on first use (or at startup)"""
+    global _calendar
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                _calendar = TimetableCalendar()
+    return _calendar
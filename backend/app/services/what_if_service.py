@@ -12,6 +12,7 @@ print(f"Key starts with: {os.getenv('GEMINI_API_KEY', '')[:10]}...")
 import google.generativeai as genai
 
 from pathlib import Path
+from app.utils.fleet_registry import FleetRegistry
 
 # Configure Gemini API - FIXED TYPO
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
@@ -58,12 +59,12 @@ class WhatIfAnalyzer:
             return optimization_result["standby_trains"]
         
         # Fallback: Generate standby trains list
-        all_trains = {train["train_id"] for train in readiness_data}
-        standby_train_ids = all_trains - scheduled_trains
+        readiness_by_id = self._readiness_registry(readiness_data)
+        standby_train_ids = set(readiness_by_id) - scheduled_trains
         
         standby_trains = []
         for train_id in standby_train_ids:
-            readiness_info = self._get_train_readiness_details(train_id, readiness_data)
+            readiness_info = self._get_train_readiness_details(train_id, readiness_by_id)
             if readiness_info:
                 standby_trains.append({
                     "train_id": train_id,
@@ -124,8 +125,9 @@ class WhatIfAnalyzer:
         """
         
         # Get detailed readiness information for both trains
-        scheduled_readiness = self._get_train_readiness_details(scheduled_train["train_id"], all_readiness_data)
-        standby_readiness = self._get_train_readiness_details(standby_train["train_id"], all_readiness_data)
+        readiness_by_id = self._readiness_registry(all_readiness_data)
+        scheduled_readiness = self._get_train_readiness_details(scheduled_train["train_id"], readiness_by_id)
+        standby_readiness = self._get_train_readiness_details(standby_train["train_id"], readiness_by_id)
         
         if not scheduled_readiness or not standby_readiness:
             return {
@@ -192,12 +194,15 @@ class WhatIfAnalyzer:
             "generated_at": datetime.now().isoformat()
         }
     
-    def _get_train_readiness_details(self, train_id: str, readiness_data: List[Dict]) -> Optional[Dict]:
+    def _readiness_registry(self, readiness_data) -> FleetRegistry:
+        """Index readiness entries by train id (no-op if already indexed)"""
+        if isinstance(readiness_data, FleetRegistry):
+            return readiness_data
+        return FleetRegistry(readiness_data, id_key="train_id")
+    
+    def _get_train_readiness_details(self, train_id: str, readiness_data) -> Optional[Dict]:
         """Get detailed readiness information for a specific train"""
-        for train_data in readiness_data:
-            if train_data.get("train_id") == train_id:
-                return train_data
-        return None
+        return self._readiness_registry(readiness_data).get(train_id)
     
     def _generate_ai_analysis_with_rationale(
         self, 
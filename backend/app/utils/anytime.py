@@ -0,0 +1,68 @@
+from typing import Dict, Any, List, Tuple, Optional, Callable
+import threading
+from app.utils.warm_start import HintRecorder
+
+
+class AnytimeCallback(HintRecorder):
+    """Captures every improving CP-SAT solution as it is found.
+
+    Each solution is recorded with its objective, bound and wall time, plus
+    an optional plan snapshot built by `snapshot(callback)`. `listener` is
+    called with every event (e.g. to feed a stream), and setting
+    `stop_event` makes the search stop at the next solution, keeping the
+    best plan found so far.
+    """
+
+    def __init__(
+        self,
+        hints: List[Tuple[Any, int]] = None,
+        snapshot: Optional[Callable[["AnytimeCallback"], Dict[str, Any]]] = None,
+        listener: Optional[Callable[[Dict[str, Any]], None]] = None,
+        stop_event: Optional[threading.Event] = None
+    ):
+        super().__init__(hints or [])
+        self.snapshot = snapshot
+        self.listener = listener
+        self.stop_event = stop_event
+        self.history: List[Dict[str, Any]] = []
+        self.stopped_early = False
+
+    def on_solution_callback(self):
+        super().on_solution_callback()
+        event = {
+            "sequence": self.solutions,
+            "objective": self.ObjectiveValue(),
+            "best_bound": self.BestObjectiveBound(),
+            "wall_time": round(self.WallTime(), 4)
+        }
+        self.history.append(event)
+        if self.listener is not None:
+            self.listener({**event, "plan": self.snapshot(self) if self.snapshot else None})
+        if self.stop_event is not None and self.stop_event.is_set():
+            self.stopped_early = True
+            self.StopSearch()
+
+
+def solve_anytime(solver, model, callback: Optional[HintRecorder]) -> int:
+    """Solve with an optional callback; a set stop_event also interrupts the
+    search between solutions (e.g. while CP-SAT is proving optimality)"""
+    stop_event = getattr(callback, "stop_event", None)
+    if stop_event is None:
+        return solver.Solve(model, callback)
+
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(0.05):
+            if stop_event.is_set():
+                callback.stopped_early = True
+                solver.StopSearch()
+                return
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        return solver.Solve(model, callback)
+    finally:
+        done.set()
+        watcher.join()
@@ -0,0 +1,156 @@
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+import heapq
+
+# Default night window for depot cleaning (ends before morning induction)
+CLEANING_WINDOW_START = "20:00:00"
+CLEANING_WINDOW_END = "05:00:00"
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class CleaningScheduler:
+    """Heap-based list scheduler for cleaning jobs over slots and crews.
+
+    Every job needs one cleaning slot (bay) and one crew for its full
+    duration. Jobs are taken in priority order and started at the earliest
+    time both a slot and a crew are free; a job that would run past the
+    slot's window end is reported as unscheduled. Times are integer minutes
+    from the window start.
+    """
+
+    def __init__(
+        self,
+        slots: List[Dict[str, Any]],
+        crews: int,
+        date: str,
+        window_start: str = CLEANING_WINDOW_START,
+        window_end: str = CLEANING_WINDOW_END
+    ):
+        self.start = datetime.strptime(f"{date} {window_start}", "%Y-%m-%d %H:%M:%S")
+        end = datetime.strptime(f"{date} {window_end}", "%Y-%m-%d %H:%M:%S")
+        if end <= self.start:
+            end += timedelta(days=1)  # Window runs past midnight
+        self.horizon = int((end - self.start).total_seconds() // 60)
+        self.crews = max(int(crews), 0)
+
+        # Each available slot opens at max(window start, available_from) and
+        # closes at min(window end, available_until)
+        self.slots = []
+        for slot in slots:
+            if not slot.get("available", True):
+                continue
+            opens = _parse_datetime(slot.get("available_from"))
+            closes = _parse_datetime(slot.get("available_until"))
+            open_at = max(0, int((opens - self.start).total_seconds() // 60)) if opens else 0
+            close_at = min(self.horizon, int((closes - self.start).total_seconds() // 60)) if closes else self.horizon
+            if open_at < close_at:
+                self.slots.append({"id": slot["id"], "open": open_at, "close": close_at})
+
+    def clock(self, minute: int) -> str:
+        return (self.start + timedelta(minutes=minute)).strftime("%H:%M:%S")
+
+    def schedule(self, jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Schedule jobs in the given (priority) order.
+
+        jobs: [{"train_id", "duration_hours", ...}] - extra keys are copied
+        into the assignment.
+        Returns {"assignments", "unscheduled", "crews", "slots", "window"}.
+        """
+        # (free_at, close, slot_id) - closing time breaks ties so shorter
+        # windows fill first; (free_at, crew_no) for crews
+        slot_heap = [(slot["open"], slot["close"], slot["id"]) for slot in self.slots]
+        heapq.heapify(slot_heap)
+        crew_heap = [(0, crew) for crew in range(1, self.crews + 1)]
+        heapq.heapify(crew_heap)
+
+        assignments = []
+        unscheduled = []
+        crew_jobs: Dict[int, List[Dict[str, Any]]] = {crew: [] for crew in range(1, self.crews + 1)}
+        crew_busy = {crew: 0 for crew in crew_jobs}
+        slot_busy = {slot["id"]: 0 for slot in self.slots}
+
+        for job in jobs:
+            duration = int(round(job["duration_hours"] * 60))
+            if not slot_heap or not crew_heap:
+                unscheduled.append(job["train_id"])
+                continue
+
+            crew_free, crew = crew_heap[0]
+            # Earliest slot that can fit the job once the crew is free
+            skipped = []
+            placed = None
+            while slot_heap:
+                free_at, close, slot_id = heapq.heappop(slot_heap)
+                start = max(free_at, crew_free)
+                if start + duration <= close:
+                    placed = (start, close, slot_id)
+                    break
+                skipped.append((free_at, close, slot_id))
+            for entry in skipped:
+                heapq.heappush(slot_heap, entry)
+
+            if placed is None:
+                unscheduled.append(job["train_id"])
+                continue
+
+            start, close, slot_id = placed
+            end = start + duration
+            heapq.heapreplace(crew_heap, (end, crew))
+            heapq.heappush(slot_heap, (end, close, slot_id))
+            crew_busy[crew] += duration
+            slot_busy[slot_id] += duration
+
+            assignment = {
+                **{k: v for k, v in job.items() if k != "duration_hours"},
+                "start_time": self.clock(start),
+                "end_time": self.clock(end),
+                "slot_id": slot_id,
+                "crew_id": f"CREW{crew:02d}",
+                "crew_assigned": 1
+            }
+            assignments.append(assignment)
+            crew_jobs[crew].append({
+                "train_id": job["train_id"],
+                "slot_id": slot_id,
+                "start_time": assignment["start_time"],
+                "end_time": assignment["end_time"]
+            })
+
+        crews = []
+        for crew, timeline in crew_jobs.items():
+            busy = crew_busy[crew]
+            crews.append({
+                "crew_id": f"CREW{crew:02d}",
+                "timeline": timeline,
+                "busy_hours": round(busy / 60, 2),
+                "utilization": round(busy / self.horizon, 3) if self.horizon else 0.0
+            })
+
+        slots = [{
+            "slot_id": slot["id"],
+            "open_from": self.clock(slot["open"]),
+            "open_until": self.clock(slot["close"]),
+            "busy_hours": round(slot_busy[slot["id"]] / 60, 2),
+            "utilization": round(slot_busy[slot["id"]] / (slot["close"] - slot["open"]), 3)
+        } for slot in self.slots]
+
+        return {
+            "assignments": assignments,
+            "unscheduled": unscheduled,
+            "crews": crews,
+            "slots": slots,
+            "window": {
+                "start": self.start.strftime("%Y-%m-%d %H:%M:%S"),
+                "end": (self.start + timedelta(minutes=self.horizon)).strftime("%Y-%m-%d %H:%M:%S")
+            }
+        }
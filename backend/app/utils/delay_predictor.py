@@ -1,7 +1,18 @@
 import joblib
 import os
+import numpy as np
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
+from app.utils.fleet_registry import FleetRegistry
+from app.utils.delay_stats import DelayStats, add_events, DEFAULT_PERCENTILES
+from app.utils.timeline import (
+    TICKS_PER_MINUTE,
+    parse_hhmm,
+    hour_of,
+    format_hhmm,
+    simulate_rotations,
+    events_by_train,
+)
 
 DELAY_KEYWORDS = [
     "brake", "door", "traction", "signalling", "signal", "fault", "engine", "wheel",
@@ -79,202 +90,151 @@ class DelayPredictor:
         # Up to +30% delay at very high utilization
         return 1.0 + min((avg_util - 0.75) * 0.6, 0.3)
 
+    def _prediction_grid(self, stations: List[str], weather_by_station: Dict[str, str]) -> Dict[str, Any]:
+        """Model outputs for every (station, time bucket, job card flag) feature row.
+
+        These are the only features predict_for_day feeds the models, so one
+        batched predict_proba / predict per model replaces a call per event.
+        """
+        buckets = len(self.time_map)
+        features = [
+            [self.station_map.get(station, 0), self.weather_map.get(weather_by_station.get(station, "clear"), 0), bucket, flag]
+            for station in stations
+            for bucket in range(buckets)
+            for flag in (0, 1)
+        ]
+        shape = (len(stations), buckets, 2)
+        proba = getattr(self.classifier, "predict_proba", None)
+        if proba:
+            probability = self.classifier.predict_proba(features)[:, 1].reshape(shape)
+            risk = probability >= 0.4
+        else:
+            probability = None
+            risk = self.classifier.predict(features).astype(int).reshape(shape) == 1
+        return {
+            "probability": probability,
+            "risk": risk,
+            "regression": self.regressor.predict(features).reshape(shape)
+        }
+
     def predict_for_day(self,
                         scheduled_trains: List[Dict[str, Any]],
                         station_timings: List[Dict[str, Any]],
                         weather_by_station: Dict[str, str],
-                        train_configs: Dict[str, Any]) -> Dict[str, Any]:
+                        train_configs: Dict[str, Any],
+                        fleet: FleetRegistry = None) -> Dict[str, Any]:
         stations = [s["station"] for s in station_timings]
+        if fleet is None:
+            fleet = FleetRegistry.from_input_data(train_configs)
         self._init_encoders(stations, list(set(weather_by_station.values())))
 
-        results = []
         service_hours = {"start": "07:30", "end": "22:00"}
-        service_start_dt = datetime.strptime(service_hours["start"], "%H:%M")
-        service_end_dt = datetime.strptime(service_hours["end"], "%H:%M")
+        service_start = parse_hhmm(service_hours["start"])
+        service_end = parse_hhmm(service_hours["end"])
+        base_trip_time = station_timings[-1]["cumulative_time"]
+        turnaround_time = 8
+
+        grid = self._prediction_grid(stations, weather_by_station)
+        # Time bucket of every hour of the day, as the models encode it
+        hour_buckets = np.array([self.time_map[self._time_bucket(f"{hour:02d}:00")] for hour in range(24)])
+
+        # Per-train features: job card flag, fatigue and, for risky events, the causes at each station
+        configs = [fleet.get(train.get("train_id"), {}) for train in scheduled_trains]
+        relevant = np.array([self._is_delay_relevant_jobcard(c.get("job_cards", [])) for c in configs], dtype=np.int64)
+        fatigue = np.array([self._compute_fatigue_factor(c) for c in configs])
+        # Delay of events the classifier calls safe: only maintenance-relevant, fatigued trains run late
+        fatigued = relevant.astype(bool) & (fatigue > 1.15)
+        fallback = np.where(fatigued, 0.8 * (fatigue - 1.0) * 5.0, 0.0)
+        causes = [
+            [tuple(self._extract_delay_causes(config.get("job_cards", []), weather_by_station.get(station, "clear"))) for station in stations]
+            for config in configs
+        ]
+
+        first_departures = np.array([
+            parse_hhmm(train["departure_time"]) if train.get("departure_time")
+            else service_start + (train.get("departure_slot", 1) - 1) * 10 * TICKS_PER_MINUTE
+            for train in scheduled_trains
+        ], dtype=np.int64)
+
+        cumulative = np.array([s["cumulative_time"] for s in station_timings])
+        # Progressive accumulation for realism
+        forward_ratio = np.array([0.1 if i == 0 else c / base_trip_time for i, c in enumerate(cumulative.tolist())])
+        return_ratio = (base_trip_time - cumulative[::-1]) / base_trip_time if base_trip_time else np.zeros(len(cumulative))
+
+        def leg_delays(direction, in_service, leg_start, scheduled, stations_idx):
+            buckets = hour_buckets[hour_of(scheduled)]
+            flags = relevant[in_service][:, None]
+            cells = (stations_idx[None, :], buckets, flags)
+            risk = grid["risk"][cells]
+            delay = np.where(risk, grid["regression"][cells] * fatigue[in_service][:, None], fallback[in_service][:, None])
+            ratio = forward_ratio if direction == "forward" else return_ratio
+            effective = delay * ratio[None, :]
+            extras = {"has_delay": risk | fatigued[in_service][:, None]}
+            if grid["probability"] is not None:
+                extras["probability"] = grid["probability"][cells]
+            # The terminal arrival runs late by the delay accumulated over the leg
+            return effective, np.cumsum(effective, axis=1)[:, -1], extras
+
+        timeline = simulate_rotations(first_departures, cumulative, service_end, leg_delays, turnaround_time)
+
+        def build_events(leg):
+            station_order = leg["stations"].tolist()
+            first_sequence = ((leg["rotation"] - 1) * 2 + (leg["direction"] == "return")) * len(stations) + 1
+            probabilities = leg["probability"].tolist() if "probability" in leg else None
+            events = []
+            for row, (train, scheduled, expected, delays, has_delay) in enumerate(zip(
+                leg["trains"].tolist(), format_hhmm(leg["scheduled"]), format_hhmm(leg["expected"]),
+                leg["delay"].tolist(), leg["has_delay"].tolist()
+            )):
+                events.append([
+                    {
+                        "station": stations[j],
+                        "scheduled_arrival": scheduled[i],
+                        "expected_arrival": expected[i],
+                        "delay_minutes": round(delays[i], 1),
+                        "delay_reasons": list(causes[train][j]) if has_delay[i] else [],
+                        "delay_probability": round(probabilities[row][i], 2) if probabilities is not None else None,
+                        "direction": leg["direction"],
+                        "rotation": leg["rotation"],
+                        "sequence": first_sequence + i,
+                        "next_station_duration": station_timings[j]["next_station_duration"],
+                        "cumulative_time": station_timings[j]["cumulative_time"],
+                        "significant_delay": delays[i] > 2.0
+                    }
+                    for i, j in enumerate(station_order)
+                ])
+            return events
+
+        train_events = events_by_train(timeline, len(scheduled_trains), build_events)
+        first_departure_times = format_hhmm(first_departures)
+        last_arrival_times = format_hhmm(timeline["last_arrival"])
+        rotations = timeline["rotations"].tolist()
 
-        for train in scheduled_trains:
-            train_id = train.get("train_id")
-            departure_slot = train.get("departure_slot", 1)
-            first_departure = datetime.strptime("07:30", "%H:%M") + timedelta(minutes=(departure_slot - 1) * 10)
-            # Find train config
-            config = next((t for t in train_configs.get("trains", []) if t.get("id") == train_id), {})
+        results = []
+        day_stats = DelayStats(DEFAULT_PERCENTILES)
+        for k, train in enumerate(scheduled_trains):
+            config = configs[k]
             job_cards = config.get("job_cards", [])
-
-            station_events = []
-            rotation_count = 0
-            current_departure = first_departure
-            last_arrival_dt = first_departure
-
-            base_trip_time = station_timings[-1]["cumulative_time"]
-            turnaround_time = 8
-
-            while current_departure <= service_end_dt:
-                rotation_count += 1
-                # forward journey
-                fwd_delay_sum = 0.0
-                for i, station in enumerate(station_timings):
-                    station_name = station["station"]
-                    sched_arrival_dt = current_departure + timedelta(minutes=station["cumulative_time"])
-                    sched_arrival = sched_arrival_dt.strftime("%H:%M")
-                    time_bucket = self._time_bucket(sched_arrival)
-                    weather = weather_by_station.get(station_name, "clear")
-
-                    features = [
-                        self.station_map.get(station_name, 0),
-                        self.weather_map.get(weather, 0),
-                        self.time_map.get(time_bucket, 0),
-                        1 if self._is_delay_relevant_jobcard(job_cards) else 0
-                    ]
-
-                    # Use probability thresholding for sensitivity to maintenance
-                    proba = getattr(self.classifier, "predict_proba", None)
-                    if proba:
-                        p_delay = float(self.classifier.predict_proba([features])[0][1])
-                        risk = 1 if p_delay >= 0.4 else 0
-                    else:
-                        risk = int(self.classifier.predict([features])[0])
-                    delay_pred = 0.0
-                    causes = []
-                    if risk == 1:
-                        delay_pred = float(self.regressor.predict([features])[0])
-                        # Fatigue multiplier
-                        fatigue_mult = self._compute_fatigue_factor(config)
-                        delay_pred *= fatigue_mult
-                        causes = self._extract_delay_causes(job_cards, weather)
-                    else:
-                        # If maintenance-relevant issues present and fatigue is high, add small expected delay
-                        if self._is_delay_relevant_jobcard(job_cards):
-                            fatigue_mult = self._compute_fatigue_factor(config)
-                            if fatigue_mult > 1.15:
-                                delay_pred = 0.8 * (fatigue_mult - 1.0) * 5.0  # up to ~2 min
-                                causes = self._extract_delay_causes(job_cards, weather)
-
-                    # Progressive accumulation for realism
-                    progress_ratio = 0.1 if i == 0 else station["cumulative_time"] / base_trip_time
-                    effective_delay = delay_pred * progress_ratio
-
-                    expected_arrival_dt = sched_arrival_dt + timedelta(minutes=effective_delay)
-                    expected_arrival = expected_arrival_dt.strftime("%H:%M")
-
-                    station_events.append({
-                        "station": station_name,
-                        "scheduled_arrival": sched_arrival,
-                        "expected_arrival": expected_arrival,
-                        "delay_minutes": round(effective_delay, 1),
-                        "delay_reasons": causes,
-                        "delay_probability": round(p_delay, 2) if proba else None,
-                        "direction": "forward",
-                        "rotation": rotation_count,
-                        "sequence": len(station_events) + 1,
-                        "next_station_duration": station["next_station_duration"],
-                        "cumulative_time": station["cumulative_time"],
-                        "significant_delay": effective_delay > 2.0
-                    })
-                    fwd_delay_sum += effective_delay
-
-                # turnaround at end
-                pettah_arrival_dt = current_departure + timedelta(minutes=base_trip_time + fwd_delay_sum)
-                return_departure_dt = pettah_arrival_dt + timedelta(minutes=turnaround_time)
-
-                # return journey
-                ret_delay_sum = 0.0
-                for i, station in enumerate(reversed(station_timings)):
-                    station_name = station["station"]
-                    return_minutes = base_trip_time - station["cumulative_time"]
-                    sched_return_dt = return_departure_dt + timedelta(minutes=return_minutes)
-                    sched_return = sched_return_dt.strftime("%H:%M")
-                    time_bucket = self._time_bucket(sched_return)
-                    weather = weather_by_station.get(station_name, "clear")
-
-                    features = [
-                        self.station_map.get(station_name, 0),
-                        self.weather_map.get(weather, 0),
-                        self.time_map.get(time_bucket, 0),
-                        1 if self._is_delay_relevant_jobcard(job_cards) else 0
-                    ]
-
-                    # Probability threshold again
-                    proba = getattr(self.classifier, "predict_proba", None)
-                    if proba:
-                        p_delay = float(self.classifier.predict_proba([features])[0][1])
-                        risk = 1 if p_delay >= 0.4 else 0
-                    else:
-                        risk = int(self.classifier.predict([features])[0])
-                    delay_pred = 0.0
-                    causes = []
-                    if risk == 1:
-                        delay_pred = float(self.regressor.predict([features])[0])
-                        fatigue_mult = self._compute_fatigue_factor(config)
-                        delay_pred *= fatigue_mult
-                        causes = self._extract_delay_causes(job_cards, weather)
-                    else:
-                        if self._is_delay_relevant_jobcard(job_cards):
-                            fatigue_mult = self._compute_fatigue_factor(config)
-                            if fatigue_mult > 1.15:
-                                delay_pred = 0.8 * (fatigue_mult - 1.0) * 5.0
-                                causes = self._extract_delay_causes(job_cards, weather)
-
-                    progress_ratio = (return_minutes / base_trip_time) if base_trip_time else 0
-                    effective_delay = delay_pred * progress_ratio
-
-                    expected_return_dt = sched_return_dt + timedelta(minutes=effective_delay)
-                    expected_return = expected_return_dt.strftime("%H:%M")
-
-                    station_events.append({
-                        "station": station_name,
-                        "scheduled_arrival": sched_return,
-                        "expected_arrival": expected_return,
-                        "delay_minutes": round(effective_delay, 1),
-                        "delay_reasons": causes,
-                        "delay_probability": round(p_delay, 2) if proba else None,
-                        "direction": "return",
-                        "rotation": rotation_count,
-                        "sequence": len(station_events) + 1,
-                        "next_station_duration": station["next_station_duration"],
-                        "cumulative_time": station["cumulative_time"],
-                        "significant_delay": effective_delay > 2.0
-                    })
-                    ret_delay_sum += effective_delay
-
-                # prepare next rotation from Aluva
-                aluva_arrival_dt = return_departure_dt + timedelta(minutes=base_trip_time + ret_delay_sum)
-                last_arrival_dt = aluva_arrival_dt
-                current_departure = aluva_arrival_dt + timedelta(minutes=turnaround_time)
-
+            station_events = train_events[k]
+            train_stats = DelayStats()
+            add_events(station_events, train_stats, day_stats)
             results.append({
-                "train_id": train_id,
-                "departure_slot": departure_slot,
+                "train_id": train.get("train_id"),
+                "departure_slot": train.get("departure_slot", 1),
                 "readiness": train.get("readiness", 0),
-                "total_rotations": rotation_count,
-                "first_departure": first_departure.strftime("%H:%M"),
-                "last_arrival": last_arrival_dt.strftime("%H:%M"),
+                "total_rotations": rotations[k],
+                "first_departure": first_departure_times[k],
+                "last_arrival": last_arrival_times[k],
                 "station_events": station_events,
                 "train_config": {
                     "job_cards_count": len(job_cards),
                     "high_critical_jobs": len([j for j in job_cards if j.get("criticality") == "high"]),
                     "total_mileage": sum(config.get("current_mileage", {}).values()) if isinstance(config.get("current_mileage"), dict) else 0
                 },
-                "delay_analysis": {
-                    "base_trip_time": base_trip_time,
-                    "total_trip_time": base_trip_time * 2,
-                    "total_delay": round(sum(e.get("delay_minutes", 0) for e in station_events), 1),
-                    "delay_breakdown": {
-                        "job_cards": round(sum(e.get("delay_minutes", 0) for e in station_events if any(r.startswith("job_card:") for r in e.get("delay_reasons", []))), 1),
-                        "maintenance": 0.0,
-                        "weather": round(sum(e.get("delay_minutes", 0) for e in station_events if any(r.startswith("weather:") for r in e.get("delay_reasons", []))), 1),
-                    },
-                    "delay_reasons": list({reason for e in station_events for reason in e.get("delay_reasons", [])})
-                }
+                "delay_analysis": train_stats.delay_analysis(base_trip_time)
             })
 
-        all_events = [ev for tr in results for ev in tr["station_events"]]
-        summary = {
-            "total_events": len(all_events),
-            "delayed_events": len([e for e in all_events if e.get("delay_minutes", 0) > 1.0]),
-            "significant_delays": len([e for e in all_events if e.get("significant_delay")]),
-            "max_delay": max([e.get("delay_minutes", 0) for e in all_events]) if all_events else 0,
-            "avg_delay": round(sum([e.get("delay_minutes", 0) for e in all_events]) / len(all_events), 1) if all_events else 0,
-        }
+        summary = day_stats.summary()
 
         return {
             "train_schedules": results,
@@ -287,7 +247,8 @@ class DelayPredictor:
     def predict_on_schedule(self,
                             baseline_rotation: Dict[str, Any],
                             train_configs: Dict[str, Any],
-                            weather_by_station: Dict[str, str]) -> Dict[str, Any]:
+                            weather_by_station: Dict[str, str],
+                            fleet: FleetRegistry = None) -> Dict[str, Any]:
         """Augment an existing baseline rotation schedule by predicting delays per event using ML.
         Keeps the original rotation timing (scheduled arrivals, number of rotations, first/last times)."""
         stations = [s for s in baseline_rotation.get("stations", [])]
@@ -295,16 +256,21 @@ class DelayPredictor:
         station_timings = baseline_rotation.get("station_timings", [])
         self._init_encoders([s if isinstance(s, str) else s.get("station", "") for s in (stations if stations and isinstance(stations[0], str) else [st.get("station", "") for st in station_timings])], list(set(weather_by_station.values())))
 
+        if fleet is None:
+            fleet = FleetRegistry.from_input_data(train_configs)
+
         updated_trains = []
+        day_stats = DelayStats(DEFAULT_PERCENTILES)
         for train in baseline_rotation.get("train_schedules", []):
             train_id = train.get("train_id")
-            config = next((t for t in train_configs.get("trains", []) if t.get("id") == train_id), {})
+            config = fleet.get(train_id, {})
             job_cards = config.get("job_cards", [])
             base_trip_time = 0
             if station_timings:
                 base_trip_time = station_timings[-1].get("cumulative_time", 46)
 
             station_events = []
+            train_stats = DelayStats()
             for ev in train.get("station_events", []):
                 station_name = ev.get("station")
                 sched_time = ev.get("scheduled_arrival")
@@ -366,32 +332,17 @@ class DelayPredictor:
                 ev_updated["delay_reasons"] = causes
                 ev_updated["delay_probability"] = round(p_delay, 2) if p_delay is not None else None
                 station_events.append(ev_updated)
+                train_stats.add(ev_updated)
+                day_stats.add(ev_updated)
 
             # Recompute totals
             updated_trains.append({
                 **{k: v for k, v in train.items() if k not in ["station_events", "delay_analysis"]},
                 "station_events": station_events,
-                "delay_analysis": {
-                    "base_trip_time": base_trip_time,
-                    "total_trip_time": base_trip_time * 2,
-                    "total_delay": round(sum(e.get("delay_minutes", 0) for e in station_events), 1),
-                    "delay_breakdown": {
-                        "job_cards": round(sum(e.get("delay_minutes", 0) for e in station_events if any(r.startswith("job_card:") for r in e.get("delay_reasons", []))), 1),
-                        "maintenance": round(sum(e.get("delay_minutes", 0) for e in station_events if any(r.startswith("fatigue:") for r in e.get("delay_reasons", []))), 1),
-                        "weather": round(sum(e.get("delay_minutes", 0) for e in station_events if any(r.startswith("weather:") for r in e.get("delay_reasons", []))), 1),
-                    },
-                    "delay_reasons": list({reason for e in station_events for reason in e.get("delay_reasons", [])})
-                }
+                "delay_analysis": train_stats.delay_analysis(base_trip_time)
             })
 
-        all_events = [ev for tr in updated_trains for ev in tr.get("station_events", [])]
-        summary = {
-            "total_events": len(all_events),
-            "delayed_events": len([e for e in all_events if e.get("delay_minutes", 0) > 1.0]),
-            "significant_delays": len([e for e in all_events if e.get("significant_delay")]),
-            "max_delay": max([e.get("delay_minutes", 0) for e in all_events]) if all_events else 0,
-            "avg_delay": round(sum([e.get("delay_minutes", 0) for e in all_events]) / len(all_events), 1) if all_events else 0,
-        }
+        summary = day_stats.summary()
 
         return {
             **{k: v for k, v in baseline_rotation.items() if k not in ["train_schedules", "summary"]},
@@ -0,0 +1,96 @@
+from typing import Dict, Any, List, Optional, Sequence
+import math
+
+# Reason prefix -> delay_breakdown category
+CAUSE_CATEGORIES = {
+    "job_card:": "job_cards",
+    "fatigue:": "maintenance",
+    "weather:": "weather"
+}
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+class DelayStats:
+    """Delay aggregates of station events, updated one event at a time.
+
+    Keeps counts, max, running total and per-cause totals, so summaries need
+    no flattened event list and no rescans. With percentiles set, a histogram
+    of the (0.1-minute rounded) delays serves as an exact streaming sketch
+    for the requested percentiles.
+    """
+
+    def __init__(self, percentiles: Optional[Sequence[int]] = None):
+        self.events = 0
+        self.delayed = 0
+        self.significant = 0
+        self.max_delay = None
+        self.total_delay = 0.0
+        self.cause_totals = {category: 0.0 for category in CAUSE_CATEGORIES.values()}
+        self.reasons = set()
+        self.percentiles = tuple(percentiles) if percentiles else ()
+        self._histogram: Dict[float, int] = {}
+
+    def add(self, event: Dict[str, Any]):
+        delay = event.get("delay_minutes", 0)
+        self.events += 1
+        if delay > 1.0:
+            self.delayed += 1
+        if event.get("significant_delay"):
+            self.significant += 1
+        if self.max_delay is None or delay > self.max_delay:
+            self.max_delay = delay
+        self.total_delay += delay
+
+        categories = set()
+        for reason in event.get("delay_reasons", []):
+            self.reasons.add(reason)
+            category = CAUSE_CATEGORIES.get(reason[:reason.find(":") + 1])
+            if category:
+                categories.add(category)
+        for category in categories:
+            self.cause_totals[category] += delay
+
+        if self.percentiles:
+            self._histogram[delay] = self._histogram.get(delay, 0) + 1
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank q-th percentile of the delays seen (0 with no events)"""
+        if not self.events:
+            return 0
+        rank = max(1, math.ceil(q / 100 * self.events))
+        seen = 0
+        for delay in sorted(self._histogram):
+            seen += self._histogram[delay]
+            if seen >= rank:
+                return delay
+        return self.max_delay
+
+    def summary(self) -> Dict[str, Any]:
+        """Rotation / prediction summary block"""
+        summary = {
+            "total_events": self.events,
+            "delayed_events": self.delayed,
+            "significant_delays": self.significant,
+            "max_delay": self.max_delay if self.events else 0,
+            "avg_delay": round(self.total_delay / self.events, 1) if self.events else 0
+        }
+        if self.percentiles:
+            summary["delay_percentiles"] = {f"p{q}": self.percentile(q) for q in self.percentiles}
+        return summary
+
+    def delay_analysis(self, base_trip_time: float) -> Dict[str, Any]:
+        """Per-train delay_analysis block"""
+        return {
+            "base_trip_time": base_trip_time,
+            "total_trip_time": base_trip_time * 2,
+            "total_delay": round(self.total_delay, 1),
+            "delay_breakdown": {category: round(total, 1) for category, total in self.cause_totals.items()},
+            "delay_reasons": list(self.reasons)
+        }
+
+
+def add_events(events: List[Dict[str, Any]], *stats: DelayStats):
+    """Feed events, in order, to every accumulator given"""
+    for event in events:
+        for accumulator in stats:
+            accumulator.add(event)
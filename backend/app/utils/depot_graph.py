@@ -1,55 +1,284 @@
-from typing import List, Dict, Set, Tuple
-import heapq
+from typing import List, Dict, Set, Tuple, Iterable, Any
+from collections import OrderedDict
+import bisect
+import hashlib
+import json
+import numpy as np
+
+UNREACHABLE = -1
+NO_PREDECESSOR = -1
+
+# All-pairs tables keyed by a hash of the connections map, shared by every
+# DepotGraph built over the same layout
+_TABLE_CACHE: "OrderedDict[str, DistanceTables]" = OrderedDict()
+_TABLE_CACHE_SIZE = 8
+
+
+class DistanceTables:
+    """BFS all-pairs distance and predecessor tables for an unweighted depot graph.
+
+    dist[s, t] is the number of moves from node s to node t (UNREACHABLE if none)
+    and pred[s, t] is the node before t on the shortest path from s. Among equal
+    length paths the predecessor is the lexicographically smallest bay, which is
+    the path the previous per-call Dijkstra returned.
+    """
+
+    def __init__(self, connections: Dict[str, List[str]]):
+        self.nodes = sorted(connections)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.adjacency = [
+            sorted({self.index[n] for n in connections[node] if n in self.index})
+            for node in self.nodes
+        ]
+        n = len(self.nodes)
+        self.dist = np.full((n, n), UNREACHABLE, dtype=np.int32)
+        self.pred = np.full((n, n), NO_PREDECESSOR, dtype=np.int32)
+        for source in range(n):
+            self._bfs(source)
+
+    def _bfs(self, source: int):
+        """Level-synchronous BFS; nodes in a level are expanded in name order"""
+        n = len(self.nodes)
+        dist = [UNREACHABLE] * n
+        pred = [NO_PREDECESSOR] * n
+        dist[source] = 0
+        level = [source]
+        depth = 0
+        while level:
+            depth += 1
+            next_level = []
+            # Node indexes follow name order, so sorting the level by index
+            # expands the lexicographically smallest bay first
+            for u in sorted(level):
+                for v in self.adjacency[u]:
+                    if dist[v] == UNREACHABLE:
+                        dist[v] = depth
+                        pred[v] = u
+                        next_level.append(v)
+            level = next_level
+        self.dist[source] = dist
+        self.pred[source] = pred
+
+    def copy(self) -> "DistanceTables":
+        """Private copy that can be repaired without touching the shared cache"""
+        clone = DistanceTables.__new__(DistanceTables)
+        clone.nodes = self.nodes
+        clone.index = self.index
+        clone.adjacency = [list(neighbors) for neighbors in self.adjacency]
+        clone.dist = self.dist.copy()
+        clone.pred = self.pred.copy()
+        return clone
+
+    def remove_edges(self, edges: List[Tuple[int, int]]) -> int:
+        """Drop directed edges and repair only the sources whose BFS tree used one.
+
+        If u -> v is not a tree edge for source s, v keeps its distance and its
+        smallest-name predecessor, so the row for s is unchanged.
+        """
+        affected = np.zeros(len(self.nodes), dtype=bool)
+        for u, v in edges:
+            if v in self.adjacency[u]:
+                self.adjacency[u].remove(v)
+                affected |= self.pred[:, v] == u
+        sources = np.flatnonzero(affected)
+        for source in sources:
+            self._bfs(int(source))
+        return len(sources)
+
+    def add_edges(self, edges: List[Tuple[int, int]]) -> int:
+        """Add directed edges and repair only the sources they can improve.
+
+        u -> v matters for source s only if s reaches u and dist[s, u] + 1 is
+        no worse than dist[s, v] (shorter path, or a new tie-break candidate).
+        """
+        affected = np.zeros(len(self.nodes), dtype=bool)
+        for u, v in edges:
+            if v in self.adjacency[u]:
+                continue
+            bisect.insort(self.adjacency[u], v)
+            du = self.dist[:, u]
+            dv = self.dist[:, v]
+            affected |= (du != UNREACHABLE) & ((dv == UNREACHABLE) | (du + 1 <= dv))
+        sources = np.flatnonzero(affected)
+        for source in sources:
+            self._bfs(int(source))
+        return len(sources)
+
+    def path(self, source: int, target: int) -> List[str]:
+        """Reconstruct the shortest path in O(path length)"""
+        if self.dist[source, target] == UNREACHABLE:
+            return []
+        pred = self.pred[source]
+        path = [target]
+        while path[-1] != source:
+            path.append(int(pred[path[-1]]))
+        return [self.nodes[i] for i in reversed(path)]
+
+
+def _edge_key(a: str, b: str) -> Tuple[str, str]:
+    return (a, b) if a <= b else (b, a)
+
+
+def layout_hash(connections: Dict[str, List[str]]) -> str:
+    """Stable content hash of a connections map"""
+    canonical = {node: sorted(neighbors) for node, neighbors in connections.items()}
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_distance_tables(connections: Dict[str, List[str]]) -> DistanceTables:
+    """Build (or reuse) the all-pairs tables for a layout"""
+    key = layout_hash(connections)
+    tables = _TABLE_CACHE.get(key)
+    if tables is None:
+        tables = DistanceTables(connections)
+        _TABLE_CACHE[key] = tables
+        if len(_TABLE_CACHE) > _TABLE_CACHE_SIZE:
+            _TABLE_CACHE.popitem(last=False)
+    else:
+        _TABLE_CACHE.move_to_end(key)
+    return tables
+
 
 class DepotGraph:
     """Graph representation of the depot layout for pathfinding"""
-    
+
     def __init__(self, connections: Dict[str, List[str]]):
         self.graph = connections
-    
+        self.layout_hash = layout_hash(connections)
+        # Every edge has weight 1, so BFS tables give all shortest paths up front
+        self.tables = get_distance_tables(connections)
+        self._owns_tables = False
+
+        # Track closures and blocked bays; the epoch bumps on every effective change
+        self.closed_edges: Set[Tuple[str, str]] = set()
+        self.closed_nodes: Set[str] = set()
+        self.epoch = 0
+
+    @property
+    def version(self) -> Tuple[str, int]:
+        """(layout hash, epoch) - key for caching results computed on this graph"""
+        return self.layout_hash, self.epoch
+
+    def _edge_active(self, u: str, v: str) -> bool:
+        return (
+            u not in self.closed_nodes
+            and v not in self.closed_nodes
+            and _edge_key(u, v) not in self.closed_edges
+        )
+
+    def _incident_edges(self, bay: str) -> List[Tuple[str, str]]:
+        """Directed base edges touching a bay"""
+        edges = [(bay, neighbor) for neighbor in self.graph.get(bay, [])]
+        edges += [(other, bay) for other, neighbors in self.graph.items() if bay in neighbors]
+        return edges
+
+    def _segment_edges(self, a: str, b: str) -> List[Tuple[str, str]]:
+        """Directed base edges for the track segment between two bays"""
+        return [(u, v) for u, v in ((a, b), (b, a)) if v in self.graph.get(u, [])]
+
+    def _apply(self, edges: List[Tuple[str, str]], change) -> int:
+        """Run a closure change and repair the tables for edges whose state flipped"""
+        before = {edge: self._edge_active(*edge) for edge in edges}
+        change()
+        removed, added = [], []
+        index = self.tables.index
+        for (u, v), was_active in before.items():
+            if u not in index or v not in index:
+                continue
+            is_active = self._edge_active(u, v)
+            if was_active and not is_active:
+                removed.append((index[u], index[v]))
+            elif is_active and not was_active:
+                added.append((index[u], index[v]))
+        if not removed and not added:
+            return 0
+        if not self._owns_tables:
+            self.tables = self.tables.copy()
+            self._owns_tables = True
+        repaired = self.tables.remove_edges(removed) + self.tables.add_edges(added)
+        self.epoch += 1
+        return repaired
+
+    def close_edge(self, a: str, b: str) -> int:
+        """Close the track segment between two bays; returns sources repaired"""
+        return self._apply(self._segment_edges(a, b), lambda: self.closed_edges.add(_edge_key(a, b)))
+
+    def restore_edge(self, a: str, b: str) -> int:
+        return self._apply(self._segment_edges(a, b), lambda: self.closed_edges.discard(_edge_key(a, b)))
+
+    def close_node(self, bay: str) -> int:
+        """Block a bay (e.g. a stalled rake); no path may pass through it"""
+        return self._apply(self._incident_edges(bay), lambda: self.closed_nodes.add(bay))
+
+    def restore_node(self, bay: str) -> int:
+        return self._apply(self._incident_edges(bay), lambda: self.closed_nodes.discard(bay))
+
+    def closures(self) -> Dict[str, Any]:
+        return {
+            "closed_edges": [list(edge) for edge in sorted(self.closed_edges)],
+            "closed_bays": sorted(self.closed_nodes),
+            "epoch": self.epoch,
+            "layout_hash": self.layout_hash
+        }
+
+    def has_bay(self, bay: str) -> bool:
+        """Whether the bay is part of the depot layout"""
+        return bay in self.tables.index
+
+    def distance(self, start: str, end: str) -> float:
+        """Number of moves between two bays in O(1); inf if unreachable"""
+        index = self.tables.index
+        if start not in index or end not in index:
+            return float('inf')
+        d = self.tables.dist[index[start], index[end]]
+        return float('inf') if d == UNREACHABLE else int(d)
+
     def shortest_path(self, start: str, end: str) -> Tuple[int, List[str]]:
-        """Find the shortest path between two bays using Dijkstra's algorithm"""
-        if start not in self.graph or end not in self.graph:
+        """Find the shortest path between two bays from the precomputed tables"""
+        index = self.tables.index
+        if start not in index or end not in index:
             return float('inf'), []
-        
-        # Initialize distances
-        distances = {bay: float('inf') for bay in self.graph}
-        distances[start] = 0
-        
-        # Priority queue: (distance, bay, path)
-        queue = [(0, start, [])]
-        
-        while queue:
-            current_dist, current_bay, path = heapq.heappop(queue)
-            
-            if current_dist > distances[current_bay]:
-                continue
-                
-            new_path = path + [current_bay]
-            
-            if current_bay == end:
-                return current_dist, new_path
-                
-            for neighbor in self.graph[current_bay]:
-                distance = current_dist + 1  # All edges have weight 1
-                
-                if distance < distances[neighbor]:
-                    distances[neighbor] = distance
-                    heapq.heappush(queue, (distance, neighbor, new_path))
-        
-        return float('inf'), []  # No path found
-    
+        s, t = index[start], index[end]
+        d = self.tables.dist[s, t]
+        if d == UNREACHABLE:
+            return float('inf'), []  # No path found
+        return int(d), self.tables.path(s, t)
+
+    def distance_to_nearest(self, sources: Iterable[str], targets: Iterable[str]) -> Dict[str, float]:
+        """Distance from each source to its nearest target, in one batched lookup"""
+        index = self.tables.index
+        sources = list(sources)
+        target_idx = [index[t] for t in targets if t in index]
+        result = {source: float('inf') for source in sources}
+        known = [source for source in sources if source in index]
+        if not known or not target_idx:
+            return result
+        block = self.tables.dist[np.ix_([index[s] for s in known], target_idx)].astype(float)
+        block[block == UNREACHABLE] = np.inf
+        for source, d in zip(known, block.min(axis=1).tolist()):
+            result[source] = d if d == float('inf') else int(d)
+        return result
+
     def minimum_moves(self, current_positions: Dict[str, str], target_assignments: Dict[str, str]) -> Dict[str, int]:
         """Calculate minimum moves required for each train to reach target bay"""
-        moves_required = {}
-        
-        for train_id, target_bay in target_assignments.items():
+        index = self.tables.index
+        train_ids = list(target_assignments)
+        moves_required = {train_id: UNREACHABLE for train_id in train_ids}
+
+        lookup_ids, sources, targets = [], [], []
+        for train_id in train_ids:
             current_bay = current_positions.get(train_id, "Unknown")
-            
+            target_bay = target_assignments[train_id]
             if current_bay == target_bay:
                 moves_required[train_id] = 0
-            else:
-                distance, _ = self.shortest_path(current_bay, target_bay)
-                moves_required[train_id] = distance if distance != float('inf') else -1
-        
-        return moves_required
\ No newline at end of file
+            elif current_bay in index and target_bay in index:
+                lookup_ids.append(train_id)
+                sources.append(index[current_bay])
+                targets.append(index[target_bay])
+
+        if lookup_ids:
+            # One fancy-indexed read for the whole batch; UNREACHABLE stays -1
+            distances = self.tables.dist[sources, targets].tolist()
+            moves_required.update(zip(lookup_ids, distances))
+
+        return moves_required
@@ -0,0 +1,77 @@
+from typing import List, Dict, Any, Optional, Iterator
+
+
+class FleetRegistry:
+    """Hash-indexed view of the fleet for O(1) per-train lookups.
+
+    Works over any list of per-train records: Layer 1 input trains (keyed by
+    "id") or readiness / assignment entries (keyed by "train_id"). Secondary
+    indexes map bay, status and job card criticality to train ids.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], id_key: str = "id"):
+        self.id_key = id_key
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.by_bay: Dict[str, List[str]] = {}
+        self.by_status: Dict[str, List[str]] = {}
+        self.by_criticality: Dict[str, List[str]] = {}
+
+        for record in records or []:
+            train_id = record.get(id_key)
+            if train_id is None:
+                continue
+            self.records[train_id] = record
+
+            bay = self._bay_of(record)
+            if bay:
+                self.by_bay.setdefault(bay, []).append(train_id)
+
+            status = record.get("status")
+            if status:
+                self.by_status.setdefault(status, []).append(train_id)
+
+            for criticality in {job.get("criticality") for job in record.get("job_cards", []) or []}:
+                if criticality:
+                    self.by_criticality.setdefault(criticality, []).append(train_id)
+
+    @classmethod
+    def from_input_data(cls, input_data: Dict[str, Any]) -> "FleetRegistry":
+        """Registry over the trains of an input_data.json payload"""
+        return cls(input_data.get("trains", []), id_key="id")
+
+    @staticmethod
+    def _bay_of(record: Dict[str, Any]) -> Optional[str]:
+        bay = record.get("bay") or record.get("track_id")
+        if bay:
+            return bay
+        position = record.get("current_position")
+        if position:
+            return position.split("-")[0]
+        return None
+
+    def get(self, train_id: str, default: Any = None) -> Any:
+        return self.records.get(train_id, default)
+
+    def __getitem__(self, train_id: str) -> Dict[str, Any]:
+        return self.records[train_id]
+
+    def __contains__(self, train_id: str) -> bool:
+        return train_id in self.records
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def ids(self) -> List[str]:
+        return list(self.records)
+
+    def in_bay(self, bay: str) -> List[str]:
+        return self.by_bay.get(bay, [])
+
+    def with_status(self, status: str) -> List[str]:
+        return self.by_status.get(status, [])
+
+    def with_criticality(self, criticality: str) -> List[str]:
+        return self.by_criticality.get(criticality, [])
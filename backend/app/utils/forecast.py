@@ -1,8 +1,19 @@
 import json
 import math
-from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from datetime import datetime
+from typing import Dict, List, Any, Tuple
 import logging
+import numpy as np
+from app.utils.fleet_registry import FleetRegistry
+from app.utils.delay_stats import DelayStats, add_events, DEFAULT_PERCENTILES
+from app.utils.timeline import (
+    TICKS_PER_MINUTE,
+    parse_hhmm,
+    hour_of,
+    format_hhmm,
+    simulate_rotations,
+    events_by_train,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +46,9 @@ STATION_TIMINGS = [
 def get_station_timings():
     return STATION_TIMINGS
 
+# Peak hours raise usage wear and job-card delays
+PEAK_HOURS = [7, 8, 9, 17, 18, 19]
+
 # Delay-related keyword heuristics
 DELAY_KEYWORDS = [
     "brake", "door", "traction", "signalling", "signal", "fault", "engine", "wheel",
@@ -120,8 +134,7 @@ def calculate_usage_based_delay(train_config: Dict, trip_hour: int) -> float:
     job_cards = train_config.get("job_cards", [])
     
     # Base usage factor (higher during peak hours)
-    peak_hours = [7, 8, 9, 17, 18, 19]
-    usage_factor = 1.2 if trip_hour in peak_hours else 1.0
+    usage_factor = 1.2 if trip_hour in PEAK_HOURS else 1.0
     
     # Calculate component wear delays
     for component, mileage in current_mileage.items():
@@ -159,7 +172,7 @@ def calculate_job_card_impact(job_cards: List[Dict], trip_hour: int) -> Dict[str
             continue
         
         # Delay increases with criticality and during peak hours
-        peak_multiplier = 1.3 if trip_hour in [7, 8, 9, 17, 18, 19] else 1.0
+        peak_multiplier = 1.3 if trip_hour in PEAK_HOURS else 1.0
         
         if criticality == "high":
             delay = min(estimated_hours * 0.1 * peak_multiplier, 3.0)  # Max 3 min per high critical job
@@ -236,124 +249,206 @@ def calculate_trip_delays(train_config: Dict, weather_data: Dict, trip_hour: int
         "significant_delay": total_delay > 2.0  # Flag for UI
     }
 
+class DelayTable:
+    """calculate_trip_delays for every train, hour of day and station, computed once.
+
+    A trip delay only depends on (train, hour, station): usage and job-card
+    delays on the train and whether the hour is a peak hour, weather on the
+    hour and station. Each part is computed once per distinct input and
+    broadcast into trains x 24 hours x stations arrays; each cell's reason
+    list is an index into a table of interned reason tuples.
+    """
+
+    HOURS = 24
+
+    def __init__(self, train_configs: Dict[str, Dict], weather_data: Dict, stations: List[str]):
+        self.train_index = {train_id: i for i, train_id in enumerate(train_configs)}
+        self.station_index = {station: j for j, station in enumerate(stations)}
+        hours = range(self.HOURS)
+
+        # Train part: usage wear + job cards, per peak / off-peak hour
+        usage = np.zeros((len(train_configs), self.HOURS))
+        job_cards = np.zeros((len(train_configs), self.HOURS))
+        train_reason_ids = np.zeros((len(train_configs), self.HOURS), dtype=np.int64)
+        interned: Dict[Tuple[str, ...], int] = {}
+        for i, train_config in enumerate(train_configs.values()):
+            by_peak = {}
+            for hour in hours:
+                peak = hour in PEAK_HOURS
+                if peak not in by_peak:
+                    usage_delay = calculate_usage_based_delay(train_config, hour)
+                    job_impact = calculate_job_card_impact(train_config.get("job_cards", []), hour)
+                    reasons = []
+                    if usage_delay > 0.5:
+                        reasons.append(f"Open maintenance Job cards: +{usage_delay:.1f}min")
+                    reasons.extend(job_impact["details"])  # Only significant job delays
+                    by_peak[peak] = (usage_delay, job_impact["total_delay"], interned.setdefault(tuple(reasons), len(interned)))
+                usage[i, hour], job_cards[i, hour], train_reason_ids[i, hour] = by_peak[peak]
+        train_reasons = list(interned)
+
+        # Station part: weather, per hour and station
+        weather = np.zeros((self.HOURS, len(stations)))
+        weather_reason_ids = np.zeros((self.HOURS, len(stations)), dtype=np.int64)
+        interned = {}
+        for hour in hours:
+            for j, station in enumerate(stations):
+                weather_delay = calculate_weather_delay(weather_data, hour, station)
+                reasons = (f"Weather: +{weather_delay:.1f}min",) if weather_delay > 0.5 else ()
+                weather[hour, j] = weather_delay
+                weather_reason_ids[hour, j] = interned.setdefault(reasons, len(interned))
+        weather_reasons = list(interned)
+
+        self.usage = usage
+        self.job_cards = job_cards
+        self.weather = weather
+        # Same summation order as calculate_trip_delays
+        self.total = usage[:, :, None] + job_cards[:, :, None] + weather[None, :, :]
+        self.significant = self.total > 2.0
+
+        combined = train_reason_ids[:, :, None] * len(weather_reasons) + weather_reason_ids[None, :, :]
+        distinct, inverse = np.unique(combined, return_inverse=True)
+        self.reason_ids = inverse.reshape(combined.shape)
+        self.reasons: List[Tuple[str, ...]] = [
+            train_reasons[code // len(weather_reasons)] + weather_reasons[code % len(weather_reasons)]
+            for code in distinct.tolist()
+        ]
+
+    def trip_delays(self, train_id: str, trip_hour: int, station: str) -> Dict[str, Any]:
+        """Same result as calculate_trip_delays, read from the table"""
+        i, h, j = self.train_index[train_id], trip_hour % self.HOURS, self.station_index[station]
+        total_delay = float(self.total[i, h, j])
+        return {
+            "total_delay": total_delay,
+            "breakdown": {
+                "usage": float(self.usage[i, h]),
+                "job_cards": float(self.job_cards[i, h]),
+                "weather": float(self.weather[h, j])
+            },
+            "delay_reasons": list(self.reasons[self.reason_ids[i, h, j]]),
+            "significant_delay": total_delay > 2.0
+        }
+
+    def train_rows(self, train_id: str) -> Tuple[List[List[float]], List[List[int]]]:
+        """(total delay, reason id) per [hour][station] for one train, as plain lists"""
+        i = self.train_index[train_id]
+        return self.total[i].tolist(), self.reason_ids[i].tolist()
+
+
 def generate_continuous_rotation(
     scheduled_trains: List[Dict],
     train_configs: Dict, 
     station_timings: List[Dict],
     weather_data: Dict,
-    service_date: str
+    service_date: str,
+    fleet: FleetRegistry = None,
+    delay_table: DelayTable = None
 ) -> Dict[str, Any]:
-    """Generate continuous rotation throughout the day"""
+    """Generate continuous rotation throughout the day
+
+    Trip delays are read from a DelayTable of the scheduled trains, built
+    here unless one is passed in. Arrival times for all trains, rotations and
+    stations come from the integer-tick timeline engine (app.utils.timeline)
+    and are formatted as HH:MM only when the events are built.
+    """
     
-    train_schedules = []
+    if fleet is None:
+        fleet = FleetRegistry.from_input_data(train_configs)
+
+    # Trains with a known configuration, in schedule order
+    trains = [train for train in scheduled_trains if fleet.get(train.get("train_id"))]
+    train_ids = [train.get("train_id") for train in trains]
+    if delay_table is None:
+        delay_table = DelayTable(
+            {train_id: fleet.get(train_id) for train_id in train_ids},
+            weather_data,
+            [s["station"] for s in station_timings]
+        )
+    reasons = delay_table.reasons
+    table_rows = np.array([delay_table.train_index[train_id] for train_id in train_ids], dtype=np.int64)
+
     base_trip_time = station_timings[-1]["cumulative_time"]  # 46 minutes to Pettah
     turnaround_time = 8  # minutes at terminal stations
     depot_to_station_time = 5  # minutes from depot to Aluva station
     
     # Service hours: 7:30 AM to 10:00 PM
-    service_start = datetime.strptime("07:30", "%H:%M")
-    service_end = datetime.strptime("22:00", "%H:%M")
-    
-    for train in scheduled_trains:
-        train_id = train.get("train_id")
-        departure_slot = train.get("departure_slot", 1)
-        
-        # Staggered start times based on slot
-        first_departure = service_start + timedelta(minutes=(departure_slot - 1) * 10)
-        
-        train_config = next((t for t in train_configs.get("trains", []) if t["id"] == train_id), None)
-        if not train_config:
-            continue
-        
-        station_events = []
-        rotation_count = 0
-        current_departure = first_departure
-        
-        # Generate rotations throughout the day
-        while current_departure <= service_end and rotation_count < 8:  # Max 8 rotations per train
-            rotation_count += 1
-            
-            # Forward journey (Aluva to Pettah)
-            for i, station in enumerate(station_timings):
-                trip_hour = current_departure.hour
-                station_name = station["station"]
-                
-                # Calculate delays for this station
-                delays = calculate_trip_delays(train_config, weather_data, trip_hour, station_name)
-                
-                # Scheduled arrival (without delays)
-                scheduled_arrival = current_departure + timedelta(minutes=station["cumulative_time"])
-                
-                # Progressive delay accumulation
-                if i == 0:  # First station - minimal delay
-                    current_delay = delays["total_delay"] * 0.1
-                else:
-                    # Delay increases progressively through the journey
-                    progress_ratio = station["cumulative_time"] / base_trip_time
-                    current_delay = delays["total_delay"] * progress_ratio
-                
-                expected_arrival = scheduled_arrival + timedelta(minutes=current_delay)
-                
-                station_events.append({
-                    "station": station_name,
-                    "scheduled_arrival": scheduled_arrival.strftime("%H:%M"),
-                    "expected_arrival": expected_arrival.strftime("%H:%M"),
-                    "delay_minutes": round(current_delay, 1),
-                    "delay_reasons": delays["delay_reasons"] if current_delay > 0.5 else [],
-                    "direction": "forward",
-                    "rotation": rotation_count,
-                    "sequence": len(station_events),
-                    "next_station_duration": station["next_station_duration"],
-                    "cumulative_time": station["cumulative_time"],
-                    "significant_delay": delays["significant_delay"] and current_delay > 1.0
-                })
-            
-            # Arrival at Pettah - turnaround time
-            pettah_arrival = current_departure + timedelta(minutes=base_trip_time + delays["total_delay"])
-            return_departure = pettah_arrival + timedelta(minutes=turnaround_time)
-            
-            # Return journey (Pettah to Aluva)
-            for i, station in enumerate(reversed(station_timings)):
-                trip_hour = return_departure.hour
-                station_name = station["station"]
-                return_time_from_pettah = base_trip_time - station["cumulative_time"]
-                
-                delays_return = calculate_trip_delays(train_config, weather_data, trip_hour, station_name)
-                
-                scheduled_return_arrival = return_departure + timedelta(minutes=return_time_from_pettah)
-                
-                # Progressive delay for return journey
-                progress_ratio = return_time_from_pettah / base_trip_time
-                current_delay_return = delays_return["total_delay"] * progress_ratio
-                
-                expected_return_arrival = scheduled_return_arrival + timedelta(minutes=current_delay_return)
-                
-                station_events.append({
-                    "station": station_name,
-                    "scheduled_arrival": scheduled_return_arrival.strftime("%H:%M"),
-                    "expected_arrival": expected_return_arrival.strftime("%H:%M"),
-                    "delay_minutes": round(current_delay_return, 1),
-                    "delay_reasons": delays_return["delay_reasons"] if current_delay_return > 0.5 else [],
-                    "direction": "return",
-                    "rotation": rotation_count,
-                    "sequence": len(station_events),
-                    "next_station_duration": station["next_station_duration"],
-                    "cumulative_time": station["cumulative_time"],
-                    "significant_delay": delays_return["significant_delay"] and current_delay_return > 1.0
-                })
-            
-            # Next rotation departure from Aluva
-            aluva_arrival = return_departure + timedelta(minutes=base_trip_time + delays_return["total_delay"])
-            current_departure = aluva_arrival + timedelta(minutes=turnaround_time)
-        
+    service_start = parse_hhmm("07:30")
+    service_end = parse_hhmm("22:00")
+
+    # Start at the slot's timetable departure; older results only carry the slot number
+    first_departures = np.array([
+        parse_hhmm(train["departure_time"]) if train.get("departure_time")
+        else service_start + (train.get("departure_slot", 1) - 1) * 10 * TICKS_PER_MINUTE
+        for train in trains
+    ], dtype=np.int64)
+
+    cumulative = np.array([s["cumulative_time"] for s in station_timings])
+    # Delay grows through the journey; the first forward station sees a tenth of it
+    forward_ratio = cumulative / base_trip_time
+    forward_ratio[0] = 0.1
+    return_ratio = (base_trip_time - cumulative[::-1]) / base_trip_time
+
+    def leg_delays(direction, in_service, leg_start, scheduled, stations):
+        rows = table_rows[in_service][:, None]
+        hours = hour_of(leg_start)[:, None]
+        total = delay_table.total[rows, hours, stations[None, :]]
+        ratio = forward_ratio if direction == "forward" else return_ratio
+        delay = total * ratio[None, :]
+        # The terminal arrival runs late by the delay at the leg's last station
+        return delay, total[:, -1], {
+            "total": total,
+            "reason_ids": delay_table.reason_ids[rows, hours, stations[None, :]]
+        }
+
+    timeline = simulate_rotations(first_departures, cumulative, service_end, leg_delays, turnaround_time, max_rotations=8)
+
+    station_names = [s["station"] for s in station_timings]
+    next_durations = [s["next_station_duration"] for s in station_timings]
+    station_count = len(station_timings)
+
+    def build_events(leg):
+        stations = leg["stations"].tolist()
+        first_sequence = ((leg["rotation"] - 1) * 2 + (leg["direction"] == "return")) * station_count
+        events = []
+        for scheduled, expected, delays, totals, reason_ids in zip(
+            format_hhmm(leg["scheduled"]), format_hhmm(leg["expected"]),
+            leg["delay"].tolist(), leg["total"].tolist(), leg["reason_ids"].tolist()
+        ):
+            events.append([
+                {
+                    "station": station_names[j],
+                    "scheduled_arrival": scheduled[i],
+                    "expected_arrival": expected[i],
+                    "delay_minutes": round(delays[i], 1),
+                    "delay_reasons": list(reasons[reason_ids[i]]) if delays[i] > 0.5 else [],
+                    "direction": leg["direction"],
+                    "rotation": leg["rotation"],
+                    "sequence": first_sequence + i,
+                    "next_station_duration": next_durations[j],
+                    "cumulative_time": station_timings[j]["cumulative_time"],
+                    "significant_delay": totals[i] > 2.0 and delays[i] > 1.0
+                }
+                for i, j in enumerate(stations)
+            ])
+        return events
+
+    station_events = events_by_train(timeline, len(trains), build_events)
+    first_departure_times = format_hhmm(first_departures)
+    last_arrival_times = format_hhmm(timeline["next_departure"])
+    rotations = timeline["rotations"].tolist()
+
+    train_schedules = []
+    summary_stats = DelayStats(DEFAULT_PERCENTILES)
+    for k, train in enumerate(trains):
+        train_config = fleet.get(train_ids[k])
+        add_events(station_events[k], summary_stats)
         train_schedules.append({
-            "train_id": train_id,
-            "departure_slot": departure_slot,
+            "train_id": train_ids[k],
+            "departure_slot": train.get("departure_slot", 1),
             "readiness": train.get("readiness", 0),
-            "total_rotations": rotation_count,
-            "station_events": station_events,
-            "first_departure": first_departure.strftime("%H:%M"),
-            "last_arrival": current_departure.strftime("%H:%M"),
+            "total_rotations": rotations[k],
+            "station_events": station_events[k],
+            "first_departure": first_departure_times[k],
+            "last_arrival": last_arrival_times[k],
             "train_config": {
                 "job_cards_count": len(train_config.get("job_cards", [])),
                 "high_critical_jobs": len([j for j in train_config.get("job_cards", []) if j.get("criticality") == "high"]),
@@ -369,26 +464,19 @@ def generate_continuous_rotation(
         "train_schedules": train_schedules,
         "stations": [s["station"] for s in station_timings],
         "station_timings": station_timings,
-        "summary": generate_summary_statistics(train_schedules)
+        "summary": summary_stats.summary()
     }
 
 def generate_summary_statistics(train_schedules):
     """Generate summary statistics for the rotation"""
-    all_events = [event for train in train_schedules for event in train["station_events"]]
-    delayed_events = [e for e in all_events if e["delay_minutes"] > 1.0]
-    significant_delays = [e for e in all_events if e["significant_delay"]]
-    
-    return {
-        "total_events": len(all_events),
-        "delayed_events": len(delayed_events),
-        "significant_delays": len(significant_delays),
-        "max_delay": max([e["delay_minutes"] for e in all_events]) if all_events else 0,
-        "avg_delay": round(sum(e["delay_minutes"] for e in all_events) / len(all_events), 1) if all_events else 0
-    }
+    stats = DelayStats(DEFAULT_PERCENTILES)
+    for train in train_schedules:
+        add_events(train["station_events"], stats)
+    return stats.summary()
 
 # Update the main function to use continuous rotation
-def generate_rotation_schedule(scheduled_trains, train_configs, station_timings, weather_data, service_date):
-    return generate_continuous_rotation(scheduled_trains, train_configs, station_timings, weather_data, service_date)
+def generate_rotation_schedule(scheduled_trains, train_configs, station_timings, weather_data, service_date, fleet=None):
+    return generate_continuous_rotation(scheduled_trains, train_configs, station_timings, weather_data, service_date, fleet)
 
 # Update weather function call in main.py endpoint
 def get_weather_forecast(date_str: str):
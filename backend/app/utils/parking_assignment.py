@@ -0,0 +1,151 @@
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from ortools.graph.python import min_cost_flow
+from app.utils.depot_graph import DepotGraph
+
+# Cost weights (integer units for the min-cost-flow solver)
+MOVE_COST = 100                 # per shunting move from the current bay
+EXIT_COST = {"service": 50, "standby": 10, "ibl": 0}  # per move between track and nearest exit
+BACK_POSITION_COST = {"service": 500, "standby": 0, "ibl": 0}  # per slot behind the front
+UNPARKED_COST = {"service": 1_000_000, "standby": 500_000, "ibl": 750_000}
+
+ROLE_ORDER = {"service": 0, "standby": 1, "ibl": 2}
+
+
+class ParkingAssignmentEngine:
+    """Min-cost assignment of trains to (track, position) slots.
+
+    Each track contributes one slot per unit of its capacity. Costs combine
+    shunting moves from the train's current bay, the track's distance to the
+    nearest exit and a penalty for service trains in back positions. The
+    problem is solved as a min-cost flow (source -> train -> slot -> sink)
+    with an overflow arc per train, so trains that do not fit are reported
+    instead of dropped. Closed tracks get no slots, and a train only gets arcs
+    to tracks reachable from its current bay that can still reach an exit.
+
+    Within a track, service trains are then ordered ahead of standby trains
+    (highest readiness first). Every slot on a track has the same move cost,
+    so this never changes the total and no service train is left blocked
+    behind a standby train.
+    """
+
+    def __init__(self, depot_graph: DepotGraph, exit_points: List[str]):
+        self.depot_graph = depot_graph
+        self.exit_points = exit_points
+
+    def assign(
+        self,
+        trains: List[Dict[str, Any]],
+        tracks: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], int, List[str]]:
+        """Assign trains to track slots.
+
+        trains: [{"train_id", "current_bay", "role", "readiness"}]
+        tracks: [{"id", "capacity"}]
+        Returns (assignments, total_moves, unparked_train_ids).
+        """
+        if not trains:
+            return [], 0, []
+
+        # Closed tracks take no trains
+        tracks = [track for track in tracks if track["id"] not in self.depot_graph.closed_nodes]
+        track_ids = [track["id"] for track in tracks]
+        exit_distance = self.depot_graph.distance_to_nearest(track_ids, self.exit_points)
+        slots = [
+            (track["id"], position)
+            for track in tracks
+            for position in range(1, int(track.get("capacity", 2)) + 1)
+        ]
+
+        # Moves from every train's current bay to every track in one table read
+        moves = np.zeros((len(trains), len(track_ids)))
+        for i, train in enumerate(trains):
+            if not self.depot_graph.has_bay(train["current_bay"]):
+                # Unknown start bays cannot be routed; treat them as already in place
+                continue
+            for j, track_id in enumerate(track_ids):
+                moves[i, j] = self.depot_graph.distance(train["current_bay"], track_id)
+        track_col = {track_id: j for j, track_id in enumerate(track_ids)}
+        track_exit = np.array([exit_distance[t] for t in track_ids], dtype=float)
+        # A train can only go to a track it can reach and that can reach an exit;
+        # the rest fall through to the overflow arc and are reported as unparked
+        reachable = np.isfinite(moves) & np.isfinite(track_exit)[None, :]
+        moves[~reachable] = 0
+        track_exit[~np.isfinite(track_exit)] = 0
+
+        # Slot cost matrix: trains x slots
+        slot_track = np.array([track_col[track_id] for track_id, _ in slots], dtype=np.int64)
+        slot_back = np.array([position - 1 for _, position in slots])
+        roles = [train["role"] for train in trains]
+        exit_weight = np.array([EXIT_COST[role] for role in roles])[:, None]
+        back_weight = np.array([BACK_POSITION_COST[role] for role in roles])[:, None]
+        cost = (
+            MOVE_COST * moves[:, slot_track]
+            + exit_weight * track_exit[slot_track][None, :]
+            + back_weight * slot_back[None, :]
+        ).astype(np.int64)
+        arc_trains, arc_slots = np.nonzero(reachable[:, slot_track])
+
+        # Node layout: 0 source, 1..n trains, n+1..n+m slots, overflow, sink
+        n, m = len(trains), len(slots)
+        source, overflow, sink = 0, n + m + 1, n + m + 2
+        train_nodes = 1 + np.arange(n)
+        slot_nodes = 1 + n + np.arange(m)
+        tails = np.concatenate([
+            np.full(n, source), train_nodes, train_nodes[arc_trains], slot_nodes, [overflow]
+        ]).astype(np.int64)
+        heads = np.concatenate([
+            train_nodes, np.full(n, overflow), slot_nodes[arc_slots], np.full(m, sink), [sink]
+        ]).astype(np.int64)
+        capacities = np.concatenate([np.ones(n + n + len(arc_trains) + m, dtype=np.int64), [n]])
+        costs = np.concatenate([
+            np.zeros(n, dtype=np.int64),
+            np.array([UNPARKED_COST[role] for role in roles], dtype=np.int64),
+            cost[arc_trains, arc_slots],
+            np.zeros(m + 1, dtype=np.int64)
+        ])
+
+        solver = min_cost_flow.SimpleMinCostFlow()
+        arcs = solver.add_arcs_with_capacity_and_unit_cost(tails, heads, capacities, costs)
+        supplies = np.zeros(n + m + 3, dtype=np.int64)
+        supplies[source] = n
+        supplies[sink] = -n
+        solver.set_nodes_supplies(np.arange(n + m + 3), supplies)
+        if solver.solve() != solver.OPTIMAL:
+            raise RuntimeError("Parking assignment min-cost flow failed")
+
+        flows = solver.flows(arcs)
+        by_track: Dict[str, List[int]] = {track_id: [] for track_id in track_ids}
+        unparked = []
+        for a in np.flatnonzero(flows):
+            tail, head = tails[a], heads[a]
+            if 1 <= tail <= n:
+                if head == overflow:
+                    unparked.append(trains[tail - 1]["train_id"])
+                else:
+                    by_track[slots[head - 1 - n][0]].append(tail - 1)
+
+        assignments = []
+        total_moves = 0
+        # Tracks nearest the exits first, matching the previous output order
+        for track_id in sorted(track_ids, key=lambda t: exit_distance[t]):
+            occupants = sorted(
+                by_track[track_id],
+                key=lambda i: (ROLE_ORDER[trains[i]["role"]], -trains[i].get("readiness", 0))
+            )
+            for position, i in enumerate(occupants, 1):
+                train = trains[i]
+                if track_id in self.depot_graph.closed_nodes or not reachable[i, track_col[track_id]]:
+                    raise RuntimeError(f"Parking assignment put {train['train_id']} on closed or unreachable track {track_id}")
+                distance, path = self.depot_graph.shortest_path(train["current_bay"], track_id)
+                moves_required = distance if distance != float('inf') else 0
+                total_moves += moves_required
+                assignments.append({
+                    "train_id": train["train_id"],
+                    "track_id": track_id,
+                    "position_in_track": position,
+                    "moves_required": moves_required,
+                    "shunting_path": path
+                })
+
+        return assignments, total_moves, unparked
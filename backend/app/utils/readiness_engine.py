@@ -0,0 +1,358 @@
+from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from datetime import datetime, date
+import numpy as np
+from app.models import FitnessCertificateStatus, JobCardCriticality
+
+MILEAGE_COMPONENTS = ["bogie", "brake_pad", "hvac"]
+
+# Order matters: the final score is accumulated in this order
+READINESS_WEIGHTS = {
+    "fitness_certificates": 0.3,
+    "job_cards": 0.3,
+    "branding_contracts": 0.1,
+    "mileage_balancing": 0.2,
+    "cleaning_status": 0.1
+}
+
+# Column order of the job card criticality count matrix
+CRITICALITY_LEVELS = [
+    JobCardCriticality.CRITICAL.value,
+    JobCardCriticality.HIGH.value,
+    JobCardCriticality.MEDIUM.value,
+    JobCardCriticality.LOW.value,
+]
+CRITICALITY_FACTORS = np.array([0.0, 0.5, 0.75, 0.9])
+
+# Days since last deep cleaning at which a train is due for cleaning
+CLEANING_DUE_DAYS = 7
+
+
+@dataclass
+class TrainReadiness:
+    """Readiness facts for one train, computed once per optimizer run"""
+    train_id: str
+    score: float
+    breakdown: Dict[str, float]
+    expired_certificates: List[str] = field(default_factory=list)  # departments
+    critical_jobs: List[str] = field(default_factory=list)         # job descriptions
+    overdue_components: List[str] = field(default_factory=list)    # mileage components
+    urgent_brands: List[str] = field(default_factory=list)         # > 4h/day exposure needed
+    branding_urgency: int = 0
+    last_deep_cleaning: date = None
+    days_since_cleaning: int = 0
+
+    @property
+    def has_expired_cert(self) -> bool:
+        return bool(self.expired_certificates)
+
+    @property
+    def has_critical_job(self) -> bool:
+        return bool(self.critical_jobs)
+
+    @property
+    def is_overdue(self) -> bool:
+        return bool(self.overdue_components)
+
+    @property
+    def must_go_to_ibl(self) -> bool:
+        """Hard constraint: expired certificate, critical job card or overdue component"""
+        return self.has_expired_cert or self.has_critical_job or self.is_overdue
+
+    @property
+    def needs_cleaning(self) -> bool:
+        return self.days_since_cleaning >= CLEANING_DUE_DAYS
+
+
+class ReadinessEngine:
+    """Columnar readiness scoring for the whole fleet.
+
+    The fleet is loaded into NumPy arrays once and every component score is
+    computed for all trains in a single batched pass. Human-readable detail
+    strings are only built when a train's details are requested.
+    """
+
+    def __init__(self, trains: List[Dict[str, Any]], now: datetime = None):
+        self.trains = trains
+        self.now = now or datetime.now()
+        self.train_ids = [train["id"] for train in trains]
+        self.index = {train_id: i for i, train_id in enumerate(self.train_ids)}
+        self._date_cache: Dict[str, int] = {}
+        self._details_cache: Dict[str, Dict[str, Any]] = {}
+
+        self._load_columns()
+        self._compute_scores()
+
+        # Plain Python views used by the CP-SAT model and the API responses
+        self.scores = dict(zip(self.train_ids, self.final_score.tolist()))
+        self.records = self._build_records()
+
+    def _ordinal(self, value: str) -> int:
+        """Parse a YYYY-MM-DD string to a day ordinal, memoized across the fleet"""
+        ordinal = self._date_cache.get(value)
+        if ordinal is None:
+            ordinal = datetime.strptime(value, "%Y-%m-%d").toordinal()
+            self._date_cache[value] = ordinal
+        return ordinal
+
+    def _load_columns(self):
+        """Flatten the fleet into arrays"""
+        n = len(self.trains)
+        today = self.now.toordinal()
+        # (deadline_midnight - now).days is one less than the ordinal gap once the day has started
+        day_started = 1 if self.now.time() != datetime.min.time() else 0
+
+        self.expired_cert = np.zeros(n, dtype=bool)
+        self.expired_departments: List[List[str]] = []
+        self.critical_descriptions: List[List[str]] = []
+        self.job_counts = np.zeros((n, len(CRITICALITY_LEVELS)), dtype=np.int64)
+        self.mileage = np.zeros((n, len(MILEAGE_COMPONENTS)))
+        self.thresholds = np.ones((n, len(MILEAGE_COMPONENTS)))
+        self.last_cleaning = np.zeros(n, dtype=np.int64)
+
+        criticality_column = {level: col for col, level in enumerate(CRITICALITY_LEVELS)}
+        contract_owner = []
+        contract_remaining = []
+        contract_deadline = []
+
+        for i, train in enumerate(self.trains):
+            expired = [
+                dept for dept, cert in train["fitness_certificates"].items()
+                if cert["status"] == FitnessCertificateStatus.EXPIRED.value
+            ]
+            self.expired_departments.append(expired)
+            self.expired_cert[i] = bool(expired)
+            critical = []
+            for job in train["job_cards"]:
+                col = criticality_column.get(job["criticality"])
+                if col is not None:
+                    self.job_counts[i, col] += 1
+                if col == 0:
+                    critical.append(job["description"])
+            self.critical_descriptions.append(critical)
+            for contract in train["branding_contracts"]:
+                contract_owner.append(i)
+                contract_remaining.append(contract["total_exposure_hours"] - contract["completed_hours"])
+                contract_deadline.append(self._ordinal(contract["deadline"]))
+            mileage = train["current_mileage"]
+            thresholds = train["maintenance_thresholds"]
+            for c, component in enumerate(MILEAGE_COMPONENTS):
+                self.mileage[i, c] = mileage[component]
+                self.thresholds[i, c] = thresholds[component]
+            self.last_cleaning[i] = self._ordinal(train["last_deep_cleaning"])
+
+        self.contract_owner = np.array(contract_owner, dtype=np.int64)
+        self.contract_remaining = np.array(contract_remaining, dtype=float)
+        self.contract_days_remaining = np.array(contract_deadline, dtype=np.int64) - today - day_started
+        self.days_since_cleaning = today - self.last_cleaning
+
+    def _compute_scores(self):
+        """Compute all five component scores and the weighted final score"""
+        n = len(self.trains)
+
+        # 1. Fitness certificates
+        self.fitness_score = np.where(self.expired_cert, 0.0, 100.0)
+
+        # 2. Job cards: any critical job zeroes the score, others multiply in
+        self.critical_job = self.job_counts[:, 0] > 0
+        self.job_score = 100.0 * np.prod(CRITICALITY_FACTORS[1:] ** self.job_counts[:, 1:], axis=1)
+        self.job_score[self.critical_job] = 0.0
+
+        # 3. Branding contracts
+        days = self.contract_days_remaining
+        active = days > 0
+        self.contract_hours_per_day = np.divide(
+            self.contract_remaining, days, out=np.zeros(len(days)), where=active
+        )
+        very_urgent = active & (self.contract_hours_per_day > 8)
+        urgent = active & ~very_urgent & (self.contract_hours_per_day > 4)
+        passed = ~active
+        owner = self.contract_owner
+        very_urgent_count = np.bincount(owner[very_urgent], minlength=n)
+        urgent_count = np.bincount(owner[urgent], minlength=n)
+        passed_count = np.bincount(owner[passed], minlength=n)
+        self.branding_score = 100.0 * 1.5 ** very_urgent_count * 1.2 ** urgent_count * 0.5 ** passed_count
+        self.branding_urgency = 2 * very_urgent_count + urgent_count
+
+        # 4. Mileage balancing
+        self.mileage_remaining = self.thresholds - self.mileage
+        factors = np.select(
+            [self.mileage_remaining <= 0, self.mileage_remaining < 1000,
+             self.mileage_remaining < 2000, self.mileage_remaining < 3000],
+            [0.0, 0.5, 0.7, 0.9],
+            default=1.0,
+        )
+        self.overdue_component = self.mileage >= self.thresholds
+        self.mileage_score = 100.0 * np.prod(factors, axis=1)
+
+        # 5. Cleaning status
+        self.cleaning_score = np.select(
+            [self.days_since_cleaning > 7, self.days_since_cleaning > 5],
+            [50.0, 75.0],
+            default=100.0,
+        )
+
+        components = self.component_scores()
+        final_score = np.zeros(n)
+        for component, weight in READINESS_WEIGHTS.items():
+            final_score = final_score + components[component] * weight
+
+        # Apply branding urgency boost and keep the score within 0-100
+        final_score = np.minimum(100, final_score * (1 + self.branding_urgency * 0.1))
+        self.final_score = np.clip(final_score, 0, 100)
+
+    def _build_records(self) -> Dict[str, TrainReadiness]:
+        """One TrainReadiness per train from the computed columns"""
+        breakdowns = [
+            dict(zip(READINESS_WEIGHTS, row))
+            for row in np.column_stack(list(self.component_scores().values())).tolist()
+        ]
+        urgent_contracts = (self.contract_days_remaining > 0) & (self.contract_hours_per_day > 4)
+        urgent_brands = [[] for _ in self.trains]
+        contract_brands = [
+            contract["brand"] for train in self.trains for contract in train["branding_contracts"]
+        ]
+        for k in np.flatnonzero(urgent_contracts):
+            urgent_brands[self.contract_owner[k]].append(contract_brands[k])
+
+        records = {}
+        for i, train_id in enumerate(self.train_ids):
+            records[train_id] = TrainReadiness(
+                train_id=train_id,
+                score=self.scores[train_id],
+                breakdown=breakdowns[i],
+                expired_certificates=self.expired_departments[i],
+                critical_jobs=self.critical_descriptions[i],
+                overdue_components=[
+                    component for c, component in enumerate(MILEAGE_COMPONENTS)
+                    if self.overdue_component[i, c]
+                ],
+                urgent_brands=urgent_brands[i],
+                branding_urgency=int(self.branding_urgency[i]),
+                last_deep_cleaning=date.fromordinal(int(self.last_cleaning[i])),
+                days_since_cleaning=int(self.days_since_cleaning[i]),
+            )
+        return records
+
+    def component_scores(self) -> Dict[str, np.ndarray]:
+        """Per-component score columns keyed like READINESS_WEIGHTS"""
+        return {
+            "fitness_certificates": self.fitness_score,
+            "job_cards": self.job_score,
+            "branding_contracts": self.branding_score,
+            "mileage_balancing": self.mileage_score,
+            "cleaning_status": self.cleaning_score,
+        }
+
+    def score(self, train_id: str) -> float:
+        """Final readiness score (0-100) for a train"""
+        return self.scores[train_id]
+
+    def breakdown(self, train_id: str) -> Dict[str, float]:
+        """Readiness score by factor for a train"""
+        return self.records[train_id].breakdown
+
+    def record(self, train_id: str) -> TrainReadiness:
+        return self.records[train_id]
+
+    def details(self, train_id: str) -> Dict[str, Any]:
+        """Human-readable breakdown for a train, built on first request"""
+        details = self._details_cache.get(train_id)
+        if details is None:
+            details = self._build_details(self.index[train_id])
+            self._details_cache[train_id] = details
+        return details
+
+    def _build_details(self, i: int) -> Dict[str, Any]:
+        train = self.trains[i]
+        details = {}
+
+        # 1. Fitness certificates
+        expired_certs = self.expired_departments[i]
+        if expired_certs:
+            details["fitness_certificates"] = f"❌ Expired certificates: {', '.join(expired_certs)}"
+        else:
+            details["fitness_certificates"] = "✅ All fitness certificates valid"
+
+        # 2. Job card criticality
+        jobs_by_level = {level: [] for level in CRITICALITY_LEVELS}
+        for job in train["job_cards"]:
+            if job["criticality"] in jobs_by_level:
+                jobs_by_level[job["criticality"]].append(f"{job['description']} ({job['estimated_hours']}h)")
+
+        job_details = []
+        labels = ["❌ Critical", "⚠️ High", "🔶 Medium", "🔷 Low"]
+        for label, level in zip(labels, CRITICALITY_LEVELS):
+            if jobs_by_level[level]:
+                job_details.append(f"{label}: {', '.join(jobs_by_level[level])}")
+        if not job_details:
+            job_details.append("✅ No open job cards")
+        details["job_cards"] = " | ".join(job_details)
+
+        # 3. Branding priorities
+        branding_details = []
+        contract_idx = np.flatnonzero(self.contract_owner == i)
+        for contract, k in zip(train["branding_contracts"], contract_idx):
+            if self.contract_days_remaining[k] > 0:
+                hours_per_day = self.contract_hours_per_day[k]
+                if hours_per_day > 8:
+                    branding_details.append(f"🚨 {contract['brand']}: {hours_per_day:.1f}h/day needed")
+                elif hours_per_day > 4:
+                    branding_details.append(f"⚠️ {contract['brand']}: {hours_per_day:.1f}h/day needed")
+                else:
+                    branding_details.append(f"✅ {contract['brand']}: {hours_per_day:.1f}h/day needed")
+            else:
+                branding_details.append(f"❌ {contract['brand']}: Deadline passed")
+        if not branding_details:
+            branding_details.append("✅ No branding contracts")
+        details["branding_contracts"] = " | ".join(branding_details)
+
+        # 4. Mileage balancing
+        mileage_details = []
+        mileage = train["current_mileage"]
+        thresholds = train["maintenance_thresholds"]
+        for c, component in enumerate(MILEAGE_COMPONENTS):
+            remaining = self.mileage_remaining[i, c]
+            reading = f"({mileage[component]}/{thresholds[component]} km)"
+            if remaining <= 0:
+                mileage_details.append(f"❌ {component}: Overdue {reading}")
+            elif remaining < 1000:
+                mileage_details.append(f"🚨 {component}: Critical {reading}")
+            elif remaining < 2000:
+                mileage_details.append(f"⚠️ {component}: Warning {reading}")
+            elif remaining < 3000:
+                mileage_details.append(f"🔶 {component}: Notice {reading}")
+            else:
+                mileage_details.append(f"✅ {component}: Good {reading}")
+        details["mileage_balancing"] = " | ".join(mileage_details)
+
+        # 5. Cleaning status
+        days_since_cleaning = int(self.days_since_cleaning[i])
+        if days_since_cleaning > 7:
+            details["cleaning_status"] = f"🚨 Cleaning overdue ({days_since_cleaning} days since last cleaning)"
+        elif days_since_cleaning > 5:
+            details["cleaning_status"] = f"⚠️ Cleaning due soon ({days_since_cleaning} days since last cleaning)"
+        else:
+            details["cleaning_status"] = f"✅ Cleaning not needed yet ({days_since_cleaning} days since last cleaning)"
+
+        # Summary of the hard issues and overall condition
+        final_score = self.final_score[i]
+        summary_parts = []
+        if self.fitness_score[i] == 0:
+            summary_parts.append("❌ Expired certificates")
+        if self.job_score[i] == 0:
+            summary_parts.append("❌ Critical job cards")
+        if self.mileage_score[i] == 0:
+            summary_parts.append("❌ Overdue maintenance")
+        if self.branding_urgency[i] > 0:
+            summary_parts.append(f"🚀 Branding urgency: {self.branding_urgency[i]}")
+        if final_score > 80:
+            summary_parts.append("✅ Excellent condition")
+        elif final_score > 60:
+            summary_parts.append("🟡 Good condition")
+        else:
+            summary_parts.append("🔶 Needs attention")
+
+        details["combined"] = " | ".join(details.values())
+        details["summary"] = " | ".join(summary_parts)
+        return details
@@ -0,0 +1,147 @@
+from typing import List, Tuple, Optional
+import heapq
+import numpy as np
+from ortools.graph.python import min_cost_flow
+
+# Bonus that makes a min-cost-flow node keep a train selected
+FORCE_BONUS = 10**9
+
+
+class BaySlotAssignmentEngine:
+    """Exact departure-slot assignment for bays holding at most two trains.
+
+    values[t, s] is the objective gain of train t departing in slot s (its
+    selection, position and slot terms together); every slot is filled by
+    exactly one train. The only coupling is between the front and back train
+    of a bay: when both depart and the back one leaves first, the front one
+    needs shunting and the penalty is paid once.
+
+    Each relaxation drops that coupling and is a min-cost assignment of
+    trains to slots, solved as a min-cost flow. A plan where a back train
+    leaves first is split best-first into three orderings of that bay: back
+    first and penalised (both trains kept), back train after its current
+    slot, or front train before it. Every branch only tightens the
+    assignment, so the first relaxation whose bound cannot beat the
+    incumbent ends the search with the optimum.
+    """
+
+    def __init__(self, shunting_penalty: int):
+        self.shunting_penalty = int(shunting_penalty)
+        self.nodes_explored = 0
+
+    def _assign(
+        self,
+        values: np.ndarray,
+        forbidden: np.ndarray,
+        forced: Tuple[int, ...]
+    ) -> Optional[np.ndarray]:
+        """Best slot per train (-1 if not selected) under forbidden cells and
+        trains that must be selected; None if no full assignment exists"""
+        n, k = values.shape
+        bonus = np.zeros(n, dtype=np.int64)
+        bonus[list(forced)] = FORCE_BONUS
+        gain = values + bonus[:, None]
+        offset = int(gain.max()) + 1
+        rows, cols = np.nonzero(~forbidden)
+
+        # Node layout: 0 source, 1..n trains, n+1..n+k slots, sink
+        source, sink = 0, n + k + 1
+        tails = np.concatenate([np.full(n, source), 1 + rows, 1 + n + np.arange(k)])
+        heads = np.concatenate([1 + np.arange(n), 1 + n + cols, np.full(k, sink)])
+        capacities = np.ones(len(tails), dtype=np.int64)
+        costs = np.concatenate([
+            np.zeros(n, dtype=np.int64),
+            (offset - gain[rows, cols]).astype(np.int64),
+            np.zeros(k, dtype=np.int64)
+        ])
+
+        solver = min_cost_flow.SimpleMinCostFlow()
+        arcs = solver.add_arcs_with_capacity_and_unit_cost(tails, heads, capacities, costs)
+        supplies = np.zeros(n + k + 2, dtype=np.int64)
+        supplies[source] = k
+        supplies[sink] = -k
+        solver.set_nodes_supplies(np.arange(n + k + 2), supplies)
+        if solver.solve() != solver.OPTIMAL:
+            return None
+
+        flows = solver.flows(arcs)[n:n + len(rows)]
+        slot_of = np.full(n, -1, dtype=np.int64)
+        used = np.flatnonzero(flows)
+        slot_of[rows[used]] = cols[used]
+        if any(slot_of[t] < 0 for t in forced):
+            return None
+        return slot_of
+
+    def _shunted(self, slot_of: np.ndarray, pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """(front, back) pairs where both depart and the back train leaves first"""
+        return [
+            (front, back) for front, back in pairs
+            if slot_of[front] >= 0 and slot_of[back] >= 0 and slot_of[back] < slot_of[front]
+        ]
+
+    def solve(
+        self,
+        values: np.ndarray,
+        pairs: List[Tuple[int, int]]
+    ) -> Tuple[np.ndarray, List[int], int]:
+        """Optimal plan for a trains x slots value matrix.
+
+        pairs: (front, back) train indices sharing a bay.
+        Returns (slot index per train or -1, front trains needing shunting,
+        objective value).
+        """
+        values = np.asarray(values, dtype=np.int64)
+        n = values.shape[0]
+        rows = np.arange(n)
+        self.nodes_explored = 0
+
+        def evaluate(slot_of: np.ndarray, penalised: int) -> int:
+            selected = slot_of >= 0
+            return int(values[rows[selected], slot_of[selected]].sum()) - penalised * self.shunting_penalty
+
+        best_plan, best_value = None, None
+        # Max-heap on the relaxation bound; the counter breaks ties in insertion order
+        heap = []
+        counter = 0
+
+        def push(forbidden, forced, resolved):
+            nonlocal counter
+            slot_of = self._assign(values, forbidden, forced)
+            self.nodes_explored += 1
+            if slot_of is None:
+                return
+            bound = evaluate(slot_of, len(resolved))
+            heapq.heappush(heap, (-bound, counter, slot_of, forbidden, forced, resolved))
+            counter += 1
+
+        push(np.zeros(values.shape, dtype=bool), (), frozenset())
+        while heap:
+            neg_bound, _, slot_of, forbidden, forced, resolved = heapq.heappop(heap)
+            if best_value is not None and -neg_bound <= best_value:
+                break
+
+            shunted = self._shunted(slot_of, pairs)
+            value = evaluate(slot_of, len(shunted))
+            if best_value is None or value > best_value:
+                best_plan, best_value = slot_of, value
+
+            open_pairs = [pair for pair in shunted if pair not in resolved]
+            if not open_pairs:
+                continue
+            front, back = open_pairs[0]
+            back_slot = slot_of[back]
+            # Back train leaves first: pay the penalty, keep both trains
+            push(forbidden, tuple(sorted(set(forced) | {front, back})), resolved | {(front, back)})
+            # Back train leaves after its current slot
+            later = forbidden.copy()
+            later[back, :back_slot + 1] = True
+            push(later, forced, resolved)
+            # Front train leaves before it
+            earlier = forbidden.copy()
+            earlier[front, back_slot:] = True
+            push(earlier, forced, resolved)
+
+        if best_plan is None:
+            raise RuntimeError("Slot assignment has no feasible plan")
+        shunted_fronts = [front for front, _ in self._shunted(best_plan, pairs)]
+        return best_plan, shunted_fronts, best_value
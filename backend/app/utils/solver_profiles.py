@@ -0,0 +1,95 @@
+from typing import Dict, Any, Optional
+import os
+from ortools.sat.python import cp_model
+
+# Time budget = base_time + time_per_1k_vars * (variables / 1000), clamped to
+# [min_time, max_time] and to the caller's own hard limit
+SOLVER_PROFILES: Dict[str, Dict[str, Any]] = {
+    # What-if and dashboard calls: sub-second answers, a small gap is fine
+    "interactive": {
+        "max_workers": 8,
+        "base_time": 0.3,
+        "time_per_1k_vars": 0.1,
+        "min_time": 0.3,
+        "max_time": 0.9,
+        "relative_gap": 0.05,
+        "presolve": True,
+        "linearization_level": 0
+    },
+    # Nightly batch: every core, budget grows with the model
+    "nightly": {
+        "max_workers": None,
+        "base_time": 60.0,
+        "time_per_1k_vars": 120.0,
+        "min_time": 60.0,
+        "max_time": 300.0,
+        "relative_gap": 0.0,
+        "presolve": True,
+        "linearization_level": 1
+    },
+    # Prove optimality where possible; the caller's hard limit still applies
+    "exhaustive": {
+        "max_workers": None,
+        "base_time": 300.0,
+        "time_per_1k_vars": 600.0,
+        "min_time": 300.0,
+        "max_time": 1800.0,
+        "relative_gap": 0.0,
+        "presolve": True,
+        "linearization_level": 2
+    }
+}
+
+DEFAULT_SOLVER_PROFILE = "nightly"
+
+
+def get_solver_profile(name: Optional[str]) -> Dict[str, Any]:
+    """Look up a profile by name (None selects the default); raises ValueError if unknown"""
+    name = name or DEFAULT_SOLVER_PROFILE
+    if name not in SOLVER_PROFILES:
+        raise ValueError(f"Unknown solver profile '{name}'. Choose one of: {', '.join(SOLVER_PROFILES)}")
+    return {"name": name, **SOLVER_PROFILES[name]}
+
+
+def configure_solver(
+    solver: cp_model.CpSolver,
+    model: cp_model.CpModel,
+    profile_name: Optional[str] = None,
+    time_limit: Optional[float] = None,
+    relative_gap: Optional[float] = None
+) -> Dict[str, Any]:
+    """Apply a profile to a solver, sized to the model; returns the settings used.
+
+    time_limit is the caller's hard cap; an explicit relative_gap overrides
+    the profile's.
+    """
+    profile = get_solver_profile(profile_name)
+    proto = model.Proto()
+    num_variables = len(proto.variables)
+
+    cores = os.cpu_count() or 1
+    workers = min(cores, profile["max_workers"]) if profile["max_workers"] else cores
+
+    budget = profile["base_time"] + profile["time_per_1k_vars"] * num_variables / 1000
+    budget = min(max(budget, profile["min_time"]), profile["max_time"])
+    if time_limit is not None:
+        budget = min(budget, time_limit)
+
+    gap = profile["relative_gap"] if relative_gap is None else relative_gap
+
+    solver.parameters.num_workers = workers
+    solver.parameters.max_time_in_seconds = budget
+    solver.parameters.relative_gap_limit = gap
+    solver.parameters.cp_model_presolve = profile["presolve"]
+    solver.parameters.linearization_level = profile["linearization_level"]
+
+    return {
+        "profile": profile["name"],
+        "num_workers": workers,
+        "max_time_in_seconds": round(budget, 3),
+        "relative_gap_limit": gap,
+        "presolve": profile["presolve"],
+        "linearization_level": profile["linearization_level"],
+        "model_variables": num_variables,
+        "model_constraints": len(proto.constraints)
+    }
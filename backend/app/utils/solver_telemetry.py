@@ -0,0 +1,244 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+from datetime import datetime
+import json
+import logging
+import math
+import re
+import threading
+from ortools.sat.python import cp_model
+
+logger = logging.getLogger(__name__)
+
+MAX_RECORDS = 200          # Solves kept for /stats/solver
+MAX_BOUND_POINTS = 50      # Points kept of each solve's bound progression
+
+_STATUS_NAMES = {
+    cp_model.OPTIMAL: "OPTIMAL",
+    cp_model.FEASIBLE: "FEASIBLE",
+    cp_model.INFEASIBLE: "INFEASIBLE",
+    cp_model.MODEL_INVALID: "MODEL_INVALID",
+    cp_model.UNKNOWN: "UNKNOWN"
+}
+
+_NUMBER = r"[\d']+"
+_VARIABLES_LINE = re.compile(rf"^#Variables: ({_NUMBER})")
+_CONSTRAINT_LINE = re.compile(rf"^#k\w+: ({_NUMBER})")
+_SEARCH_START_LINE = re.compile(r"^Starting search at ([\d.]+)s")
+# "#1  0.01s best:198 next:[199,233] main" and "#Bound 0.02s best:205 next:[206,231] main"
+_PROGRESS_LINE = re.compile(r"^#(\d+|Bound)\s+([\d.]+)s best:(\S+)\s+next:\[([^\]]*)\]")
+
+
+def _count(text: str) -> int:
+    return int(text.replace("'", ""))
+
+def _finite(text: str) -> Optional[float]:
+    """Log value as a float; None for +-inf (no solution / bound yet)"""
+    value = float(text.replace("'", ""))
+    return value if math.isfinite(value) else None
+
+
+class SolveLogParser:
+    """Pulls presolve sizes and bound progression out of the CP-SAT search log.
+
+    Installed as the solver's log_callback (see attach_solve_log); keeps
+    running counters only, never the log itself.
+    """
+
+    def __init__(self, maximize: bool):
+        self.maximize = maximize
+        self.sizes: Dict[str, Dict[str, int]] = {}
+        self.presolve_time: Optional[float] = None
+        self.first_solution_time: Optional[float] = None
+        self.bound_progression: List[Tuple[float, float, float]] = []
+        self._section: Optional[str] = None
+
+    def __call__(self, message: str):
+        # One callback can carry several log lines (e.g. a whole model summary)
+        for line in message.splitlines():
+            self._parse(line.strip())
+
+    def _parse(self, line: str):
+        if line.startswith("Initial optimization model"):
+            self._section = "initial"
+            self.sizes["initial"] = {"variables": 0, "constraints": 0}
+            return
+        if line.startswith("Presolved optimization model") and "presolved" not in self.sizes:
+            self._section = "presolved"
+            self.sizes["presolved"] = {"variables": 0, "constraints": 0}
+            return
+        if self._section is not None:
+            match = _VARIABLES_LINE.match(line)
+            if match:
+                self.sizes[self._section]["variables"] = _count(match.group(1))
+                return
+            match = _CONSTRAINT_LINE.match(line)
+            if match:
+                self.sizes[self._section]["constraints"] += _count(match.group(1))
+                return
+            if not line or not line.startswith(("-", "#")):
+                self._section = None
+
+        match = _SEARCH_START_LINE.match(line)
+        if match:
+            self.presolve_time = float(match.group(1))
+            return
+        match = _PROGRESS_LINE.match(line)
+        if match:
+            kind, at, best, interval = match.groups()
+            at = float(at)
+            if kind != "Bound" and self.first_solution_time is None:
+                self.first_solution_time = at
+            ends = interval.split(",")
+            if len(ends) == 2:
+                bound = _finite(ends[1] if self.maximize else ends[0])
+                self.bound_progression.append((at, _finite(best), bound))
+
+    def summary(self) -> Dict[str, Any]:
+        initial, presolved = self.sizes.get("initial"), self.sizes.get("presolved")
+        reductions = None
+        if initial and presolved:
+            reductions = {
+                "variables": initial["variables"] - presolved["variables"],
+                "constraints": initial["constraints"] - presolved["constraints"]
+            }
+        points = self.bound_progression
+        if len(points) > MAX_BOUND_POINTS:
+            # Evenly thinned, always keeping the last point
+            step = len(points) / MAX_BOUND_POINTS
+            points = [points[int(i * step)] for i in range(MAX_BOUND_POINTS - 1)] + [points[-1]]
+        return {
+            "presolved_model": presolved,
+            "presolve_reductions": reductions,
+            "presolve_time": self.presolve_time,
+            "time_to_first_solution": self.first_solution_time,
+            "bound_progression": [
+                {"wall_time": at, "best": best, "bound": bound} for at, best, bound in points
+            ]
+        }
+
+
+def attach_solve_log(solver: cp_model.CpSolver, model: cp_model.CpModel) -> SolveLogParser:
+    """Route the solver's search log into a SolveLogParser (not to stdout)"""
+    parser = SolveLogParser(model.Proto().objective.scaling_factor < 0)
+    solver.parameters.log_search_progress = True
+    solver.parameters.log_to_stdout = False
+    solver.log_callback = parser
+    return parser
+
+
+def cp_sat_telemetry(
+    layer: str,
+    solver: cp_model.CpSolver,
+    status: int,
+    solver_settings: Dict[str, Any],
+    model_build_time: float,
+    log: Optional[SolveLogParser] = None,
+    solutions: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Telemetry of one finished CP-SAT solve.
+
+    solver_settings is what configure_solver returned; solutions is the
+    AnytimeCallback history, used when the log has no first-solution time.
+    """
+    response = solver.ResponseProto()
+    telemetry = {
+        "layer": layer,
+        "engine": "cp_sat",
+        "recorded_at": datetime.now().isoformat(),
+        "profile": solver_settings.get("profile"),
+        "solver_status": _STATUS_NAMES.get(status, str(status)),
+        "objective_value": response.objective_value,
+        "best_bound": response.best_objective_bound,
+        "model_build_time": round(model_build_time, 4),
+        "model": {
+            "variables": solver_settings.get("model_variables"),
+            "constraints": solver_settings.get("model_constraints")
+        },
+        "num_workers": solver_settings.get("num_workers"),
+        "time_limit": solver_settings.get("max_time_in_seconds"),
+        "wall_time": round(response.wall_time, 4),
+        "user_time": round(response.user_time, 4),
+        "deterministic_time": round(response.deterministic_time, 4),
+        "conflicts": response.num_conflicts,
+        "branches": response.num_branches,
+        "propagations": response.num_binary_propagations,
+        "integer_propagations": response.num_integer_propagations,
+        "restarts": response.num_restarts,
+        "lp_iterations": response.num_lp_iterations,
+        "solutions": len(solutions) if solutions is not None else None
+    }
+    telemetry.update(log.summary() if log is not None else {
+        "presolved_model": None,
+        "presolve_reductions": None,
+        "presolve_time": None,
+        "time_to_first_solution": None,
+        "bound_progression": []
+    })
+    if telemetry["time_to_first_solution"] is None and solutions:
+        telemetry["time_to_first_solution"] = solutions[0]["wall_time"]
+    return telemetry
+
+
+def exact_engine_telemetry(layer: str, plan: Dict[str, Any], variables: int) -> Dict[str, Any]:
+    """Telemetry of one exact assignment solve (see BaySlotAssignmentEngine)"""
+    return {
+        "layer": layer,
+        "engine": "exact_assignment",
+        "recorded_at": datetime.now().isoformat(),
+        "profile": "exact_assignment",
+        "solver_status": "OPTIMAL",
+        "objective_value": plan["objective_value"],
+        "best_bound": plan["objective_value"],
+        "model": {"variables": variables, "constraints": None},
+        "nodes_explored": plan["nodes_explored"],
+        "wall_time": plan["wall_time"],
+        "time_to_first_solution": plan["wall_time"]
+    }
+
+
+class SolverTelemetryLog:
+    """Recent solve telemetry, newest last, shared by both layers"""
+
+    def __init__(self, max_records: int = MAX_RECORDS):
+        self._records: "deque[Dict[str, Any]]" = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self, telemetry: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a solve's telemetry and emit it as one structured log line"""
+        with self._lock:
+            self._records.append(telemetry)
+        logger.info("solver telemetry %s", json.dumps(
+            {key: value for key, value in telemetry.items() if key != "bound_progression"}, default=str
+        ))
+        return telemetry
+
+    def stats(self, layer: str = None, limit: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            records = [r for r in self._records if layer is None or r["layer"] == layer]
+
+        summary = {}
+        for record in records:
+            key = f"{record['layer']}/{record['engine']}"
+            entry = summary.setdefault(key, {"solves": 0, "total_wall_time": 0.0, "max_wall_time": 0.0, "statuses": {}})
+            wall_time = record.get("wall_time") or 0.0
+            entry["solves"] += 1
+            entry["total_wall_time"] += wall_time
+            entry["max_wall_time"] = max(entry["max_wall_time"], wall_time)
+            entry["statuses"][record["solver_status"]] = entry["statuses"].get(record["solver_status"], 0) + 1
+        for entry in summary.values():
+            entry["mean_wall_time"] = round(entry["total_wall_time"] / entry["solves"], 4)
+            entry["total_wall_time"] = round(entry["total_wall_time"], 4)
+
+        return {
+            "recorded_solves": len(records),
+            "summary": summary,
+            "recent": records[-limit:] if limit else []
+        }
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+solver_telemetry = SolverTelemetryLog()
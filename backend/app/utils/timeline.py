@@ -0,0 +1,133 @@
+from typing import Dict, Any, List, Callable, Tuple
+import numpy as np
+
+# Times are integer ticks since midnight at datetime's resolution (one tick
+# per microsecond), so whole-minute HH:MM output matches datetime arithmetic
+TICKS_PER_MINUTE = 60_000_000
+TICKS_PER_HOUR = 60 * TICKS_PER_MINUTE
+MINUTES_PER_DAY = 24 * 60
+
+_HHMM = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(MINUTES_PER_DAY)]
+
+# leg_delays(direction, trains, leg_start, scheduled, stations) ->
+#   (delay minutes per event, extra minutes the leg's terminal arrival runs late, extra arrays)
+LegDelays = Callable[
+    [str, np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+    Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]
+]
+
+
+def parse_hhmm(value: str) -> int:
+    """'HH:MM' as ticks since midnight"""
+    hours, minutes = map(int, value.split(":"))
+    return (hours * 60 + minutes) * TICKS_PER_MINUTE
+
+
+def minutes_to_ticks(minutes) -> np.ndarray:
+    """Minutes (scalar or array, possibly fractional) as integer ticks, rounded
+    to the nearest tick like timedelta(minutes=...)"""
+    return np.rint(np.asarray(minutes, dtype=float) * TICKS_PER_MINUTE).astype(np.int64)
+
+
+def hour_of(ticks: np.ndarray) -> np.ndarray:
+    """Hour of day (0-23) of tick times; times past midnight wrap"""
+    return (np.asarray(ticks) // TICKS_PER_HOUR) % 24
+
+
+def format_hhmm(ticks: np.ndarray) -> List:
+    """Tick times as 'HH:MM' strings (seconds truncated), same shape as nested lists"""
+    minutes = (np.asarray(ticks) // TICKS_PER_MINUTE) % MINUTES_PER_DAY
+    if minutes.ndim == 0:
+        return _HHMM[int(minutes)]
+    if minutes.ndim == 1:
+        return [_HHMM[m] for m in minutes.tolist()]
+    return [[_HHMM[m] for m in row] for row in minutes.tolist()]
+
+
+def simulate_rotations(
+    first_departures: np.ndarray,
+    station_offsets: np.ndarray,
+    service_end: int,
+    leg_delays: LegDelays,
+    turnaround_time: float = 8,
+    max_rotations: int = None
+) -> Dict[str, Any]:
+    """Scheduled and expected station arrivals of every train's rotations.
+
+    Trains shuttle from the first station to the last (forward) and back
+    (return), turning around for turnaround_time minutes at each terminal,
+    and start another rotation while their departure is no later than
+    service_end. Each leg is computed for all trains still in service at
+    once: scheduled arrivals are the leg start broadcast over the cumulative
+    station offsets (minutes), and leg_delays supplies the delay of every
+    event plus how late the leg reaches its terminal.
+
+    Returns the legs in order, each with the train indices it covers and
+    trains x stations arrays of scheduled / expected ticks and delays, plus
+    per-train rotation counts, last terminal arrivals and next departures.
+    """
+    first_departures = np.asarray(first_departures, dtype=np.int64)
+    station_offsets = np.asarray(station_offsets)
+    station_count = len(station_offsets)
+    base_trip_time = station_offsets[-1]
+    turnaround = minutes_to_ticks(turnaround_time)
+
+    forward_stations = np.arange(station_count)
+    return_stations = forward_stations[::-1]
+    leg_plans = (
+        ("forward", forward_stations, minutes_to_ticks(station_offsets)),
+        ("return", return_stations, minutes_to_ticks(base_trip_time - station_offsets[::-1]))
+    )
+
+    departure = first_departures.copy()
+    last_arrival = first_departures.copy()
+    rotations = np.zeros(len(departure), dtype=np.int64)
+    in_service = np.arange(len(departure))
+    legs = []
+    rotation = 0
+    while True:
+        in_service = in_service[departure[in_service] <= service_end]
+        if not len(in_service) or (max_rotations is not None and rotation >= max_rotations):
+            break
+        rotation += 1
+        rotations[in_service] = rotation
+
+        leg_start = departure[in_service]
+        for direction, stations, offsets in leg_plans:
+            scheduled = leg_start[:, None] + offsets[None, :]
+            delay, late_by, extras = leg_delays(direction, in_service, leg_start, scheduled, stations)
+            legs.append({
+                "rotation": rotation,
+                "direction": direction,
+                "trains": in_service,
+                "stations": stations,
+                "scheduled": scheduled,
+                "expected": scheduled + minutes_to_ticks(delay),
+                "delay": delay,
+                **extras
+            })
+            terminal_arrival = leg_start + minutes_to_ticks(base_trip_time + late_by)
+            leg_start = terminal_arrival + turnaround
+
+        last_arrival[in_service] = terminal_arrival
+        departure[in_service] = leg_start
+
+    return {
+        "legs": legs,
+        "rotations": rotations,
+        "last_arrival": last_arrival,
+        "next_departure": departure
+    }
+
+
+def events_by_train(timeline: Dict[str, Any], train_count: int, build_events: Callable[[Dict[str, Any]], List[List[Dict[str, Any]]]]) -> List[List[Dict[str, Any]]]:
+    """Serialize a timeline into per-train event lists in rotation order.
+
+    build_events(leg) returns, for each train of the leg (leg["trains"]
+    order), that leg's event dicts.
+    """
+    events: List[List[Dict[str, Any]]] = [[] for _ in range(train_count)]
+    for leg in timeline["legs"]:
+        for train, leg_events in zip(leg["trains"].tolist(), build_events(leg)):
+            events[train].extend(leg_events)
+    return events
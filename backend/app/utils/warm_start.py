@@ -0,0 +1,75 @@
+from typing import Dict, Any, List, Tuple, Optional
+from ortools.sat.python import cp_model
+
+LAYER1_ROLES = ("service", "standby", "ibl")
+
+
+class HintRecorder(cp_model.CpSolverSolutionCallback):
+    """Records whether the first solution CP-SAT reports matches the solution hint"""
+
+    def __init__(self, hints: List[Tuple[Any, int]]):
+        super().__init__()
+        self.hints = hints
+        self.first_solution_time: Optional[float] = None
+        self.first_objective: Optional[float] = None
+        self.hint_accepted = False
+        self.solutions = 0
+
+    def on_solution_callback(self):
+        self.solutions += 1
+        if self.first_solution_time is not None:
+            return
+        self.first_solution_time = self.WallTime()
+        self.first_objective = self.ObjectiveValue()
+        self.hint_accepted = bool(self.hints) and all(
+            self.Value(var) == value for var, value in self.hints
+        )
+
+
+def apply_hints(model: cp_model.CpModel, hints: List[Tuple[Any, int]]):
+    for var, value in hints:
+        model.AddHint(var, value)
+
+
+def layer1_roles_from_output(previous_output: Dict[str, Any]) -> Dict[str, str]:
+    """train_id -> service / standby / ibl from a persisted Layer 1 output.json"""
+    roles = {}
+    for role in LAYER1_ROLES:
+        for train_id in previous_output.get(f"trains_to_{role}", []) or []:
+            roles[train_id] = role
+    return roles
+
+
+def layer2_slots_from_output(previous_output: Dict[str, Any]) -> Dict[str, int]:
+    """train_id -> departure slot from a persisted Layer 2 result"""
+    return {
+        a["train_id"]: int(a["departure_slot"])
+        for a in previous_output.get("optimized_assignments", []) or []
+        if a.get("train_id") and a.get("departure_slot") is not None
+    }
+
+
+def warm_start_report(
+    recorder: Optional[HintRecorder],
+    hinted_variables: int,
+    wall_time: float,
+    cold_wall_time: Optional[float],
+    relative_gap: Optional[float]
+) -> Dict[str, Any]:
+    """Metadata block describing a (possibly) warm-started solve.
+
+    Time saved is measured against the wall time of the last cold solve of
+    the same model, when one has been recorded.
+    """
+    report = {
+        "enabled": recorder is not None,
+        "hinted_variables": hinted_variables,
+        "hint_accepted": bool(recorder and recorder.hint_accepted),
+        "first_solution_time": round(recorder.first_solution_time, 4) if recorder and recorder.first_solution_time is not None else None,
+        "relative_gap_limit": relative_gap,
+        "cold_wall_time": cold_wall_time,
+        "estimated_time_saved": None
+    }
+    if recorder is not None and cold_wall_time is not None:
+        report["estimated_time_saved"] = round(max(0.0, cold_wall_time - wall_time), 4)
+    return report
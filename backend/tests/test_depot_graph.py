@@ -0,0 +1,86 @@
+from collections import deque
+import random
+import numpy as np
+import pytest
+from app.utils.depot_graph import DepotGraph, DistanceTables, UNREACHABLE
+
+
+def random_layout(rng: random.Random, nodes: int, edges: int):
+    """Undirected random depot layout; some bays may be isolated"""
+    names = [f"B{i:02d}" for i in range(nodes)]
+    connections = {name: set() for name in names}
+    for _ in range(edges):
+        a, b = rng.sample(names, 2)
+        connections[a].add(b)
+        connections[b].add(a)
+    return {name: sorted(neighbors) for name, neighbors in connections.items()}
+
+
+def reference_distances(connections, source):
+    dist = {source: 0}
+    queue = deque([source])
+    while queue:
+        u = queue.popleft()
+        for v in connections[u]:
+            if v not in dist:
+                dist[v] = dist[u] + 1
+                queue.append(v)
+    return dist
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_tables_match_reference_bfs(seed):
+    rng = random.Random(seed)
+    connections = random_layout(rng, rng.randint(2, 15), rng.randint(0, 25))
+    tables = DistanceTables(connections)
+    graph = DepotGraph(connections)
+
+    for source in connections:
+        expected = reference_distances(connections, source)
+        for target in connections:
+            s, t = tables.index[source], tables.index[target]
+            if target not in expected:
+                assert tables.dist[s, t] == UNREACHABLE
+                assert graph.shortest_path(source, target) == (float('inf'), [])
+                continue
+            assert tables.dist[s, t] == expected[target]
+            moves, path = graph.shortest_path(source, target)
+            assert moves == expected[target] == len(path) - 1
+            assert path[0] == source and path[-1] == target
+            assert all(b in connections[a] for a, b in zip(path, path[1:]))
+
+
+def open_layout(connections, closed_edges, closed_nodes):
+    """The layout with closed segments and bays cut out (bays kept, isolated)"""
+    return {
+        node: [
+            n for n in neighbors
+            if node not in closed_nodes and n not in closed_nodes
+            and tuple(sorted((node, n))) not in closed_edges
+        ]
+        for node, neighbors in connections.items()
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_repair_matches_full_rebuild(seed):
+    rng = random.Random(seed)
+    connections = random_layout(rng, rng.randint(3, 15), rng.randint(2, 30))
+    segments = sorted({tuple(sorted((a, b))) for a, neighbors in connections.items() for b in neighbors})
+    graph = DepotGraph(connections)
+    shared = graph.tables.dist.copy()
+
+    for _ in range(30):
+        if segments and rng.random() < 0.6:
+            a, b = rng.choice(segments)
+            (graph.close_edge if rng.random() < 0.6 else graph.restore_edge)(a, b)
+        else:
+            bay = rng.choice(list(connections))
+            (graph.close_node if rng.random() < 0.5 else graph.restore_node)(bay)
+
+        rebuilt = DistanceTables(open_layout(connections, graph.closed_edges, graph.closed_nodes))
+        assert np.array_equal(graph.tables.dist, rebuilt.dist)
+        assert np.array_equal(graph.tables.pred, rebuilt.pred)
+
+    # Repairs work on a private copy; the cached tables stay untouched
+    assert np.array_equal(DepotGraph(connections).tables.dist, shared)
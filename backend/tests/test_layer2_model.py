@@ -0,0 +1,59 @@
+import random
+import pytest
+from app.services import layer2_service
+from app.services.layer2_service import run_layer2_service
+
+
+def layer2_inputs(rng: random.Random, bay_sizes):
+    """Parking and readiness JSON for bays holding the given numbers of trains"""
+    assignments, readiness = [], []
+    for b, size in enumerate(bay_sizes):
+        for position in range(1, size + 1):
+            train_id = f"T{len(assignments) + 1:02d}"
+            assignments.append({"train_id": train_id, "bay": f"SL{b + 1:02d}", "position": position})
+            readiness.append({
+                "train_id": train_id,
+                "score": rng.randint(40, 100),
+                "breakdown": {"branding_contracts": rng.choice([100, 100, 120, 150])}
+            })
+    return {"assignments": assignments}, readiness
+
+
+@pytest.fixture(autouse=True)
+def no_persist(monkeypatch):
+    monkeypatch.setattr(layer2_service, "save_layer2_output", lambda result: None)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_shunting_flags_follow_departure_order(seed):
+    rng = random.Random(seed)
+    parking, readiness = layer2_inputs(rng, [3, 2, 2, 2, 1])
+    result = run_layer2_service(parking, readiness, use_layer1_output=False)
+    assert result["solver_status"] == "OPTIMAL"
+
+    position = {a["train_id"]: a["position"] for a in parking["assignments"]}
+    departed = {a["train_id"]: a for a in result["optimized_assignments"]}
+    for plan in departed.values():
+        # A train needs shunting exactly when a train parked behind it leaves first
+        blocked = any(
+            other["bay"] == plan["bay"]
+            and position[other["train_id"]] > position[plan["train_id"]]
+            and other["departure_slot"] < plan["departure_slot"]
+            for other in departed.values()
+        )
+        assert plan["needs_shunting"] == blocked
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_exact_engine_matches_cp_sat(seed):
+    rng = random.Random(seed)
+    parking, readiness = layer2_inputs(rng, [2, 2, 1, 2, 2, 1])
+    plans = {
+        engine: run_layer2_service(
+            parking, readiness, use_layer1_output=False, max_trains_to_schedule=6, engine=engine
+        )
+        for engine in ("fast", "cp_sat")
+    }
+    assert plans["fast"]["engine"]["used"] == "fast"
+    assert plans["cp_sat"]["solver_status"] == "OPTIMAL"
+    assert plans["fast"]["objective_value"] == plans["cp_sat"]["objective_value"]
@@ -0,0 +1,50 @@
+from itertools import permutations
+import random
+import numpy as np
+import pytest
+from app.utils.slot_assignment import BaySlotAssignmentEngine
+
+PENALTY = 5000
+
+
+def random_instance(rng: random.Random):
+    """Value matrix and (front, back) pairs for a depot of one- and two-train bays"""
+    trains = rng.randint(2, 7)
+    slots = rng.randint(1, min(trains, 5))
+    values = np.array([[rng.randint(0, 9000) for _ in range(slots)] for _ in range(trains)])
+    order = list(range(trains))
+    rng.shuffle(order)
+    pairs = [(order[i], order[i + 1]) for i in range(0, trains - 1, 2) if rng.random() < 0.7]
+    return values, pairs
+
+
+def plan_value(values, pairs, slot_of):
+    """Objective of a plan: slot values less the penalty per front train blocked in"""
+    total = sum(int(values[t, s]) for t, s in enumerate(slot_of) if s >= 0)
+    shunted = sum(1 for f, b in pairs if slot_of[f] >= 0 and 0 <= slot_of[b] < slot_of[f])
+    return total - PENALTY * shunted
+
+
+def brute_force(values, pairs):
+    trains, slots = values.shape
+    best = None
+    for departing in permutations(range(trains), slots):
+        slot_of = [-1] * trains
+        for slot, train in enumerate(departing):
+            slot_of[train] = slot
+        value = plan_value(values, pairs, slot_of)
+        best = value if best is None else max(best, value)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_engine_matches_brute_force(seed):
+    rng = random.Random(seed)
+    values, pairs = random_instance(rng)
+    slot_of, shunted, objective = BaySlotAssignmentEngine(PENALTY).solve(values, pairs)
+
+    assert objective == brute_force(values, pairs)
+    assert objective == plan_value(values, pairs, slot_of.tolist())
+    # Every slot is filled by exactly one train
+    assert sorted(s for s in slot_of.tolist() if s >= 0) == list(range(values.shape[1]))
+    assert sorted(shunted) == sorted(f for f, b in pairs if slot_of[f] >= 0 and 0 <= slot_of[b] < slot_of[f])